@@ -4,6 +4,8 @@
 import reflex as rx
 
 from . import styles
+from .live_reload import watcher
+from .state_manager import install_stand_in
 from .pages import *
 
 # Create the app.
@@ -11,3 +13,6 @@ app = rx.App(
     style=styles.base_style,
     stylesheets=styles.base_stylesheets,
 )
+install_stand_in(app)
+# Reload changed files under data/ and push them to open dashboards
+app.register_lifespan_task(watcher.run)
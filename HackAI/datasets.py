@@ -0,0 +1,130 @@
+"""Central, lazily loaded access to the dashboard's data files.
+
+Each CSV under ``HackAI/data`` is read at most once, on first use, and kept until the
+file's modification time changes. Frames derived from them are memoized with
+``@derived(...)`` and recomputed only when one of their source files changes. Paths are
+resolved relative to the package, so the app works from any working directory.
+
+Frames returned from here are shared between callers and must not be mutated in place.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import functools
+import json
+import threading
+from pathlib import Path
+from typing import Any, Callable
+
+import pandas as pd
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+# Extra pd.read_csv arguments for files that need them; any other CSV in DATA_DIR can be
+# loaded by its file stem with default arguments.
+READ_OPTIONS: dict[str, dict[str, Any]] = {
+    "combined_df": {"index_col": 0, "parse_dates": ["Date"]},
+    # Rows end with a trailing comma; without index_col=False pandas would shift every
+    # column by one and use the time labels as the index.
+    "salesByTime": {"index_col": False},
+}
+
+_lock = threading.RLock()
+_files: dict[str, tuple[int, Any]] = {}
+_derived: dict[tuple, tuple[tuple, Any]] = {}
+
+
+def dataset_path(name: str) -> Path:
+    """Path of the CSV backing dataset ``name``."""
+    return DATA_DIR / f"{name}.csv"
+
+
+def version(name: str) -> int | None:
+    """Modification time (ns) of dataset ``name``, or None when the file does not exist."""
+    try:
+        return dataset_path(name).stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def load(name: str) -> pd.DataFrame:
+    """Return dataset ``name``, reading it only if it is not cached or changed on disk."""
+    current = version(name)
+    if current is None:
+        raise FileNotFoundError(f"Dataset {name!r} not found at {dataset_path(name)}")
+    with _lock:
+        cached = _files.get(name)
+        if cached is not None and cached[0] == current:
+            return cached[1]
+        frame = pd.read_csv(dataset_path(name), **READ_OPTIONS.get(name, {}))
+        _files[name] = (current, frame)
+        return frame
+
+
+def load_json(relative_path: str) -> Any:
+    """Return a JSON file under DATA_DIR, re-reading it only when it changes on disk."""
+    path = DATA_DIR / relative_path
+    current = path.stat().st_mtime_ns
+    with _lock:
+        cached = _files.get(relative_path)
+        if cached is not None and cached[0] == current:
+            return cached[1]
+        with open(path, encoding="utf-8") as f:
+            value = json.load(f)
+        _files[relative_path] = (current, value)
+        return value
+
+
+def matching(pattern: str) -> list[str]:
+    """Names of the datasets whose file stem matches a glob ``pattern``, sorted."""
+    return sorted(path.stem for path in DATA_DIR.glob(f"{pattern}.csv"))
+
+
+def derived(*dependencies: str, pattern: str | tuple[str, ...] | None = None) -> Callable:
+    """Memoize a function computed from the named datasets.
+
+    The cached result is keyed by the call arguments and the current versions of
+    ``dependencies``; it is recomputed on the next call after any of them changes.
+    With ``pattern`` (e.g. ``"itemsales_*"``, or a tuple of patterns) every matching
+    dataset is a dependency, including ones added or removed after the first call.
+    """
+    patterns = (pattern,) if isinstance(pattern, str) else tuple(pattern or ())
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__module__, func.__qualname__, dependencies, patterns, args, tuple(sorted(kwargs.items())))
+            versions = tuple(version(name) for name in dependencies)
+            for glob in patterns:
+                versions += tuple((name, version(name)) for name in matching(glob))
+            with _lock:
+                cached = _derived.get(key)
+                if cached is not None and cached[0] == versions:
+                    return cached[1]
+                value = func(*args, **kwargs)
+                _derived[key] = (versions, value)
+                return value
+
+        wrapper.dependencies = dependencies
+        wrapper.patterns = patterns
+        return wrapper
+
+    return decorator
+
+
+def depends_on(key: tuple, name: str) -> bool:
+    dependencies, patterns = key[2], key[3]
+    return name in dependencies or any(fnmatch.fnmatchcase(name, glob) for glob in patterns)
+
+
+def invalidate(name: str | None = None) -> None:
+    """Drop cached frames (all, or just ``name``); derived values follow on next access."""
+    with _lock:
+        if name is None:
+            _files.clear()
+            _derived.clear()
+        else:
+            _files.pop(name, None)
+            for key in [key for key in _derived if depends_on(key, name)]:
+                del _derived[key]
@@ -0,0 +1,175 @@
+"""Offline Prophet sales forecasts for the analysis dashboard.
+
+Forecasts are fitted outside the web app and written to ``data/forecasts`` as JSON,
+named after a hash of the sales data they were fitted on. The dashboard only ever
+reads that cache (``load_forecasts``); fitting never happens on a request path.
+
+Refresh the cache after new sales exports arrive with:
+
+    python -m HackAI.forecasting
+
+which is a no-op when a forecast for the current data already exists.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from . import datasets
+
+SALES_DATASET = "combined_df"
+FORECAST_DIR = datasets.DATA_DIR / "forecasts"
+HORIZON_DAYS = 90
+# Days of history the daily chart opens on, before the forecast
+DAILY_HISTORY_DAYS = 60
+INTERVAL_WIDTH = 0.8
+KEEP_CACHE_FILES = 3
+EMPTY_FORECASTS = {"daily": [], "monthly": [], "yearly": []}
+
+
+@datasets.derived(SALES_DATASET)
+def data_hash(name: str = SALES_DATASET) -> str:
+    """Short content hash of a dataset file, used as the forecast cache key."""
+    digest = hashlib.sha256(datasets.dataset_path(name).read_bytes()).hexdigest()
+    return digest[:16]
+
+
+def cache_path(digest: str):
+    return FORECAST_DIR / f"sales_{digest}.json"
+
+
+def _records(names, actual, forecast, lower, upper) -> list[dict]:
+    """Chart records in the shape the recharts components expect."""
+    return [
+        {
+            "name": name,
+            "actual": None if pd.isna(a) else round(float(a), 2),
+            "forecast": round(float(f), 2),
+            "lower": round(float(lo), 2),
+            "upper": round(float(up), 2),
+        }
+        for name, a, f, lo, up in zip(names, actual, forecast, lower, upper)
+    ]
+
+
+def _aggregate(periods: pd.Series, actual: pd.Series, samples: np.ndarray, point: np.ndarray):
+    """Sum daily values into periods; bounds come from summed predictive samples."""
+    codes, starts = np.unique(periods.to_numpy(), return_index=True)
+    order = np.argsort(starts)
+    codes, starts = codes[order], starts[order]
+
+    period_samples = np.add.reduceat(samples, starts, axis=0)
+    tail = (1 - INTERVAL_WIDTH) / 2
+    lower, upper = np.quantile(period_samples, [tail, 1 - tail], axis=1)
+    forecast = np.add.reduceat(point, starts)
+
+    # A period only has an actual value if every day in it is observed
+    observed = actual.groupby(periods.to_numpy(), sort=False).agg(lambda s: s.sum() if s.notna().all() else np.nan)
+    return codes, observed.reindex(codes).to_numpy(), forecast, lower, upper
+
+
+def fit_sales_forecast(sales: pd.DataFrame, horizon_days: int = HORIZON_DAYS) -> dict[str, list[dict]]:
+    """Fit Prophet on daily net sales and return daily/monthly/yearly chart series."""
+    from prophet import Prophet
+
+    history = sales[["Date", "Net Sales"]].rename(columns={"Date": "ds", "Net Sales": "y"})
+    history = history.groupby("ds", as_index=False)["y"].sum().sort_values("ds")
+
+    model = Prophet(
+        yearly_seasonality=True,
+        weekly_seasonality=True,
+        daily_seasonality=False,
+        interval_width=INTERVAL_WIDTH,
+    )
+    model.fit(history)
+
+    future = model.make_future_dataframe(periods=horizon_days, freq="D")
+    forecast = model.predict(future)
+    samples = model.predictive_samples(future)["yhat"]
+
+    ds = forecast["ds"]
+    actual = ds.map(history.set_index("ds")["y"])
+
+    # The full daily history is kept; the dashboard downsamples it to the visible range
+    daily = _records(
+        ds.dt.strftime("%Y-%m-%d"),
+        actual,
+        forecast["yhat"],
+        forecast["yhat_lower"],
+        forecast["yhat_upper"],
+    )
+
+    point = forecast["yhat"].to_numpy()
+    monthly = _records(*_aggregate(ds.dt.strftime("%Y-%m"), actual, samples, point))
+    yearly = _records(*_aggregate(ds.dt.strftime("%Y"), actual, samples, point))
+    return {"daily": daily, "monthly": monthly, "yearly": yearly}
+
+
+def build_forecast_cache(horizon_days: int = HORIZON_DAYS, force: bool = False):
+    """Fit and write the forecast cache for the current sales data if it is missing."""
+    digest = data_hash()
+    path = cache_path(digest)
+    if path.exists() and not force:
+        print(f"Forecast for sales data {digest} is up to date: {path}")
+        return path
+
+    print(f"Fitting Prophet on {datasets.dataset_path(SALES_DATASET)}...")
+    series = fit_sales_forecast(datasets.load(SALES_DATASET), horizon_days)
+
+    FORECAST_DIR.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "data_hash": digest,
+        "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "horizon_days": horizon_days,
+        "interval_width": INTERVAL_WIDTH,
+        "series": series,
+    }
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+    # Keep a few older forecasts around so a dashboard on stale data still has one
+    stale = sorted(FORECAST_DIR.glob("sales_*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in stale[KEEP_CACHE_FILES:]:
+        old.unlink()
+
+    print(f"Forecast written to: {path}")
+    return path
+
+
+def load_forecasts() -> dict[str, list[dict]]:
+    """Read the cached forecast series for the current sales data.
+
+    Falls back to the most recent cached forecast when the sales data has changed
+    since the last fit, and to empty series when nothing has been fitted yet.
+    """
+    path = cache_path(data_hash())
+    if not path.exists():
+        candidates = sorted(FORECAST_DIR.glob("sales_*.json"), key=lambda p: p.stat().st_mtime)
+        if not candidates:
+            return EMPTY_FORECASTS
+        path = candidates[-1]
+    return datasets.load_json(str(path.relative_to(datasets.DATA_DIR)))["series"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit Prophet sales forecasts for the dashboard.")
+    parser.add_argument("--horizon", type=int, default=HORIZON_DAYS,
+                        help=f"Days to forecast past the last sale (default: {HORIZON_DAYS})")
+    parser.add_argument("--force", action="store_true", help="Refit even if the data has not changed")
+    args = parser.parse_args(argv)
+    build_forecast_cache(args.horizon, args.force)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""Batch Prophet forecasts for every menu item in the item sales exports.
+
+Each item sales export (see ``item_sales``) contributes one observation per item and
+store. Every (granularity, store, item) series is fitted in a process pool and all
+results are written to a single long table, ``data/forecasts/item_forecasts.csv``, with
+one row per series and period.
+
+Unchanged series are not refitted. Each series is keyed by a hash of its observations
+and the model settings: rows from the previous table with the same key and horizon are
+carried over as they are, and fitted models are kept as JSON under
+``data/forecasts/models`` so a new horizon only has to re-predict.
+
+    python -m HackAI.item_forecasting --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import datasets
+from .forecasting import FORECAST_DIR, INTERVAL_WIDTH, _records
+from .item_sales import ALL_STORES, item_sales_history
+
+TABLE_NAME = "forecasts/item_forecasts"
+MODEL_DIR = FORECAST_DIR / "models"
+
+# Finest first: the dashboard shows the finest granularity a series has
+FREQUENCIES = {"monthly": "MS", "yearly": "YS"}
+LABEL_FORMATS = {"monthly": "%Y-%m", "yearly": "%Y"}
+HORIZONS = {"monthly": 6, "yearly": 1}
+PROPHET_SETTINGS = {
+    "yearly_seasonality": "auto",
+    "weekly_seasonality": False,
+    "daily_seasonality": False,
+    "interval_width": INTERVAL_WIDTH,
+}
+SERIES_COLUMNS = ["granularity", "Store", "Item"]
+TABLE_COLUMNS = SERIES_COLUMNS + ["ds", "actual", "forecast", "lower", "upper", "series_key"]
+
+
+def item_series() -> pd.DataFrame:
+    """Quantity sold per granularity, store, item and period start (``ds``)."""
+    history = item_sales_history()
+    return history.groupby(SERIES_COLUMNS + ["ds"], as_index=False, sort=True)["y"].sum()
+
+
+def series_hash(granularity: str, ds: np.ndarray, y: np.ndarray) -> str:
+    """Key of a fitted model: the observations plus everything that shapes the fit."""
+    digest = hashlib.sha1()
+    digest.update(json.dumps([granularity, PROPHET_SETTINGS], sort_keys=True).encode("utf-8"))
+    digest.update(np.asarray(ds, dtype="datetime64[ns]").tobytes())
+    digest.update(np.asarray(y, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _fit_series(task):
+    """Fit (or reload) one series and predict ``horizon`` periods past its last observation.
+
+    Runs in a worker process, so it takes and returns plain picklable values.
+    """
+    series, model_key, granularity, ds, y, horizon, model_json = task
+    freq = FREQUENCIES[granularity]
+    history = pd.DataFrame({"ds": ds, "y": y})
+
+    if len(history) < 2:
+        # Prophet needs at least two observations; carry the only one forward
+        future = pd.date_range(history["ds"].iloc[0], periods=horizon + 1, freq=freq)
+        value = np.full(len(future), history["y"].iloc[0], dtype=float)
+        forecast = pd.DataFrame({"ds": future, "yhat": value, "yhat_lower": value, "yhat_upper": value})
+        return series, model_key, None, forecast
+
+    from prophet import Prophet
+    from prophet.serialize import model_from_json, model_to_json
+
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    if model_json is None:
+        model = Prophet(**PROPHET_SETTINGS)
+        model.fit(history)
+        model_json = model_to_json(model)
+    else:
+        model = model_from_json(model_json)
+
+    future = model.make_future_dataframe(periods=horizon, freq=freq)
+    forecast = model.predict(future)[["ds", "yhat", "yhat_lower", "yhat_upper"]]
+    return series, model_key, model_json, forecast
+
+
+def _table_rows(series, key, history, forecast) -> pd.DataFrame:
+    granularity, store, item = series
+    actual = forecast["ds"].map(history.set_index("ds")["y"])
+    # Quantities sold cannot go negative, whatever the trend extrapolates to
+    values = forecast[["yhat", "yhat_lower", "yhat_upper"]].clip(lower=0).round(2)
+    return pd.DataFrame({
+        "granularity": granularity,
+        "Store": store,
+        "Item": item,
+        "ds": forecast["ds"].dt.strftime("%Y-%m-%d"),
+        "actual": actual.to_numpy(),
+        "forecast": values["yhat"].to_numpy(),
+        "lower": values["yhat_lower"].to_numpy(),
+        "upper": values["yhat_upper"].to_numpy(),
+        "series_key": key,
+    })
+
+
+def _previous_table() -> dict[str, pd.DataFrame]:
+    """Rows of the last written table grouped by series key, or {} if there is none."""
+    if datasets.version(TABLE_NAME) is None:
+        return {}
+    previous = datasets.load(TABLE_NAME)
+    if list(previous.columns) != TABLE_COLUMNS:
+        return {}
+    return {key: rows for key, rows in previous.groupby("series_key", sort=False)}
+
+
+def build_item_forecasts(horizons: dict[str, int] | None = None, workers: int | None = None,
+                         force: bool = False):
+    """Fit every changed item series and rewrite the item forecast table."""
+    horizons = {**HORIZONS, **(horizons or {})}
+    history = item_series()
+    previous = {} if force else _previous_table()
+
+    frames, tasks, histories = [], [], {}
+    for series, rows in history.groupby(SERIES_COLUMNS, sort=False):
+        granularity = series[0]
+        model_key = series_hash(granularity, rows["ds"].to_numpy(), rows["y"].to_numpy())
+        key = f"{model_key}-{horizons[granularity]}"
+        if key in previous:
+            frames.append(previous[key])
+            continue
+        model_path = MODEL_DIR / f"{model_key}.json"
+        model_json = model_path.read_text(encoding="utf-8") if model_path.exists() and not force else None
+        histories[series] = rows
+        tasks.append((series, model_key, granularity, rows["ds"].tolist(), rows["y"].tolist(),
+                      horizons[granularity], model_json))
+
+    print(f"{len(frames) + len(tasks)} item series: {len(frames)} unchanged, {len(tasks)} to forecast")
+    start = time.perf_counter()
+    MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    if tasks:
+        if workers == 1:
+            results = map(_fit_series, tasks)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            chunksize = max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 4))
+            results = executor.map(_fit_series, tasks, chunksize=chunksize)
+        try:
+            for series, model_key, model_json, forecast in results:
+                if model_json is not None:
+                    model_path = MODEL_DIR / f"{model_key}.json"
+                    if not model_path.exists() or force:
+                        model_path.write_text(model_json, encoding="utf-8")
+                key = f"{model_key}-{horizons[series[0]]}"
+                frames.append(_table_rows(series, key, histories[series], forecast))
+        finally:
+            if workers != 1:
+                executor.shutdown()
+    print(f"Forecasting took {time.perf_counter() - start:.1f}s")
+
+    table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=TABLE_COLUMNS)
+    table = table[TABLE_COLUMNS].sort_values(SERIES_COLUMNS + ["ds"], kind="stable")
+    path = datasets.dataset_path(TABLE_NAME)
+    tmp_path = path.with_suffix(".tmp")
+    table.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+    # Models of series that no longer exist in this form will not be asked for again
+    current = {key.split("-")[0] for key in table["series_key"].unique()}
+    for model_path in MODEL_DIR.glob("*.json"):
+        if model_path.stem not in current:
+            model_path.unlink()
+
+    print(f"Item forecasts written to: {path}")
+    return path
+
+
+def series_label(store: str, item: str) -> str:
+    return item if store == ALL_STORES else f"{item} ({store})"
+
+
+@datasets.derived(TABLE_NAME)
+def item_forecast_records() -> dict[str, list[dict]]:
+    """Chart records per item, best sellers first, at the finest granularity available.
+
+    Grouped once per table version, so switching items on the dashboard is a dict lookup.
+    """
+    if datasets.version(TABLE_NAME) is None:
+        return {}
+    table = datasets.load(TABLE_NAME)
+    records, totals = {}, {}
+    for granularity in FREQUENCIES:
+        rows = table[table["granularity"] == granularity]
+        for (store, item), series in rows.groupby(["Store", "Item"], sort=False):
+            label = series_label(store, item)
+            if label in records:
+                continue
+            names = pd.to_datetime(series["ds"]).dt.strftime(LABEL_FORMATS[granularity])
+            records[label] = _records(names, series["actual"], series["forecast"], series["lower"], series["upper"])
+            totals[label] = series["actual"].sum()
+    return {label: records[label] for label in sorted(records, key=totals.__getitem__, reverse=True)}
+
+
+def item_forecast_names() -> list[str]:
+    return list(item_forecast_records())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit Prophet forecasts for every menu item.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: one per CPU; 1 fits in-process)")
+    parser.add_argument("--yearly-horizon", type=int, default=HORIZONS["yearly"],
+                        help=f"Years to forecast for yearly exports (default: {HORIZONS['yearly']})")
+    parser.add_argument("--monthly-horizon", type=int, default=HORIZONS["monthly"],
+                        help=f"Months to forecast for monthly exports (default: {HORIZONS['monthly']})")
+    parser.add_argument("--force", action="store_true", help="Refit every series, ignoring cached models")
+    args = parser.parse_args(argv)
+    horizons = {"yearly": args.yearly_horizon, "monthly": args.monthly_horizon}
+    build_item_forecasts(horizons, args.workers, args.force)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""Item sales exports aggregated across any number of periods.
+
+Every ``itemsales_<period>.csv`` in ``data`` is picked up automatically:
+``itemsales_2024.csv`` covers a year and ``itemsales_2024-05.csv`` a month. Per-store
+exports come either with a ``Store`` column or as ``itemsales_<store>_<period>.csv``.
+Adding a file needs no code change; derived tables are rebuilt on the next access after
+any export is added, changed or removed.
+"""
+
+from __future__ import annotations
+
+import re
+
+import pandas as pd
+
+from . import datasets
+
+EXPORT_PATTERN = "itemsales_*"
+EXPORT_NAME = re.compile(r"^itemsales_(?:(?P<store>.+)_)?(?P<period>\d{4}(?:-\d{2})?)$")
+ALL_STORES = "All"
+TOP_N = 6
+HISTORY_COLUMNS = ["granularity", "period", "Store", "Item", "ds", "y", "sales"]
+
+
+def _money(values: pd.Series) -> pd.Series:
+    return pd.to_numeric(values.astype(str).str.replace(r"[\$,]", "", regex=True), errors="coerce")
+
+
+@datasets.derived(pattern=EXPORT_PATTERN)
+def item_sales_history() -> pd.DataFrame:
+    """Quantity sold (``y``) and sales per granularity, period, store and item.
+
+    ``period`` is the label from the file name and ``ds`` the first day it covers.
+    """
+    frames = []
+    for name in datasets.matching(EXPORT_PATTERN):
+        match = EXPORT_NAME.match(name)
+        if match is None:
+            continue
+        export = datasets.load(name)
+        period = match["period"]
+        store = export["Store"].astype(str) if "Store" in export else (match["store"] or ALL_STORES)
+        frames.append(pd.DataFrame({
+            "granularity": "monthly" if "-" in period else "yearly",
+            "period": period,
+            "Store": store,
+            "Item": export["Item"].astype(str).str.strip(),
+            "ds": pd.Timestamp(period),
+            "y": pd.to_numeric(export["Quantity Sold"], errors="coerce"),
+            "sales": _money(export["Total Sales"]) if "Total Sales" in export else float("nan"),
+        }))
+    if not frames:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    history = pd.concat(frames, ignore_index=True).dropna(subset=["y"])
+    keys = ["granularity", "period", "Store", "Item", "ds"]
+    return history.groupby(keys, as_index=False, sort=True)[["y", "sales"]].sum(min_count=1)
+
+
+def periods() -> list[str]:
+    """Period labels that have item sales, newest first."""
+    return sorted(top_items(), reverse=True)
+
+
+@datasets.derived(pattern=EXPORT_PATTERN)
+def top_items(n: int = TOP_N) -> dict[str, list[dict]]:
+    """Best-selling items by quantity per period, as pie chart records.
+
+    Stores are summed; ``nlargest`` keeps this a partial selection per period rather
+    than a full sort of every item.
+    """
+    history = item_sales_history()
+    totals = history.groupby(["period", "Item"], sort=False)["y"].sum()
+    top = totals.groupby(level="period", sort=False).nlargest(n).droplevel(0)
+    return {
+        period: [{"name": item, "value": int(value)} for (_, item), value in rows.items()]
+        for period, rows in top.groupby(level="period", sort=False)
+    }
@@ -0,0 +1,114 @@
+"""Live dashboard refresh when files under ``data`` change.
+
+A single ``DataWatcher`` per backend worker watches the data directory with
+``watchfiles``. For each batch of changes it works out which datasets were touched,
+drops just those from the ``datasets`` cache and recomputes, in a worker thread, only
+the registered aggregates that depend on them; everything else stays cached. It then
+bumps ``watcher.version``.
+
+Connected clients follow the version from a Reflex background task (see
+``StatsState.follow_data``) that waits on ``wait_for_change`` outside the state lock,
+so neither the reload nor the wait ever sits on the event-handling path.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+import logging
+from pathlib import Path
+from typing import Callable, Iterable
+
+from . import datasets
+
+logger = logging.getLogger(__name__)
+
+# Extensions the dashboard reads; everything else (temp files, .npz caches, model
+# JSON written next to the forecasts) is ignored
+WATCHED_SUFFIXES = {".csv", ".json"}
+IGNORED_DIRS = {"cube", "models"}
+DEBOUNCE_MS = 1600
+# Clients re-arm their wait at least this often, so tasks of closed tabs end soon
+WAIT_SECONDS = 300
+
+
+def dataset_name(path: str | Path, root: Path = datasets.DATA_DIR) -> str | None:
+    """The ``datasets`` cache key for a changed file, or None if the dashboard ignores it.
+
+    CSVs are keyed by their stem relative to the data directory (``forecasts/item_forecasts``),
+    JSON files by their relative path (``forecasts/sales_<hash>.json``).
+    """
+    path = Path(path)
+    if path.suffix not in WATCHED_SUFFIXES:
+        return None
+    try:
+        relative = path.resolve().relative_to(root)
+    except ValueError:
+        return None
+    if IGNORED_DIRS.intersection(relative.parts[:-1]):
+        return None
+    return relative.with_suffix("").as_posix() if path.suffix == ".csv" else relative.as_posix()
+
+
+class DataWatcher:
+    """Reloads changed datasets and tells waiting clients about it."""
+
+    def __init__(self, root: Path = datasets.DATA_DIR):
+        self.root = root
+        self.version = 0
+        self._changed = asyncio.Event()
+        self._refreshers: list[tuple[Callable, tuple[str, ...]]] = []
+
+    def register(self, func: Callable, *names: str) -> Callable:
+        """Recompute ``func()`` after reloads touching any of ``names`` (glob patterns).
+
+        For ``@datasets.derived`` functions the names default to their dependencies.
+        """
+        if not names:
+            names = tuple(getattr(func, "dependencies", ())) + tuple(getattr(func, "patterns", ()))
+        self._refreshers.append((func, names))
+        return func
+
+    def reload(self, names: Iterable[str]) -> list[Callable]:
+        """Invalidate ``names`` and recompute the aggregates that depend on them."""
+        names = set(names)
+        for name in names:
+            datasets.invalidate(name)
+        refreshed = []
+        for func, patterns in self._refreshers:
+            if any(fnmatch.fnmatchcase(name, pattern) for name in names for pattern in patterns):
+                func()
+                refreshed.append(func)
+        return refreshed
+
+    async def run(self):
+        """Watch the data directory until cancelled; meant to run as a lifespan task."""
+        from watchfiles import awatch
+
+        async for changes in awatch(self.root, debounce=DEBOUNCE_MS, recursive=True):
+            names = {name for _, path in changes if (name := dataset_name(path, self.root)) is not None}
+            if not names:
+                continue
+            try:
+                refreshed = await asyncio.to_thread(self.reload, names)
+            except Exception:
+                # A half-written export must not kill the watcher; the next change retries
+                logger.exception("Reloading %s failed", sorted(names))
+                continue
+            logger.info("Reloaded %s; refreshed %s", sorted(names), [func.__name__ for func in refreshed])
+            self.version += 1
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    async def wait_for_change(self, seen_version: int, timeout: float = WAIT_SECONDS) -> int:
+        """Return the current version once it differs from ``seen_version`` or ``timeout`` passes."""
+        if self.version != seen_version:
+            return self.version
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.version
+
+
+watcher = DataWatcher()
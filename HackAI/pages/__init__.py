@@ -1,5 +1,6 @@
 from .analysis import analysis
 from .index import index
 from .competitor import competitor
+from .upload import upload
 
-__all__ = [ "analysis", "index", "competitor"]
\ No newline at end of file
+__all__ = [ "analysis", "index", "competitor", "upload"]
@@ -12,7 +12,9 @@ from ..views.charts import (
     monthly_forecast_graph,
     daily_forecast_graph,
     top_items_pie_chart,
+    item_forecast_graph,
 )
+from .. import item_sales
 from ..views.stats_cards import stats_cards
 
 
@@ -45,9 +47,6 @@ def analysis() -> rx.Component:
     Returns:
         The UI for the analysis page.
     """
-    # We don't need to call _generate_sample_data since we're initializing directly
-    # Removing this line: StatsState._generate_sample_data()
-    
     return rx.vstack(
         rx.heading(f"Welcome, Your Store Analysis", size="5"),
         stats_cards(),
@@ -76,21 +75,44 @@ def analysis() -> rx.Component:
                 ),
             ),
         ),
+        # Item-level forecast card
+        card(
+            rx.hstack(
+                rx.hstack(
+                    rx.icon("trending-up", size=20),
+                    rx.text("Item Forecast", size="4", weight="medium"),
+                    align="center",
+                    spacing="2",
+                ),
+                rx.select(
+                    StatsState.item_forecast_names,
+                    value=StatsState.current_forecast_item,
+                    on_change=StatsState.set_forecast_item,
+                    placeholder="No item forecasts yet",
+                    width="16em",
+                    size="2",
+                ),
+                align="center",
+                width="100%",
+                justify="between",
+            ),
+            item_forecast_graph(),
+        ),
         
         rx.grid(
             card(
                 rx.hstack(
                     rx.hstack(
                         rx.icon("bar-chart", size=20),
-                        rx.text("Top 6 Most Sold Items", size="4", weight="medium"),
+                        rx.text(f"Top {item_sales.TOP_N} Most Sold Items", size="4", weight="medium"),
                         align="center",
                         spacing="2",
                     ),
                     rx.hstack(
-                        rx.text("Select Year:", size="3"),
+                        rx.text("Select Period:", size="3"),
                         rx.select(
-                            ["2023", "2024"],
-                            value=StatsState.year,
+                            StatsState.sales_periods,
+                            value=StatsState.current_period,
                             on_change=StatsState.set_year,
                             width="8em",
                             size="2",
@@ -115,6 +137,7 @@ def analysis() -> rx.Component:
         ),
         spacing="8",
         width="100%",
+        on_mount=StatsState.follow_data,
     )
 
 #this is a test
@@ -1,21 +1,90 @@
+import uuid
+
 import reflex as rx
-import pandas as pd
 from ..templates import template
 
-# Load and process chart data
-def load_chart_data(path, company_col, percentage_col):
-    df = pd.read_csv(path)
-    df = df[[company_col, percentage_col]]
-    df.columns = ['name', 'uv']
-    return df.to_dict(orient="records")
+from .. import sentiment_summary
+from ..live_reload import watcher
+
+# Cached store queries recomputed by the data watcher when the store changes
+watcher.register(sentiment_summary.store_companies)
+
+
+class CompetitorState(rx.State):
+    """Page positions and the selected company; chart data comes from cached store queries.
+
+    Vars that read the store also depend on data_version, which follow_data bumps after
+    the data watcher reloads it, as in StatsState.
+    """
+
+    restaurant_page: int = 0
+    pizzeria_page: int = 0
+    company: str = ""
+
+    # live_reload.watcher.version this session last saw
+    data_version: int = 0
+    _follow_chain: str = ""
+
+    @rx.var(cache=True, deps=["data_version"])
+    def restaurant_chart_data(self) -> list[dict]:
+        return sentiment_summary.ranking_page("restaurant_rankings", self.restaurant_page)
+
+    @rx.var(cache=True, deps=["data_version"])
+    def restaurant_pages(self) -> int:
+        return sentiment_summary.page_count("restaurant_rankings")
+
+    @rx.var(cache=True, deps=["data_version"])
+    def pizzeria_chart_data(self) -> list[dict]:
+        return sentiment_summary.ranking_page(sentiment_summary.companies_dataset(), self.pizzeria_page)
+
+    @rx.var(cache=True, deps=["data_version"])
+    def pizzeria_pages(self) -> int:
+        return sentiment_summary.page_count(sentiment_summary.companies_dataset())
+
+    @rx.var(cache=True, deps=["data_version"])
+    def companies(self) -> list[str]:
+        return sentiment_summary.store_companies()
+
+    @rx.var(cache=True)
+    def current_company(self) -> str:
+        return self.company or (self.companies[0] if self.companies else "")
+
+    @rx.var(cache=True, deps=["data_version"])
+    def menu_rows(self) -> list[dict]:
+        return sentiment_summary.menu_item_sentiment(self.current_company)
+
+    @rx.var(cache=True, deps=["data_version"])
+    def aspects(self) -> dict[str, list[str]]:
+        return sentiment_summary.top_aspects(self.current_company)
+
+    @rx.event
+    def turn_restaurant_page(self, step: int):
+        self.restaurant_page = min(max(self.restaurant_page + step, 0), self.restaurant_pages - 1)
+
+    @rx.event
+    def turn_pizzeria_page(self, step: int):
+        self.pizzeria_page = min(max(self.pizzeria_page + step, 0), self.pizzeria_pages - 1)
 
-restaurant_chart_data = load_chart_data(
-    "HackAI/data/restaurant_rankings.csv", "Company", "Positive %"
-)
+    @rx.event
+    def set_company(self, company: str):
+        self.company = company
+
+    @rx.event(background=True)
+    async def follow_data(self, chain: str = ""):
+        """Pick up store reloads while the page is open; see StatsState.follow_data."""
+        async with self:
+            if not chain:
+                chain = self._follow_chain = uuid.uuid4().hex
+            elif chain != self._follow_chain:
+                return
+            seen = self.data_version
+        version = await watcher.wait_for_change(seen)
+        async with self:
+            if chain != self._follow_chain:
+                return
+            self.data_version = version
+        return CompetitorState.follow_data(chain)
 
-company_chart_data = load_chart_data(
-    "HackAI/data/company_sentiment_comparison.csv", "Company", "Positive_Percentage"
-)
 
 # Basic vertical bar chart component
 def bar_vertical(data):
@@ -34,8 +103,30 @@ def bar_vertical(data):
         height=300,
     )
 
+# Previous / next page controls under a paged chart
+def pager(page, pages, turn_page) -> rx.Component:
+    return rx.hstack(
+        rx.icon_button(
+            rx.icon("chevron-left"),
+            size="1",
+            variant="surface",
+            disabled=page <= 0,
+            on_click=turn_page(-1),
+        ),
+        rx.text(f"Page {page + 1} of {pages}", size="2"),
+        rx.icon_button(
+            rx.icon("chevron-right"),
+            size="1",
+            variant="surface",
+            disabled=page >= pages - 1,
+            on_click=turn_page(1),
+        ),
+        align="center",
+        spacing="3",
+    )
+
 # Chart card with header and bar chart
-def chart_card(title: str, chart: rx.Component) -> rx.Component:
+def chart_card(title: str, chart: rx.Component, *footer: rx.Component) -> rx.Component:
     return rx.card(
         rx.vstack(
             rx.hstack(
@@ -46,6 +137,7 @@ def chart_card(title: str, chart: rx.Component) -> rx.Component:
                 margin_bottom="1em",
             ),
             chart,
+            *footer,
         ),
         padding="3.5em",
         width="100%",
@@ -57,51 +149,62 @@ def menu_sentiment_card() -> rx.Component:
     return rx.card(
         rx.vstack(
             rx.hstack(
-                rx.icon("pizza", size=20),
-                rx.text("Based on Coustomer reviews on Yelp!!", size="4", weight="medium"),
+                rx.hstack(
+                    rx.icon("pizza", size=20),
+                    rx.text("Based on customer reviews on Yelp", size="4", weight="medium"),
+                    align="center",
+                    spacing="2",
+                ),
+                rx.select(
+                    CompetitorState.companies,
+                    value=CompetitorState.current_company,
+                    on_change=CompetitorState.set_company,
+                    placeholder="No sentiment store yet",
+                    width="16em",
+                    size="2",
+                ),
                 align="center",
-                spacing="2",
+                justify="between",
+                width="100%",
                 margin_bottom="1em",
             ),
 
-            # Table-like text layout
-            rx.text_area(
-                "Item                     Positive   Negative   Total\n"
-                "-----------------------------------------------------\n"
-                "meat lovers             20         30         50\n"
-                "naga habanero           30         10         40\n"
-                "korean bbq              30         0          30\n"
-                "habanero chicken        30         0          30\n"
-                "harissa chicken         20         0          20\n"
-                "4 cheese                20         0          20\n"
-                "beef taco               20         0          20",
-                as_="pre",  # ✅ Valid for Box
-                font_family="monospace",
-                background_color="gray.50",
-                padding="1em",
-                border_radius="md",
+            rx.table.root(
+                rx.table.header(
+                    rx.table.row(
+                        rx.table.column_header_cell("Item"),
+                        rx.table.column_header_cell("Positive"),
+                        rx.table.column_header_cell("Negative"),
+                        rx.table.column_header_cell("Total"),
+                    ),
+                ),
+                rx.table.body(
+                    rx.foreach(
+                        CompetitorState.menu_rows,
+                        lambda row: rx.table.row(
+                            rx.table.cell(row["Item"]),
+                            rx.table.cell(row["Positive"]),
+                            rx.table.cell(row["Negative"]),
+                            rx.table.cell(row["Total"]),
+                        ),
+                    ),
+                ),
                 width="100%",
-                auto_height=True
             ),
 
-
             # Feedback aspects
             rx.hstack(
                 rx.box(
                     rx.hstack(rx.icon("thumbs-up"), rx.text("Key Positive Aspects", weight="bold")),
                     rx.unordered_list(
-                        rx.list_item("Great service"),
-                        rx.list_item("Crispy crust"),
-                        rx.list_item("Good flavors"),
+                        rx.foreach(CompetitorState.aspects["positive"], rx.list_item),
                     ),
                     width="50%",
                 ),
                 rx.box(
                     rx.hstack(rx.icon("thumbs-down"), rx.text("Key Negative Aspects", weight="bold")),
                     rx.unordered_list(
-                        rx.list_item("Issues with sauce"),
-                        rx.list_item("Price concerns"),
-                        rx.list_item("Small restaurant size"),
+                        rx.foreach(CompetitorState.aspects["negative"], rx.list_item),
                     ),
                     width="50%",
                 ),
@@ -121,8 +224,18 @@ def competitor() -> rx.Component:
         rx.heading("Restaurant Sentiment Analysis", size="8", margin_bottom="1em"),
 
         rx.grid(
-            chart_card("Top Restaurant Rankings by Positive Sentiment", bar_vertical(restaurant_chart_data)),
-            chart_card("Top pizzarias by Positive Sentiment", bar_vertical(company_chart_data)),
+            chart_card(
+                "Top Restaurant Rankings by Positive Sentiment",
+                bar_vertical(CompetitorState.restaurant_chart_data),
+                pager(CompetitorState.restaurant_page, CompetitorState.restaurant_pages,
+                      CompetitorState.turn_restaurant_page),
+            ),
+            chart_card(
+                "Top pizzarias by Positive Sentiment",
+                bar_vertical(CompetitorState.pizzeria_chart_data),
+                pager(CompetitorState.pizzeria_page, CompetitorState.pizzeria_pages,
+                      CompetitorState.turn_pizzeria_page),
+            ),
             gap="2em",
             grid_template_columns=["2fr", "1fr"],  # two-column layout
             width="80%",
@@ -134,5 +247,6 @@ def competitor() -> rx.Component:
         spacing="8",
         width="100%",
         padding="3.5em",
-        align="center"
-    )
\ No newline at end of file
+        align="center",
+        on_mount=CompetitorState.follow_data,
+    )
@@ -0,0 +1,212 @@
+import asyncio
+from pathlib import Path
+
+import reflex as rx
+from ..templates import template
+
+from ingredients.classifier import IMAGE_SUFFIXES, IncompatibleModelError
+from ingredients.service import ClassifierService, digest
+
+UPLOAD_ID = "ingredient_upload"
+# Uploaded photos are stored by content hash, so every backend worker can read them back
+PHOTO_DIR = "ingredients"
+
+# One service per worker: the model, its micro-batcher and the result cache are shared by all sessions
+service = ClassifierService(store_dir=rx.get_upload_dir() / PHOTO_DIR / "results")
+
+
+class UploadState(rx.State):
+    """Uploaded photos and their classification, filled in as batches complete."""
+
+    results: list[dict] = []
+    classifying: bool = False
+    next_id: int = 0
+
+    @rx.var(cache=True)
+    def pending(self) -> int:
+        return sum(1 for row in self.results if row["status"] == "pending")
+
+    # Upload handlers can't run in the background, so this only stores the photos and
+    # hands them to classify_pending
+    @rx.event
+    async def handle_upload(self, files: list[rx.UploadFile]):
+        folder = rx.get_upload_dir() / PHOTO_DIR
+        folder.mkdir(parents=True, exist_ok=True)
+        for file in files:
+            data = await file.read()
+            key = digest(data)
+            suffix = Path(file.name or "").suffix.lower()
+            name = f"{key}{suffix if suffix in IMAGE_SUFFIXES else '.jpg'}"
+            if not (folder / name).exists():
+                await asyncio.to_thread((folder / name).write_bytes, data)
+            self.results.insert(0, {
+                "id": self.next_id,
+                "name": file.name or name,
+                "file": f"{PHOTO_DIR}/{name}",
+                "digest": key,
+                "status": "pending",
+                "top": [],
+                "cached": False,
+                "error": "",
+            })
+            self.next_id += 1
+        return UploadState.classify_pending
+
+    @rx.event(background=True)
+    async def classify_pending(self):
+        async with self:
+            if self.classifying:
+                # The running task picks up rows added while it works
+                return
+            self.classifying = True
+        try:
+            try:
+                await service.batcher()
+            except Exception as err:
+                # Any load failure (no TensorFlow, a missing or corrupt model file) ends these rows
+                if not isinstance(err, (IncompatibleModelError, RuntimeError)):
+                    err = f"Could not load the ingredient model ({type(err).__name__}: {err})"
+                async with self:
+                    for row in self.results:
+                        if row["status"] == "pending":
+                            row.update(status="error", error=str(err))
+                    self.classifying = False
+                return
+            while True:
+                async with self:
+                    rows = [(row["id"], row["file"], row["digest"])
+                            for row in self.results if row["status"] == "pending"]
+                    if not rows:
+                        # Cleared under the same lock that saw no rows, so an upload landing
+                        # after this starts a new task instead of being left pending
+                        self.classifying = False
+                        return
+                tasks = {}
+                for row_id, file, key in rows:
+                    data = await asyncio.to_thread((rx.get_upload_dir() / file).read_bytes)
+                    tasks[asyncio.create_task(service.classify(data, key))] = row_id
+                while tasks:
+                    done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    # Push each finished batch to the page instead of waiting for all of them
+                    async with self:
+                        for task in done:
+                            self._finish(tasks.pop(task), task)
+        except BaseException:
+            async with self:
+                self.classifying = False
+            raise
+
+    def _finish(self, row_id: int, task: asyncio.Task):
+        for row in self.results:
+            if row["id"] != row_id:
+                continue
+            error = task.exception()
+            if error is None:
+                top, cached = task.result()
+                row.update(status="done", cached=cached, top=[
+                    {"label": guess["label"].replace("_", " "),
+                     "probability": f"{guess['probability']:.1%}"}
+                    for guess in top
+                ])
+            else:
+                row.update(status="error", error="Could not classify this image")
+            break
+
+    @rx.event
+    def clear(self):
+        self.results = []
+
+
+# One uploaded photo with its top guesses
+def result_card(row) -> rx.Component:
+    return rx.card(
+        rx.vstack(
+            rx.image(src=rx.get_upload_url(row["file"]), width="100%", height="10em", object_fit="cover"),
+            rx.hstack(
+                rx.text(row["name"], size="2", weight="medium", trim="both"),
+                rx.cond(row["cached"], rx.badge("cached", color_scheme="gray")),
+                justify="between",
+                width="100%",
+            ),
+            rx.match(
+                row["status"],
+                ("pending", rx.hstack(rx.spinner(size="1"), rx.text("Classifying...", size="2"))),
+                ("error", rx.text(row["error"], size="2", color_scheme="red")),
+                rx.vstack(
+                    rx.foreach(
+                        row["top"].to(list[dict]),
+                        lambda guess: rx.hstack(
+                            rx.text(guess["label"], size="2"),
+                            rx.text(guess["probability"], size="2", color_scheme="gray"),
+                            justify="between",
+                            width="100%",
+                        ),
+                    ),
+                    spacing="1",
+                    width="100%",
+                ),
+            ),
+            spacing="2",
+        ),
+        width="100%",
+    )
+
+
+@template(route="/upload", title="Ingredient Upload")
+def upload() -> rx.Component:
+    return rx.vstack(
+        rx.heading("Ingredient Recognition", size="8", margin_bottom="1em"),
+
+        rx.card(
+            rx.vstack(
+                rx.hstack(
+                    rx.icon("camera", size=20),
+                    rx.text("Drop ingredient photos to classify them", size="4", weight="medium"),
+                    align="center",
+                    spacing="2",
+                ),
+                rx.upload(
+                    rx.vstack(
+                        rx.icon("upload", size=32),
+                        rx.text("Drag photos here or click to select", size="2"),
+                        align="center",
+                        spacing="2",
+                    ),
+                    id=UPLOAD_ID,
+                    multiple=True,
+                    accept={"image/*": sorted(IMAGE_SUFFIXES)},
+                    on_drop=UploadState.handle_upload(rx.upload_files(upload_id=UPLOAD_ID)),
+                    border="1px dashed",
+                    padding="3em",
+                    width="100%",
+                ),
+                rx.hstack(
+                    rx.cond(
+                        UploadState.classifying,
+                        rx.text(f"{UploadState.pending} photos left", size="2"),
+                    ),
+                    rx.button("Clear", variant="surface", on_click=UploadState.clear,
+                              disabled=UploadState.classifying),
+                    align="center",
+                    justify="end",
+                    spacing="3",
+                    width="100%",
+                ),
+                width="100%",
+            ),
+            padding="3.5em",
+            width="80%",
+        ),
+
+        rx.grid(
+            rx.foreach(UploadState.results, result_card),
+            gap="1.5em",
+            columns="4",
+            width="80%",
+        ),
+
+        spacing="8",
+        width="100%",
+        padding="3.5em",
+        align="center"
+    )
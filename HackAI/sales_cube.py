@@ -0,0 +1,274 @@
+"""One sales cube (date x hour x weekday x item) behind every sales stat and chart.
+
+The cube is a sparse fact table held as parallel NumPy arrays: one row per non-empty
+cell with integer dimension codes (``day`` as days since 1970-01-01, ``hour``,
+``weekday``, ``period`` and ``item``, categorical codes into ``periods`` / ``items``)
+and the measures ``net_sales``, ``orders`` and ``quantity``. Questions such as "net
+sales by weekday" are a mask plus ``np.bincount`` over one code column rather than a
+``groupby`` over a CSV.
+
+It is built from transaction-level exports, ``data/transactions_*.csv`` with a
+``Date`` timestamp, ``Item``, ``Quantity``, ``Net Sales`` and optionally ``Orders``,
+when there are any. Until then it is assembled from the pre-aggregated exports, each
+filling the dimensions it actually has and marking the rest unknown (-1):
+
+    combined_df        day, weekday           net_sales, orders
+    salesByTime        hour                   net_sales, orders
+    itemsales_<period> period, item           net_sales (item sales), quantity
+
+so queries over a dimension only ever see facts that carry it, and nothing is counted
+twice. The built cube is saved to ``data/cube/sales_cube.npz`` together with the
+versions of its sources, and rebuilt only when one of them changes.
+
+    python -m HackAI.sales_cube
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from . import datasets
+from .item_sales import EXPORT_PATTERN, item_sales_history
+
+TRANSACTION_PATTERN = "transactions_*"
+# Everything the cube may be built from; results derived from the cube depend on these
+SOURCE_DATASETS = ("combined_df", "salesByTime")
+SOURCE_PATTERNS = (EXPORT_PATTERN, TRANSACTION_PATTERN)
+CUBE_PATH = datasets.DATA_DIR / "cube" / "sales_cube.npz"
+DIMENSIONS = ("day", "hour", "weekday", "period", "item")
+MEASURES = ("net_sales", "orders", "quantity")
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+UNKNOWN = -1
+
+CODE_DTYPES = {"day": np.int32, "hour": np.int8, "weekday": np.int8, "period": np.int16, "item": np.int32}
+MEASURE_DTYPES = {"net_sales": np.float64, "orders": np.int32, "quantity": np.int32}
+
+
+class SalesCube:
+    """Sparse sales cube: dimension code arrays, measure arrays and category labels."""
+
+    def __init__(self, columns: dict[str, np.ndarray], periods, items):
+        self.columns = columns
+        self.periods = np.asarray(periods, dtype=str)
+        self.items = np.asarray(items, dtype=str)
+
+    def __len__(self):
+        return len(self.columns["day"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values())
+
+    def totals(self, dimension: str, measure: str = "net_sales", size: int | None = None, **where) -> np.ndarray:
+        """Sum of ``measure`` per code of ``dimension`` over facts that have that dimension.
+
+        ``where`` restricts facts by other dimension codes, e.g. ``period=2``.
+        """
+        codes = self.columns[dimension]
+        mask = codes != UNKNOWN
+        for other, code in where.items():
+            mask &= self.columns[other] == code
+        minlength = size if size is not None else (int(codes.max()) + 1 if len(codes) else 0)
+        return np.bincount(codes[mask], weights=self.columns[measure][mask], minlength=max(minlength, 0))
+
+    def by_weekday(self, measure: str = "net_sales") -> np.ndarray:
+        return self.totals("weekday", measure, size=7)
+
+    def by_hour(self, measure: str = "net_sales") -> np.ndarray:
+        return self.totals("hour", measure, size=24)
+
+    def by_item(self, measure: str = "net_sales", period: str | None = None) -> np.ndarray:
+        """Totals per item code, for one period label or all of them."""
+        where = {}
+        if period is not None:
+            matches = np.flatnonzero(self.periods == period)
+            if not len(matches):
+                return np.zeros(len(self.items))
+            where["period"] = int(matches[0])
+        return self.totals("item", measure, size=len(self.items), **where)
+
+    def latest_period(self) -> str | None:
+        return max(self.periods) if len(self.periods) else None
+
+    def save(self, path, sources) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                periods=self.periods,
+                items=self.items,
+                sources=np.asarray(json.dumps(sources)),
+                **self.columns,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, sources) -> "SalesCube | None":
+        """The cube saved at ``path``, or None when it is missing or built from other sources."""
+        if not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as saved:
+            if json.loads(str(saved["sources"])) != sources:
+                return None
+            columns = {name: saved[name] for name in DIMENSIONS + MEASURES}
+            return cls(columns, saved["periods"], saved["items"])
+
+
+def _facts(n: int, **values) -> dict[str, np.ndarray]:
+    """Fact columns of length ``n``; dimensions not given are unknown, measures zero."""
+    facts = {}
+    for name, dtype in CODE_DTYPES.items():
+        facts[name] = np.asarray(values.get(name, np.full(n, UNKNOWN)), dtype=dtype)
+    for name, dtype in MEASURE_DTYPES.items():
+        facts[name] = np.asarray(values.get(name, np.zeros(n)), dtype=dtype)
+    return facts
+
+
+def _day_codes(dates: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    days = dates.to_numpy(dtype="datetime64[D]")
+    # 1970-01-01 was a Thursday (weekday 3)
+    return days.astype(np.int64), (days.astype(np.int64) + 3) % 7
+
+
+def _hours_from_labels(labels: pd.Series) -> np.ndarray:
+    """Hour of day from "3:00 PM" style labels, without per-row datetime parsing."""
+    parts = labels.astype(str).str.strip().str.extract(r"^(\d{1,2}):\d{2}\s*([AaPp][Mm])$")
+    hours = pd.to_numeric(parts[0], errors="coerce") % 12
+    return np.where(parts[1].str.upper() == "PM", hours + 12, hours)
+
+
+def _from_transactions(names) -> SalesCube:
+    frames = [datasets.load(name) for name in names]
+    lines = pd.concat(frames, ignore_index=True)
+    timestamps = pd.to_datetime(lines["Date"])
+    items = lines["Item"].astype(str).str.strip().astype("category")
+    cells = pd.DataFrame({
+        "day": timestamps.dt.normalize(),
+        "hour": timestamps.dt.hour,
+        "item": items.cat.codes,
+        "net_sales": pd.to_numeric(lines["Net Sales"], errors="coerce").fillna(0),
+        "orders": lines["Orders"] if "Orders" in lines else 0,
+        "quantity": pd.to_numeric(lines["Quantity"], errors="coerce").fillna(0),
+    }).groupby(["day", "hour", "item"], as_index=False, sort=True).sum()
+
+    day, weekday = _day_codes(cells["day"])
+    years = cells["day"].dt.year.astype(str)
+    periods = np.unique(years)
+    columns = _facts(
+        len(cells), day=day, hour=cells["hour"], weekday=weekday,
+        period=np.searchsorted(periods, years), item=cells["item"],
+        net_sales=cells["net_sales"], orders=cells["orders"], quantity=cells["quantity"],
+    )
+    return SalesCube(columns, periods, items.cat.categories)
+
+
+def _from_aggregates() -> SalesCube:
+    parts = []
+
+    if datasets.version("combined_df") is not None:
+        daily = datasets.load("combined_df")
+        day, weekday = _day_codes(daily["Date"])
+        parts.append(_facts(len(daily), day=day, weekday=weekday,
+                            net_sales=daily["Net Sales"], orders=daily["Orders"]))
+
+    if datasets.version("salesByTime") is not None:
+        hourly = datasets.load("salesByTime")
+        hours = _hours_from_labels(hourly["Time"])
+        known = ~np.isnan(hours)
+        parts.append(_facts(int(known.sum()), hour=hours[known],
+                            net_sales=hourly["Net Sales"].to_numpy()[known],
+                            orders=hourly["Orders"].to_numpy()[known]))
+
+    history = item_sales_history()
+    # Per-store rows are summed; the cube has no store dimension
+    history = history.groupby(["period", "Item"], as_index=False, sort=True)[["y", "sales"]].sum()
+    periods = pd.Categorical(history["period"])
+    items = pd.Categorical(history["Item"])
+    parts.append(_facts(len(history), period=periods.codes, item=items.codes,
+                        net_sales=history["sales"].fillna(0), quantity=history["y"]))
+
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in DIMENSIONS + MEASURES}
+    return SalesCube(columns, periods.categories, items.categories)
+
+
+def _sources() -> dict[str, list]:
+    """Source datasets of the cube and their versions; the saved cube's cache key."""
+    transactions = datasets.matching(TRANSACTION_PATTERN)
+    if transactions:
+        names = transactions
+    else:
+        names = list(SOURCE_DATASETS) + datasets.matching(EXPORT_PATTERN)
+    return {name: datasets.version(name) for name in names}
+
+
+@datasets.derived(*SOURCE_DATASETS, pattern=SOURCE_PATTERNS)
+def sales_cube() -> SalesCube:
+    """The current cube: loaded from disk when still valid, otherwise built and saved."""
+    sources = _sources()
+    cube = SalesCube.load(CUBE_PATH, sources)
+    if cube is None:
+        transactions = datasets.matching(TRANSACTION_PATTERN)
+        cube = _from_transactions(transactions) if transactions else _from_aggregates()
+        cube.save(CUBE_PATH, sources)
+    return cube
+
+
+def hour_label(hour: int) -> str:
+    return f"{hour % 12 or 12}:00 {'AM' if hour < 12 else 'PM'}"
+
+
+@datasets.derived(*SOURCE_DATASETS, pattern=SOURCE_PATTERNS)
+def sales_metrics() -> dict[str, str]:
+    """Headline metrics shown in the stat cards, each one slice of the sales cube."""
+    cube = sales_cube()
+
+    # Metric 1: Most Profitable Day
+    most_profitable_day = WEEKDAYS[int(cube.by_weekday().argmax())]
+
+    # Metric 2: Top-selling item in the most recent period
+    item_sales = cube.by_item(period=cube.latest_period())
+    top_item_name = cube.items[int(item_sales.argmax())] if item_sales.any() else "-"
+
+    # Metric 3: Peak Sales Hour
+    hourly = cube.by_hour()
+    peak_sales_hour = hour_label(int(hourly.argmax())) if hourly.any() else "-"
+
+    return {
+        "most_profitable_day": most_profitable_day,
+        "top_item_name": str(top_item_name),
+        "peak_sales_hour": peak_sales_hour,
+    }
+
+
+@datasets.derived(*SOURCE_DATASETS, pattern=SOURCE_PATTERNS)
+def sales_by_time_data() -> list[dict]:
+    """Net sales per hour of day with any sales, in time-of-day order."""
+    hourly = sales_cube().by_hour()
+    return [
+        {"Time": hour_label(hour), "Net Sales": round(float(hourly[hour]), 2)}
+        for hour in range(24)
+        if hourly[hour]
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the dashboard's sales cube.")
+    parser.parse_args(argv)
+    cube = sales_cube()
+    print(f"Sales cube: {len(cube)} facts, {len(cube.items)} items, {len(cube.periods)} periods, "
+          f"{cube.nbytes / 1024:.1f} KiB -> {CUBE_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""Paged, cached queries over the competitor sentiment summary store.
+
+The store is written by the review pipeline
+(``python comparecompanies.py yelp_text_reviews --store-dir HackAI/data/sentiment``) as
+``data/sentiment/{companies,menu_items,aspects}.csv``. Until it exists, company rankings
+fall back to the ``company_sentiment_comparison`` snapshot and the menu item and aspect
+queries come back empty.
+
+Every query is memoized per arguments with ``datasets.derived``, so paging back and
+forth or switching companies is a dictionary lookup until the store changes.
+"""
+
+from __future__ import annotations
+
+import math
+
+import pandas as pd
+
+from . import datasets
+
+STORE = "sentiment"
+COMPANIES = f"{STORE}/companies"
+MENU_ITEMS = f"{STORE}/menu_items"
+ASPECTS = f"{STORE}/aspects"
+FALLBACK_COMPANIES = "company_sentiment_comparison"
+PAGE_SIZE = 10
+TOP_ASPECTS = 3
+
+# Ranking tables the competitor page can show: dataset -> (company column, percentage column)
+RANKINGS = {
+    COMPANIES: ("Company", "Positive_Percentage"),
+    FALLBACK_COMPANIES: ("Company", "Positive_Percentage"),
+    "restaurant_rankings": ("Company", "Positive %"),
+}
+
+
+def _optional(name: str) -> pd.DataFrame | None:
+    return datasets.load(name) if datasets.version(name) is not None else None
+
+
+def companies_dataset() -> str:
+    """The pizzeria ranking to show: the store when it exists, otherwise the snapshot."""
+    return COMPANIES if datasets.version(COMPANIES) is not None else FALLBACK_COMPANIES
+
+
+@datasets.derived(*RANKINGS)
+def _ranked(name: str) -> list[dict]:
+    """Bar chart records for a ranking table, best first."""
+    table = _optional(name)
+    if table is None:
+        return []
+    company_col, percentage_col = RANKINGS[name]
+    ranked = table.sort_values(percentage_col, ascending=False, kind="stable")
+    return [
+        {"name": str(company).replace("_", " "), "company": company, "uv": round(float(pct), 1)}
+        for company, pct in zip(ranked[company_col], ranked[percentage_col])
+    ]
+
+
+def page_count(name: str, page_size: int = PAGE_SIZE) -> int:
+    return max(1, math.ceil(len(_ranked(name)) / page_size))
+
+
+@datasets.derived(*RANKINGS)
+def ranking_page(name: str, page: int, page_size: int = PAGE_SIZE) -> list[dict]:
+    """One page of a ranking; ``page`` is clamped to the pages that exist."""
+    records = _ranked(name)
+    page = min(max(page, 0), page_count(name, page_size) - 1)
+    return records[page * page_size:(page + 1) * page_size]
+
+
+@datasets.derived(COMPANIES, MENU_ITEMS, ASPECTS)
+def store_companies() -> list[str]:
+    """Companies with menu item or aspect data, in ranking order."""
+    found = set()
+    for name in (MENU_ITEMS, ASPECTS):
+        table = _optional(name)
+        if table is not None:
+            found.update(table["Company"])
+    ranked = [record["company"] for record in _ranked(COMPANIES)]
+    return [company for company in ranked if company in found] + sorted(found.difference(ranked))
+
+
+@datasets.derived(MENU_ITEMS)
+def menu_item_sentiment(company: str) -> list[dict]:
+    """Menu items mentioned in ``company``'s reviews, most mentioned first."""
+    table = _optional(MENU_ITEMS)
+    if table is None:
+        return []
+    rows = table[table["Company"] == company].sort_values("Total", ascending=False, kind="stable")
+    return rows[["Item", "Positive", "Negative", "Total"]].to_dict("records")
+
+
+@datasets.derived(ASPECTS)
+def top_aspects(company: str, n: int = TOP_ASPECTS) -> dict[str, list[str]]:
+    """The aspects most mentioned in ``company``'s positive and in its negative reviews."""
+    table = _optional(ASPECTS)
+    if table is None:
+        return {"positive": [], "negative": []}
+    rows = table[table["Company"] == company]
+    positive = rows[rows["Positive"] > 0].nlargest(n, "Positive")
+    negative = rows[rows["Negative"] > 0].nlargest(n, "Negative")
+    return {"positive": positive["Aspect"].tolist(), "negative": negative["Aspect"].tolist()}
@@ -0,0 +1,50 @@
+"""Session state storage for running the dashboard on several backend workers.
+
+Reflex keeps each session's state in the memory of the worker that created it, which
+only works with a single worker. Setting ``REDIS_URL`` (read in ``rxconfig.py``) switches
+to Reflex's Redis state manager so any worker can serve any session.
+
+``HACKAI_STATE_MANAGER=fakeredis`` runs that same Redis state manager against an
+in-process fakeredis server instead (``pip install fakeredis``), so tests exercise state
+pickling, per-session locks and expiry without a redis-server. fakeredis lives inside
+one process, so this only makes sense with a single worker.
+"""
+
+from __future__ import annotations
+
+import os
+
+from reflex.state import State
+
+try:
+    from reflex.istate.manager import StateManagerRedis
+except ImportError:  # older Reflex releases define it in reflex.state
+    from reflex.state import StateManagerRedis
+
+STAND_IN_ENV = "HACKAI_STATE_MANAGER"
+STAND_IN = "fakeredis"
+
+
+def fake_redis_state_manager(state=State) -> StateManagerRedis:
+    """A Redis state manager backed by an in-process fakeredis server."""
+    try:
+        from fakeredis import FakeAsyncRedis
+    except ImportError as err:
+        raise RuntimeError(f"{STAND_IN_ENV}={STAND_IN} needs the fakeredis package: pip install fakeredis") from err
+    return StateManagerRedis(state=state, redis=FakeAsyncRedis())
+
+
+def install_stand_in(app) -> None:
+    """Swap in the fakeredis state manager at startup when HACKAI_STATE_MANAGER asks for it."""
+    requested = os.environ.get(STAND_IN_ENV)
+    if not requested:
+        return
+    if requested != STAND_IN:
+        raise ValueError(f"Unknown {STAND_IN_ENV} {requested!r}; expected {STAND_IN!r}")
+
+    # The app only creates its own state manager once all pages are registered, so
+    # replace it from a lifespan task, which runs before the first client connects.
+    async def use_fake_redis():
+        app._state_manager = fake_redis_state_manager(app._state or State)
+
+    app.register_lifespan_task(use_fake_redis)
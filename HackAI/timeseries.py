@@ -0,0 +1,123 @@
+"""Downsampled views of long chart series.
+
+Charts never receive more points than they have pixels for. A series is served as a
+coarse overview of its whole length (for the brush) plus a detailed view of the visible
+range, each reduced to a fixed point budget with Largest-Triangle-Three-Buckets (keeps
+the visual shape of lines) or min/max bucketing (keeps every peak and trough, for bars).
+Payload size is therefore bounded by the chart width, not by how much history is kept.
+
+Series are lists of chart records as produced by ``forecasting._records``; the record
+order is the x axis.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+OVERVIEW_POINTS = 200
+MIN_POINTS = 50
+MAX_POINTS = 1000
+# Roughly one point every two pixels is as dense as a line chart can usefully draw
+PIXELS_PER_POINT = 2
+
+
+def points_for_width(width_px: int | float) -> int:
+    """Point budget for a chart ``width_px`` pixels wide."""
+    return int(min(MAX_POINTS, max(MIN_POINTS, width_px // PIXELS_PER_POINT)))
+
+
+def lttb_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the ``n_out`` points Largest-Triangle-Three-Buckets keeps from ``y``.
+
+    The first and last points are always kept; every bucket in between contributes the
+    point forming the largest triangle with the previously kept point and the mean of
+    the next bucket.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[end:edges[i + 2]].mean()
+            next_y = y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of each bucket's minimum and maximum, about ``n_out`` points in all."""
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    edges = np.linspace(0, n, max(1, n_out // 2) + 1).astype(np.int64)
+    starts = edges[:-1]
+    lows = [start + int(np.argmin(y[start:end])) for start, end in zip(starts, edges[1:])]
+    highs = [start + int(np.argmax(y[start:end])) for start, end in zip(starts, edges[1:])]
+    return np.unique(np.concatenate([lows, highs]))
+
+
+METHODS = {"lttb": lttb_indices, "minmax": minmax_indices}
+
+
+def _values(records: list[dict]) -> np.ndarray:
+    """The y value downsampling works on: actual where observed, otherwise the forecast."""
+    return np.array(
+        [r["forecast"] if r.get("actual") is None else r["actual"] for r in records],
+        dtype=float,
+    )
+
+
+def sample_indices(records: list[dict], n_out: int, method: str = "lttb") -> np.ndarray:
+    return METHODS[method](_values(records), n_out)
+
+
+def overview(records: list[dict], n_out: int = OVERVIEW_POINTS) -> list[dict]:
+    """The whole series at overview resolution."""
+    return [records[i] for i in sample_indices(records, n_out)]
+
+
+def overview_range(records: list[dict], start_index: int, end_index: int,
+                   n_out: int = OVERVIEW_POINTS) -> list[int]:
+    """Translate a brush range over ``overview(records)`` into indices into ``records``."""
+    kept = sample_indices(records, n_out)
+    if not len(kept):
+        return []
+    start_index = min(max(start_index, 0), len(kept) - 1)
+    end_index = min(max(end_index, start_index), len(kept) - 1)
+    return [int(kept[start_index]), int(kept[end_index])]
+
+
+def series_to_overview(records: list[dict], window: list[int], n_out: int = OVERVIEW_POINTS) -> list[int]:
+    """Brush positions in ``overview(records)`` covering a ``[start, end]`` window."""
+    kept = sample_indices(records, n_out)
+    if not len(kept) or not window:
+        return [0, max(len(kept) - 1, 0)]
+    start = int(np.searchsorted(kept, window[0], side="right")) - 1
+    end = int(np.searchsorted(kept, window[1], side="left"))
+    return [max(start, 0), min(end, len(kept) - 1)]
+
+
+def default_window(records: list[dict], history_points: int) -> list[int]:
+    """``history_points`` observed points before the forecast starts, through the end."""
+    observed = [i for i, r in enumerate(records) if r.get("actual") is not None]
+    last_observed = observed[-1] if observed else 0
+    return [max(0, last_observed - history_points + 1), max(len(records) - 1, 0)]
+
+
+def window(records: list[dict], bounds: list[int], n_out: int, method: str = "lttb") -> list[dict]:
+    """Records in the inclusive ``[start, end]`` range, reduced to at most ``n_out`` points."""
+    if not records:
+        return []
+    start, end = bounds
+    visible = records[start:end + 1]
+    return [visible[i] for i in sample_indices(visible, n_out, method)]
@@ -1,116 +1,82 @@
-import datetime
-import random
+import uuid
+
 import reflex as rx
 from reflex.components.radix.themes.base import (
     LiteralAccentColor,
 )
-import pandas as pd
-import numpy as np
-
-# Updated file paths with more flexible approach
-try:
-    df_2023 = pd.read_csv("HackAI/data/itemsales_2023.csv")
-    df_2024 = pd.read_csv("HackAI/data/itemsales_2024.csv")
-    combined_df = pd.read_csv('HackAI/data/combined_df.csv')
-except FileNotFoundError:
-    # Fallback paths
-    try:
-        df_2023 = pd.read_csv("data/itemsales_2023.csv")
-        df_2024 = pd.read_csv("data/itemsales_2024.csv")
-        combined_df = pd.read_csv('data/combined_df.csv')
-    except FileNotFoundError:
-        # Create sample data if files not found
-        df_2023 = pd.DataFrame({
-            "Item": ["Item 1", "Item 2", "Item 3", "Item 4", "Item 5", "Item 6"],
-            "Quantity Sold": [120, 98, 75, 65, 50, 45]
-        })
-        df_2024 = pd.DataFrame({
-            "Item": ["Item 1", "Item 2", "Item 3", "Item 4", "Item 5", "Item 6"],
-            "Quantity Sold": [150, 110, 90, 70, 55, 40]
-        })
-        # Create sample combined data
-        dates = pd.date_range(start='2023-01-01', periods=365*2)
-        combined_df = pd.DataFrame({
-            'Date': dates,
-            'Net Sales': np.random.normal(1000, 200, len(dates))
-        })
-
-item_sales_data = {
-    "2023": df_2023,
-    "2024": df_2024,
-}
-
-# Generate sample data
-daily_sample_data = []
-monthly_sample_data = []
-yearly_sample_data = []
-
-# Initialize sample data
-today = datetime.datetime.now()
-
-# Daily data
-for i in range(-15, 30):
-    date = today + datetime.timedelta(days=i)
-    forecast = 500 + 100 * np.sin(i / 10) + random.randint(-50, 50)
-    actual = forecast + random.randint(-30, 30) if i <= 0 else None
-    lower = forecast - 100
-    upper = forecast + 100
-    daily_sample_data.append({
-        "name": date.strftime('%Y-%m-%d'),
-        "actual": actual,
-        "forecast": round(forecast, 2),
-        "lower": round(lower, 2),
-        "upper": round(upper, 2)
-    })
-    
-# Monthly data
-for i in range(-6, 12):
-    date = today.replace(day=1) + datetime.timedelta(days=30*i)
-    forecast = 15000 + 3000 * np.sin(i / 3) + random.randint(-1000, 1000)
-    actual = forecast + random.randint(-500, 500) if i <= 0 else None
-    lower = forecast - 2000
-    upper = forecast + 2000
-    monthly_sample_data.append({
-        "name": date.strftime('%Y-%m'),
-        "actual": actual,
-        "forecast": round(forecast, 2),
-        "lower": round(lower, 2),
-        "upper": round(upper, 2)
-    })
-    
-# Yearly data
-current_year = today.year
-for i in range(-2, 4):
-    year = current_year + i
-    forecast = 180000 + 20000 * i + random.randint(-5000, 5000)
-    actual = forecast + random.randint(-10000, 10000) if i < 0 else None
-    lower = forecast - 30000
-    upper = forecast + 30000
-    yearly_sample_data.append({
-        "name": str(year),
-        "actual": actual,
-        "forecast": round(forecast, 2),
-        "lower": round(lower, 2),
-        "upper": round(upper, 2)
-    })
-
-
-# Unified State class combining both previous classes
+
+from .. import item_forecasting, item_sales, sales_cube, timeseries
+from ..forecasting import DAILY_HISTORY_DAYS, load_forecasts
+from ..live_reload import watcher
+
+# Aggregates recomputed by the data watcher when their source files change
+watcher.register(load_forecasts, "combined_df", "forecasts/sales_*.json")
+watcher.register(item_sales.top_items)
+watcher.register(item_forecasting.item_forecast_records)
+watcher.register(sales_cube.sales_metrics)
+watcher.register(sales_cube.sales_by_time_data)
+
+# Per-session state only holds UI selections. Chart series live once in backend memory
+# (datasets' mtime-keyed cache) and reach a client through cached computed vars, which
+# are recomputed and sent only when the selection they depend on changes. Time series are
+# downsampled to the chart width, so payloads do not grow with the history kept.
+#
+# Vars that read data also depend on data_version, which follow_data bumps after the
+# data watcher reloads changed files, so new exports appear without a restart.
 class StatsState(rx.State):
     area_toggle: bool = True
-    selected_tab: str = "daily"  # Changed default to daily
-    timeframe: str = "Monthly"
-    users_data = []
-    revenue_data = []
-    orders_data = []
-    device_data = []
-    yearly_device_data = []
-    year: str = "2024"
-    
-    # Forecast data - initialize with sample data
-    daily_data: list = daily_sample_data
-    monthly_data: list = monthly_sample_data
-    yearly_data: list = yearly_sample_data
+    selected_tab: str = "daily"
+    # Item sales period shown in the pie chart; "" means the most recent one
+    year: str = ""
+
+    # Item-level forecasts from `python -m HackAI.item_forecasting`; "" means the best seller
+    forecast_item: str = ""
+
+    # Visible [start, end] of the full daily series; [] opens on the last
+    # DAILY_HISTORY_DAYS of history plus the forecast
+    daily_window: list[int] = []
+    chart_points: int = timeseries.points_for_width(1000)
+
+    # live_reload.watcher.version this session last saw
+    data_version: int = 0
+    _follow_chain: str = ""
+
+    @rx.var(cache=True, deps=["data_version"])
+    def forecast_data(self) -> list[dict]:
+        """Monthly or yearly series of the selected tab; the daily tab uses daily_view."""
+        if self.selected_tab == "daily":
+            return []
+        series = load_forecasts()[self.selected_tab]
+        return timeseries.window(series, [0, len(series) - 1], self.chart_points, "minmax")
+
+    @rx.var(cache=True, deps=["data_version"])
+    def current_daily_window(self) -> list[int]:
+        return self.daily_window or timeseries.default_window(load_forecasts()["daily"], DAILY_HISTORY_DAYS)
+
+    @rx.var(cache=True, deps=["data_version"])
+    def daily_view(self) -> list[dict]:
+        """The visible daily range at chart resolution."""
+        if self.selected_tab != "daily":
+            return []
+        return timeseries.window(load_forecasts()["daily"], self.current_daily_window, self.chart_points)
+
+    @rx.var(cache=True, deps=["data_version"])
+    def daily_overview(self) -> list[dict]:
+        """The whole daily series at brush resolution."""
+        return timeseries.overview(load_forecasts()["daily"])
+
+    @rx.var(cache=True, deps=["data_version"])
+    def daily_brush(self) -> list[int]:
+        return timeseries.series_to_overview(load_forecasts()["daily"], self.current_daily_window)
+
+    @rx.event
+    def set_daily_window(self, start_index: int, end_index: int):
+        """Zoom the daily chart to a brush range over daily_overview."""
+        self.daily_window = timeseries.overview_range(load_forecasts()["daily"], start_index, end_index)
+
+    @rx.event
+    def set_chart_width(self, width: int):
+        self.chart_points = timeseries.points_for_width(width)
 
     @rx.event
     def set_year(self, year: str):
@@ -122,17 +88,63 @@ class StatsState(rx.State):
 
     def toggle_areachart(self):
         self.area_toggle = not self.area_toggle
-        
-    # Use a class method instead of an instance method
-    @classmethod
-    def _generate_sample_data(cls):
-        """Class method to initialize sample data if needed."""
-        if not cls.daily_data:
-            cls.daily_data = daily_sample_data
-        if not cls.monthly_data:
-            cls.monthly_data = monthly_sample_data
-        if not cls.yearly_data:
-            cls.yearly_data = yearly_sample_data
+
+    @rx.event
+    def set_forecast_item(self, item: str):
+        self.forecast_item = item
+
+    @rx.var(cache=True, deps=["data_version"])
+    def sales_metrics(self) -> dict[str, str]:
+        return sales_cube.sales_metrics()
+
+    @rx.var(cache=True, deps=["data_version"])
+    def sales_by_time_data(self) -> list[dict]:
+        return sales_cube.sales_by_time_data()
+
+    @rx.var(cache=True, deps=["data_version"])
+    def sales_periods(self) -> list[str]:
+        return item_sales.periods()
+
+    @rx.var(cache=True)
+    def current_period(self) -> str:
+        return self.year or (self.sales_periods[0] if self.sales_periods else "")
+
+    @rx.var(cache=True, deps=["data_version"])
+    def top_items_data(self) -> list[dict]:
+        return item_sales.top_items().get(self.current_period, [])
+
+    @rx.var(cache=True, deps=["data_version"])
+    def item_forecast_names(self) -> list[str]:
+        return item_forecasting.item_forecast_names()
+
+    @rx.var(cache=True)
+    def current_forecast_item(self) -> str:
+        return self.forecast_item or (self.item_forecast_names[0] if self.item_forecast_names else "")
+
+    @rx.var(cache=True, deps=["data_version"])
+    def item_forecast_data(self) -> list[dict]:
+        return item_forecasting.item_forecast_records().get(self.current_forecast_item, [])
+
+    @rx.event(background=True)
+    async def follow_data(self, chain: str = ""):
+        """Pick up data reloads for as long as the page stays open.
+
+        Each call waits for the next reload (or WAIT_SECONDS) without holding the state
+        lock, then re-queues itself through the client, so the chain ends by itself once
+        the browser is gone. Remounting the page starts a new chain and retires the old one.
+        """
+        async with self:
+            if not chain:
+                chain = self._follow_chain = uuid.uuid4().hex
+            elif chain != self._follow_chain:
+                return
+            seen = self.data_version
+        version = await watcher.wait_for_change(seen)
+        async with self:
+            if chain != self._follow_chain:
+                return
+            self.data_version = version
+        return StatsState.follow_data(chain)
 
 
 def area_toggle() -> rx.Component:
@@ -189,50 +201,42 @@ def _custom_tooltip(color: LiteralAccentColor) -> rx.Component:
         ),
     )
 
-def top_items_pie_chart() -> rx.Component:
-    def pie_for_year(year: str):
-        df = item_sales_data[year]
-        df_sorted = df.sort_values("Quantity Sold", ascending=False).head(6)
-        data = df_sorted[["Item", "Quantity Sold"]].rename(
-            columns={"Item": "name", "Quantity Sold": "value"}
-        ).to_dict("records")
-
-        colors = [
-            "var(--blue-8)",
-            "var(--green-8)",
-            "var(--purple-8)",
-            "var(--orange-8)",
-            "var(--cyan-8)",
-            "var(--red-8)",
-        ]
-
-        cells = [rx.recharts.cell(fill=colors[i % len(colors)]) for i in range(len(data))]
-
-        return rx.recharts.pie_chart(
-            rx.recharts.pie(
-                data=data,
-                data_key="value",
-                name_key="name",
-                cx="50%",
-                cy="50%",
-                padding_angle=1,
-                inner_radius="70",
-                outer_radius="100",
-                label=True,
-                *cells
-            ),
-            rx.recharts.legend(),
-            height=300,
-        )
+PIE_COLORS = [
+    "var(--blue-8)",
+    "var(--green-8)",
+    "var(--purple-8)",
+    "var(--orange-8)",
+    "var(--cyan-8)",
+    "var(--red-8)",
+]
 
-    return rx.cond(
-        StatsState.year == "2023",
-        pie_for_year("2023"),
-        pie_for_year("2024"),
+
+def top_items_pie_chart() -> rx.Component:
+    """Top items of the selected period; the data comes from StatsState.top_items_data."""
+    cells = [rx.recharts.cell(fill=PIE_COLORS[i % len(PIE_COLORS)]) for i in range(item_sales.TOP_N)]
+    return rx.recharts.pie_chart(
+        rx.recharts.pie(
+            *cells,
+            data=StatsState.top_items_data,
+            data_key="value",
+            name_key="name",
+            cx="50%",
+            cy="50%",
+            padding_angle=1,
+            inner_radius="70",
+            outer_radius="100",
+            label=True,
+        ),
+        rx.recharts.legend(),
+        height=300,
     )
 
 def daily_forecast_graph() -> rx.Component:
-    """Render the daily forecast graph."""
+    """Render the daily forecast graph.
+
+    The main chart shows the visible range at chart resolution; the brush sits on a
+    small overview of the whole series and selects that range.
+    """
     return rx.vstack(
         rx.heading("Daily Sales Forecast", size="3"),
         rx.recharts.composed_chart(
@@ -270,15 +274,30 @@ def daily_forecast_graph() -> rx.Component:
             rx.recharts.y_axis(label="Sales"),
             rx.recharts.legend(),
             rx.recharts.graphing_tooltip(),
+            data=StatsState.daily_view,
+            width="100%",
+            height=350,
+        ),
+        rx.recharts.area_chart(
+            rx.recharts.area(
+                data_key="forecast",
+                stroke="#8884d8",
+                fill="#8884d8",
+                fill_opacity=0.2,
+            ),
             rx.recharts.brush(
-                data_key="name", 
-                height=30, 
-                stroke="#8884d8"
+                data_key="name",
+                height=30,
+                stroke="#8884d8",
+                start_index=StatsState.daily_brush[0],
+                end_index=StatsState.daily_brush[1],
+                on_change=StatsState.set_daily_window.debounce(200),
             ),
-            data=StatsState.daily_data,  # Using directly
+            data=StatsState.daily_overview,
             width="100%",
-            height=350,
+            height=80,
         ),
+        on_mount=rx.call_script("window.innerWidth", callback=StatsState.set_chart_width),
         width="100%",
     )
 
@@ -301,7 +320,7 @@ def monthly_forecast_graph() -> rx.Component:
             rx.recharts.legend(),
             rx.recharts.graphing_tooltip(),
             rx.recharts.cartesian_grid(stroke_dasharray="3 3"),
-            data=StatsState.monthly_data,  # Using directly
+            data=StatsState.forecast_data,
             width="100%",
             height=300,
         ),
@@ -342,10 +361,53 @@ def yearly_forecast_graph() -> rx.Component:
             rx.recharts.legend(),
             rx.recharts.graphing_tooltip(),
             rx.recharts.cartesian_grid(stroke_dasharray="3 3"),
-            data=StatsState.yearly_data,  # Using directly
+            data=StatsState.forecast_data,
             width="100%",
             height=300,
         ),
         width="100%",
     )
 
+def item_forecast_graph() -> rx.Component:
+    """Render the forecast of the selected menu item."""
+    return rx.recharts.line_chart(
+        rx.recharts.line(
+            data_key="actual",
+            stroke="#ff7300",
+            type_="monotone",
+            stroke_width=2,
+            name="Actual"
+        ),
+        rx.recharts.line(
+            data_key="forecast",
+            stroke="#8884d8",
+            type_="monotone",
+            stroke_width=2,
+            name="Forecast"
+        ),
+        rx.recharts.line(
+            data_key="lower",
+            stroke="#82ca9d",
+            stroke_dasharray="3 3",
+            type_="monotone",
+            name="Lower Bound"
+        ),
+        rx.recharts.line(
+            data_key="upper",
+            stroke="#82ca9d",
+            stroke_dasharray="3 3",
+            type_="monotone",
+            name="Upper Bound"
+        ),
+        rx.recharts.x_axis(
+            data_key="name",
+            label="Period"
+        ),
+        rx.recharts.y_axis(label="Quantity Sold"),
+        rx.recharts.legend(),
+        rx.recharts.graphing_tooltip(),
+        rx.recharts.cartesian_grid(stroke_dasharray="3 3"),
+        data=StatsState.item_forecast_data,
+        width="100%",
+        height=300,
+    )
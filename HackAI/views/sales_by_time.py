@@ -1,5 +1,4 @@
 import reflex as rx
-import pandas as pd
 from reflex.components.recharts import (
     bar_chart,
     bar,
@@ -10,18 +9,8 @@ from reflex.components.recharts import (
     responsive_container,
 )
 
-# Load and clean the data
-df = pd.read_csv("HackAI/data/salesByTime.csv")
+from .charts import StatsState
 
-# Ensure Time is a string and sort by logical time order
-df["Time"] = df["Time"].astype(str)
-
-# Create a consistent sort order using pandas datetime
-df["Time_Sort"] = pd.to_datetime(df["Time"], errors="coerce")
-df = df.dropna(subset=["Time_Sort"]).sort_values("Time_Sort")
-
-# Convert to dict for the chart
-chart_data = df[["Time", "Net Sales"]].to_dict(orient="records")
 
 def sales_by_time_chart() -> rx.Component:
     return rx.box(
@@ -32,7 +21,7 @@ def sales_by_time_chart() -> rx.Component:
                 y_axis(),
                 tooltip(),
                 bar(data_key="Net Sales", radius=[6, 6, 0, 0]),
-                data=chart_data,
+                data=StatsState.sales_by_time_data,
             ),
             width="100%",
             height=300,
@@ -1,25 +1,8 @@
 import reflex as rx
-import pandas as pd
 from reflex.components.radix.themes.base import LiteralAccentColor
 
-# Load and process data
-itemsales_2024 = pd.read_csv("HackAI/data/itemsales_2024.csv")
-itemsales_2024["Total Sales"] = itemsales_2024["Total Sales"].replace(r'[\$,]', '', regex=True).astype(float)
+from .charts import StatsState
 
-combined_df = pd.read_csv("HackAI/data/combined_df.csv")
-combined_df["Date"] = pd.to_datetime(combined_df["Date"])
-combined_df["DayOfWeek"] = combined_df["Date"].dt.day_name()
-combined_df["Hour"] = combined_df["Date"].dt.hour
-
-# Metric 1: Most Profitable Day
-most_profitable_day = combined_df.groupby("DayOfWeek")["Net Sales"].sum().sort_values(ascending=False).idxmax()
-
-# Metric 2: Top-selling item in 2024
-top_item_name = itemsales_2024.sort_values("Total Sales", ascending=False).iloc[0]["Item"]
-
-# Metric 3: Peak Sales Hour
-top_hour = combined_df.groupby("Hour")["Net Sales"].sum().idxmax()
-peak_sales_hour = pd.to_datetime(str(top_hour), format="%H").strftime("%I:00 %p")
 
 # Card generator
 def stats_card(
@@ -64,22 +47,23 @@ def stats_card(
 
 # Main stat card grid
 def stats_cards() -> rx.Component:
+    metrics = StatsState.sales_metrics
     return rx.grid(
         stats_card(
             stat_name="Most Profitable Day",
-            value=most_profitable_day,
+            value=metrics["most_profitable_day"],
             icon="calendar",
             icon_color="pink",
         ),
         stats_card(
             stat_name="Top-Selling Item",
-            value=top_item_name,
+            value=metrics["top_item_name"],
             icon="star",
             icon_color="amber",
         ),
         stats_card(
             stat_name="Peak Sales Hour",
-            value=peak_sales_hour,
+            value=metrics["peak_sales_hour"],
             icon="clock",
             icon_color="cyan",
         ),
@@ -0,0 +1,200 @@
+"""CPU throughput of the batched ingredient classifier.
+
+For each batch size, reports images/sec for model inference alone (images decoded
+up front) and end to end through the ``MicroBatcher``, which decodes in the thread
+pool and batches single-image requests under a latency deadline. Decoding throughput
+is reported separately.
+
+The ``model1.h5`` in assets/ is not an image classifier (see ingredients/classifier.py);
+``--random-model`` benchmarks a randomly initialised MobileNetV2 with one output per
+mapped class instead, which has the size and cost of a realistic classifier.
+
+Examples:
+    python benchmarks/bench_ingredient_classifier.py --random-model
+    python benchmarks/bench_ingredient_classifier.py --model path/to/classifier.h5 --output bench.json
+    python benchmarks/bench_ingredient_classifier.py --random-model --batch-sizes 1 8 64 --images 512
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from ingredients.classifier import (  # noqa: E402
+    IMAGE_DIR,
+    MODEL_PATH,
+    IncompatibleModelError,
+    IngredientClassifier,
+    MicroBatcher,
+    image_paths,
+    load_class_mapping,
+)
+
+DEFAULT_BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64]
+
+
+def build_random_model(image_size, n_classes, seed):
+    """A randomly initialised MobileNetV2 classifier; no weights are downloaded."""
+    from tensorflow import keras
+
+    keras.utils.set_random_seed(seed)
+    return keras.applications.MobileNetV2(
+        input_shape=(image_size, image_size, 3), weights=None, classes=n_classes,
+        classifier_activation='softmax',
+    )
+
+
+def _images_per_second(n_images, seconds):
+    return n_images / seconds if seconds else 0.0
+
+
+def bench_decode(classifier, paths, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        classifier.decode_many(paths)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def bench_inference(classifier, images, batch_size, repeat):
+    """Median seconds to run ``images`` through the model in batches of ``batch_size``."""
+    classifier.predict(images[:batch_size])  # warm-up: graph tracing per input shape
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for offset in range(0, len(images), batch_size):
+            classifier.predict(images[offset:offset + batch_size])
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def bench_batcher(classifier, sources, batch_size, max_latency):
+    """Submit every source at once; return (seconds, request latencies, mean batch size)."""
+    batcher = MicroBatcher(classifier, max_batch=batch_size, max_latency=max_latency)
+    try:
+        latencies = []
+        start = time.perf_counter()
+        futures = []
+        for source in sources:
+            submitted = time.perf_counter()
+            future = batcher.submit(source)
+            future.add_done_callback(lambda _, submitted=submitted: latencies.append(time.perf_counter() - submitted))
+            futures.append(future)
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - start
+    finally:
+        batcher.close()
+    return elapsed, latencies, statistics.mean(batcher.batch_sizes)
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def run_benchmarks(args, classifier):
+    paths = image_paths(args.image_dir)
+    if not paths:
+        raise SystemExit(f"No images found under {args.image_dir}")
+    # Cycle the image set up to the requested count so large batches have enough work
+    sources = [paths[i % len(paths)] for i in range(args.images)]
+    encoded = [open(path, 'rb').read() for path in sources]
+
+    decode_seconds = bench_decode(classifier, encoded, args.repeat)
+    print(f"Decode + resize to {classifier.image_size}: "
+          f"{_images_per_second(len(encoded), decode_seconds):,.0f} images/s")
+
+    images = classifier.decode_many(encoded)
+    results = []
+    print(f"\n{'batch':>5}  {'inference':>14}  {'end to end':>14}  {'mean batch':>10}  {'p50':>9}  {'p99':>9}")
+    for batch_size in args.batch_sizes:
+        inference_seconds = bench_inference(classifier, images, batch_size, args.repeat)
+        e2e_seconds, latencies, mean_batch = bench_batcher(classifier, encoded, batch_size, args.max_latency)
+        result = {
+            'batch_size': batch_size,
+            'inference_images_per_sec': _images_per_second(len(images), inference_seconds),
+            'end_to_end_images_per_sec': _images_per_second(len(encoded), e2e_seconds),
+            'mean_batch': mean_batch,
+            'latency_p50_ms': _percentile(latencies, 50) * 1000,
+            'latency_p99_ms': _percentile(latencies, 99) * 1000,
+        }
+        results.append(result)
+        print(f"{batch_size:>5}  {result['inference_images_per_sec']:>10,.1f} /s  "
+              f"{result['end_to_end_images_per_sec']:>10,.1f} /s  {mean_batch:>10.1f}  "
+              f"{result['latency_p50_ms']:>7.1f}ms  {result['latency_p99_ms']:>7.1f}ms")
+    return {'decode_images_per_sec': _images_per_second(len(encoded), decode_seconds), 'results': results}
+
+
+def environment_info():
+    import tensorflow as tf
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'tensorflow': tf.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Benchmark batched ingredient image classification on CPU.")
+    parser.add_argument('--model', default=str(MODEL_PATH),
+                        help="Classifier to load, .h5 or .tflite (default: assets/model1.h5)")
+    parser.add_argument('--random-model', action='store_true',
+                        help="Benchmark a randomly initialised MobileNetV2 instead of --model")
+    parser.add_argument('--image-size', type=int, default=224, help="Input size of the random model (default: 224)")
+    parser.add_argument('--image-dir', default=str(IMAGE_DIR), help="Images to classify (default: ingredients_data)")
+    parser.add_argument('--images', type=int, default=256, help="Images per measurement (default: 256)")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=DEFAULT_BATCH_SIZES,
+                        help="Batch sizes to measure (default: 1 2 4 ... 64)")
+    parser.add_argument('--max-latency', type=float, default=0.010,
+                        help="Micro-batch deadline in seconds (default: 0.010)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed repetitions (default: 3)")
+    parser.add_argument('--seed', type=int, default=1234, help="Seed for the random model's weights")
+    parser.add_argument('--output', default=None, metavar='PATH', help="Write results as JSON to PATH")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    # Keep TensorFlow's start-up logging out of the results table
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+    if args.random_model:
+        idx_to_class, _ = load_class_mapping()
+        classifier = IngredientClassifier(model=build_random_model(args.image_size, len(idx_to_class), args.seed),
+                                          model_path='random MobileNetV2')
+    else:
+        try:
+            classifier = IngredientClassifier(model_path=args.model)
+        except IncompatibleModelError as err:
+            print(f"{err}\nPass --random-model to benchmark a stand-in classifier of realistic size.",
+                  file=sys.stderr)
+            return 1
+
+    try:
+        payload = run_benchmarks(args, classifier)
+    finally:
+        classifier.close()
+    payload['environment'] = environment_info()
+    payload['model'] = 'random MobileNetV2' if args.random_model else args.model
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+        print(f"\nResults written to: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
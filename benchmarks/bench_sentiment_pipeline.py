@@ -0,0 +1,316 @@
+"""Reproducible benchmarks for the review sentiment pipeline.
+
+Generates synthetic review corpora in every format ``parse_reviews_text`` understands and
+times parsing, inference, aggregation and report generation separately. Inference runs
+against a tiny randomly initialised BERT built locally, so no network access is needed.
+
+Examples:
+    python benchmarks/bench_sentiment_pipeline.py --output bench.json
+    python benchmarks/bench_sentiment_pipeline.py --sizes 1000 1000000 --stages parse aggregate
+    python benchmarks/bench_sentiment_pipeline.py --compare bench.json --threshold 0.15
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from comparecompanies import (  # noqa: E402
+    analyze_sentiment,
+    build_comparison_df,
+    generate_ranking_report,
+    load_sentiment_pipeline,
+    parse_reviews_text,
+)
+
+FORMATS = ['yelp', 'labeled', 'rated', 'raw']
+# Progress message of the parse_reviews_text branch each format must reach, and of the
+# fallback it must not fall through to
+PARSER_BRANCHES = {
+    'yelp': ("Using Yelp-style parsing", "Standard parsing failed"),
+    'labeled': ("Using labeled format parsing", "Standard parsing failed"),
+    'rated': ("Trying raw text extraction", "No structured reviews found"),
+    'raw': ("Processing as raw review text", None),
+}
+STAGES = ['parse', 'inference', 'aggregate', 'report']
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+POSITIVE_WORDS = ['great', 'crispy', 'delicious', 'friendly', 'fresh', 'amazing', 'perfect', 'tasty']
+NEGATIVE_WORDS = ['soggy', 'cold', 'rude', 'bland', 'pricey', 'slow', 'greasy', 'burnt']
+FILLER_WORDS = ['pizza', 'crust', 'sauce', 'cheese', 'service', 'order', 'staff', 'place', 'the',
+                'was', 'and', 'with', 'we', 'our', 'really', 'very', 'topping', 'delivery', 'wings']
+
+
+def _review_sentence(rng, rating, n_words):
+    """Build review text whose vocabulary leans with the star rating."""
+    lean = POSITIVE_WORDS if rating >= 3 else NEGATIVE_WORDS
+    words = [rng.choice(lean) if rng.random() < 0.25 else rng.choice(FILLER_WORDS) for _ in range(n_words)]
+    return ' '.join(words).capitalize() + '.'
+
+
+def generate_company_text(rng, fmt, n_reviews):
+    """Return the review file text for one company in the given file format."""
+    blocks = []
+    for _ in range(n_reviews):
+        rating = rng.randint(1, 5)
+        text = _review_sentence(rng, rating, rng.randint(12, 60))
+        if fmt == 'yelp':
+            blocks.append(f"{rating} stars\n{text}")
+        elif fmt == 'labeled':
+            blocks.append(f"Rating: {rating} stars\nReview: {text}")
+        elif fmt == 'rated':
+            # Only the raw-text fallback understands inline "rated X/5" markers
+            blocks.append(f"Customer rated {rating}/5 {text}")
+        else:
+            blocks.append(text)
+    return '\n\n'.join(blocks) + '\n'
+
+
+def generate_corpus(fmt, size, n_companies, seed):
+    """Generate ``size`` reviews spread over ``n_companies`` synthetic companies."""
+    rng = random.Random(f"{seed}-{fmt}-{size}")
+    per_company = max(1, size // n_companies)
+    return {
+        f"Company_{i:03d}": generate_company_text(rng, fmt, per_company)
+        for i in range(n_companies)
+    }
+
+
+def check_parser_branch(fmt, corpus):
+    """Fail unless a company of ``corpus`` goes through the parser branch ``fmt`` stands for."""
+    name, text = next(iter(corpus.items()))
+    output = io.StringIO()
+    with redirect_stdout(output):
+        parse_reviews_text(text, name)
+    expected, unexpected = PARSER_BRANCHES[fmt]
+    if expected not in output.getvalue() or (unexpected and unexpected in output.getvalue()):
+        raise RuntimeError(f"the {fmt!r} corpus did not reach the parser branch it benchmarks:\n{output.getvalue()}")
+
+
+def build_tiny_model(model_dir, seed):
+    """Create (once) a tiny randomly initialised BERT sentiment classifier in ``model_dir``."""
+    if os.path.exists(os.path.join(model_dir, 'config.json')):
+        return model_dir
+
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    os.makedirs(model_dir, exist_ok=True)
+    vocab = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + sorted(
+        set(POSITIVE_WORDS + NEGATIVE_WORDS + FILLER_WORDS + ['customer', 'rated', 'stars', 'review', 'rating'])
+    ) + [str(i) for i in range(10)] + list('./:,')
+    vocab_path = os.path.join(model_dir, 'vocab.txt')
+    with open(vocab_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(vocab) + '\n')
+
+    tokenizer = BertTokenizerFast(vocab_file=vocab_path, do_lower_case=True, model_max_length=128)
+    config = BertConfig(
+        vocab_size=len(vocab),
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        max_position_embeddings=128,
+        id2label={0: 'NEGATIVE', 1: 'POSITIVE'},
+        label2id={'NEGATIVE': 0, 'POSITIVE': 1},
+    )
+    torch.manual_seed(seed)
+    BertForSequenceClassification(config).save_pretrained(model_dir)
+    tokenizer.save_pretrained(model_dir)
+    return model_dir
+
+
+def label_from_rating(reviews):
+    """Attach deterministic sentiment fields so aggregation can run without inference."""
+    for i, review in enumerate(reviews):
+        rating = review.get('rating', 0)
+        if rating >= 4 or (rating == 0 and i % 3):
+            review['sentiment'], review['sentiment_label'] = 'positive', 'POSITIVE'
+        elif rating == 3:
+            review['sentiment'], review['sentiment_label'] = 'neutral', 'NEUTRAL'
+        else:
+            review['sentiment'], review['sentiment_label'] = 'negative', 'NEGATIVE'
+        review['sentiment_score'] = 0.5 + (i % 50) / 100
+    return reviews
+
+
+def _time(func, repeat):
+    """Run ``func`` ``repeat`` times with stdout silenced; return (timings, last result)."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        with redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def _record(results, fmt, size, stage_name, timings, items):
+    median = statistics.median(timings)
+    results.append({
+        'format': fmt,
+        'size': size,
+        'stage': stage_name,
+        'items': items,
+        'repeat': len(timings),
+        'seconds_min': round(min(timings), 6),
+        'seconds_median': round(median, 6),
+        'items_per_second': round(items / median, 2) if median > 0 else None,
+    })
+    print(f"{fmt:<8} {size:>9} {stage_name:<10} {median:>10.4f}s  {items / median if median else 0:>14,.0f} items/s")
+
+
+def run_benchmarks(args):
+    results = []
+    analyzer = None
+    if 'inference' in args.stages:
+        model_dir = build_tiny_model(args.model_dir, args.seed)
+        with redirect_stdout(io.StringIO()):
+            analyzer = load_sentiment_pipeline(model_dir, device='cpu')
+
+    report_dir = tempfile.mkdtemp(prefix='bench_report_')
+    print(f"{'format':<8} {'size':>9} {'stage':<10} {'median':>11}  {'throughput':>20}")
+    for fmt in args.formats:
+        for size in args.sizes:
+            corpus = generate_corpus(fmt, size, args.companies, args.seed)
+            check_parser_branch(fmt, corpus)
+
+            def parse_all():
+                return {name: parse_reviews_text(text, name)[1] for name, text in corpus.items()}
+
+            # Parsing always runs since every later stage needs its output
+            timings, companies_data = _time(parse_all, args.repeat if 'parse' in args.stages else 1)
+            n_reviews = sum(len(reviews) for reviews in companies_data.values())
+            if 'parse' in args.stages:
+                _record(results, fmt, size, 'parse', timings, n_reviews)
+
+            if 'inference' in args.stages:
+                sample = [dict(review) for reviews in companies_data.values() for review in reviews]
+                sample = sample[:args.inference_limit]
+                timings, _ = _time(
+                    lambda: analyze_sentiment(sample, sentiment_analyzer=analyzer, batch_size=args.batch_size),
+                    args.repeat)
+                _record(results, fmt, size, 'inference', timings, len(sample))
+
+            for reviews in companies_data.values():
+                label_from_rating(reviews)
+
+            if 'aggregate' in args.stages or 'report' in args.stages:
+                timings, comparison_df = _time(lambda: build_comparison_df(companies_data), args.repeat)
+                if 'aggregate' in args.stages:
+                    _record(results, fmt, size, 'aggregate', timings, n_reviews)
+
+                if 'report' in args.stages:
+                    timings, _ = _time(lambda: generate_ranking_report(comparison_df, report_dir), args.repeat)
+                    _record(results, fmt, size, 'report', timings, len(comparison_df))
+    return results
+
+
+def environment_info():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'git_commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare_results(results, baseline_path, threshold):
+    """Print a comparison against a saved baseline and return the list of regressions."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(r['format'], r['size'], r['stage']): r for r in baseline['results']}
+
+    regressions = []
+    print(f"\nComparison against {baseline_path} (threshold {threshold:.0%}):")
+    for result in results:
+        key = (result['format'], result['size'], result['stage'])
+        if key not in previous:
+            continue
+        before = previous[key]['seconds_median']
+        after = result['seconds_median']
+        change = (after - before) / before if before else 0.0
+        flag = 'REGRESSION' if change > threshold else ('faster' if change < -threshold else '')
+        print(f"{key[0]:<8} {key[1]:>9} {key[2]:<10} {before:>10.4f}s -> {after:>10.4f}s  {change:>+7.1%}  {flag}")
+        if change > threshold:
+            regressions.append({**result, 'baseline_seconds_median': before, 'change': round(change, 4)})
+    return regressions
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the review sentiment pipeline on synthetic corpora.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Corpus sizes in reviews (default: 1k 10k 100k 1M)")
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=FORMATS,
+                        help="Review file formats to generate (default: all)")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES,
+                        help="Stages to time (default: all)")
+    parser.add_argument('--companies', type=int, default=20, help="Companies per corpus (default: 20)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed repetitions per stage (default: 3)")
+    parser.add_argument('--seed', type=int, default=1234, help="Seed for corpora and model weights")
+    parser.add_argument('--batch-size', type=int, default=32, help="Inference batch size (default: 32)")
+    parser.add_argument('--inference-limit', type=int, default=2_000,
+                        help="Maximum reviews per corpus sent through the model (default: 2000)")
+    parser.add_argument('--model-dir', default=os.path.join(tempfile.gettempdir(), 'sliceprice_tiny_bert'),
+                        help="Where the tiny local model is created and cached")
+    parser.add_argument('--output', default=None, metavar='PATH', help="Write results as JSON to PATH")
+    parser.add_argument('--compare', default=None, metavar='BASELINE',
+                        help="Compare against a previous --output file and flag regressions")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Relative slowdown of the median that counts as a regression (default: 0.10)")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    results = run_benchmarks(args)
+    payload = {
+        'environment': environment_info(),
+        'config': {
+            'sizes': args.sizes,
+            'formats': args.formats,
+            'stages': args.stages,
+            'companies': args.companies,
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'batch_size': args.batch_size,
+            'inference_limit': args.inference_limit,
+        },
+        'results': results,
+    }
+
+    exit_code = 0
+    if args.compare:
+        payload['regressions'] = compare_results(results, args.compare, args.threshold)
+        if payload['regressions']:
+            print(f"\n{len(payload['regressions'])} regression(s) above {args.threshold:.0%}")
+            exit_code = 1
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+        print(f"\nResults written to: {args.output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""Websocket load test for the dashboard's state manager.
+
+Starts the Reflex backend with 1 and then 4 workers, connects N simulated browser
+sessions over the same socket.io endpoint the frontend uses, and drives each through
+random tab switches and year changes on the analysis page. Event latency is measured
+from sending an event to receiving its final state delta, and reported as p50/p99 per
+worker count.
+
+Several workers need a shared state manager: start a redis-server and pass its URL.
+``--state-manager fakeredis`` uses the in-process stand-in from HackAI/state_manager.py
+instead, which only supports a single worker.
+
+Examples:
+    python benchmarks/load_dashboard_state.py --redis-url redis://localhost:6379/0
+    python benchmarks/load_dashboard_state.py --clients 200 --events 50 --output load.json
+    python benchmarks/load_dashboard_state.py --state-manager fakeredis --workers 1
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import signal
+import asyncio
+import argparse
+import statistics
+import subprocess
+import tempfile
+import urllib.request
+
+import socketio
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from reflex.state import State  # noqa: E402
+
+from HackAI.views.charts import StatsState  # noqa: E402
+
+EVENT_NAMESPACE = "/_event"
+PAGE = "/analysis"
+TABS = ["daily", "monthly", "yearly"]
+YEARS = ["2023", "2024"]
+
+
+def event_names():
+    stats = StatsState.get_full_name()
+    return {
+        'hydrate': f"{State.get_full_name()}.hydrate",
+        'tab': f"{stats}.set_selected_tab",
+        'year': f"{stats}.set_year",
+    }
+
+
+def start_backend(workers, port, state_manager, redis_url, log_path):
+    """Launch ``reflex run`` in production mode and return the process."""
+    env = dict(os.environ, GUNICORN_WORKERS=str(workers))
+    env.pop('REDIS_URL', None)
+    env.pop('HACKAI_STATE_MANAGER', None)
+    if state_manager == 'redis':
+        env['REDIS_URL'] = redis_url
+    else:
+        env['HACKAI_STATE_MANAGER'] = 'fakeredis'
+    command = [sys.executable, '-m', 'reflex', 'run', '--env', 'prod', '--backend-only',
+               '--backend-port', str(port)]
+    log = open(log_path, 'ab')
+    # Own process group, so the worker processes are stopped together with the master
+    return subprocess.Popen(command, cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+                            start_new_session=True)
+
+
+def wait_until_ready(process, port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with code {process.returncode} during startup")
+        try:
+            with urllib.request.urlopen(f"http://localhost:{port}/ping", timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Backend did not answer /ping within {timeout}s")
+
+
+def stop_backend(process):
+    if process.poll() is not None:
+        return
+    os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+
+
+class DashboardClient:
+    """One simulated browser session on the analysis page."""
+
+    def __init__(self, url, names, event_timeout):
+        self.url = url
+        self.names = names
+        self.event_timeout = event_timeout
+        self.token = str(uuid.uuid4())
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self._final = asyncio.Event()
+        self.sio.on('event', self._on_update, namespace=EVENT_NAMESPACE)
+
+    async def _on_update(self, update):
+        if isinstance(update, str):
+            update = json.loads(update)
+        if update.get('final', True):
+            self._final.set()
+
+    async def connect(self):
+        await self.sio.connect(self.url, namespaces=[EVENT_NAMESPACE], socketio_path=EVENT_NAMESPACE,
+                               transports=['websocket'])
+
+    async def send(self, name, payload):
+        """Send one event and return the seconds until its final delta arrives."""
+        self._final.clear()
+        event = {
+            'name': name,
+            'payload': payload,
+            'token': self.token,
+            'router_data': {'pathname': PAGE, 'asPath': PAGE, 'query': {}},
+        }
+        start = time.perf_counter()
+        await self.sio.emit('event', event, namespace=EVENT_NAMESPACE)
+        await asyncio.wait_for(self._final.wait(), self.event_timeout)
+        return time.perf_counter() - start
+
+    async def run(self, n_events, rng, latencies, errors):
+        try:
+            await self.send(self.names['hydrate'], {})
+        except asyncio.TimeoutError:
+            errors.append('hydrate timeout')
+            return
+        for _ in range(n_events):
+            if rng.random() < 0.5:
+                name, payload = self.names['tab'], {'tab': rng.choice(TABS)}
+            else:
+                name, payload = self.names['year'], {'year': rng.choice(YEARS)}
+            try:
+                latencies.append(await self.send(name, payload))
+            except asyncio.TimeoutError:
+                errors.append(f"{name} timeout")
+
+    async def close(self):
+        await self.sio.disconnect()
+
+
+async def drive_clients(url, n_clients, n_events, seed, event_timeout):
+    names = event_names()
+    clients = [DashboardClient(url, names, event_timeout) for _ in range(n_clients)]
+    await asyncio.gather(*(client.connect() for client in clients))
+    latencies, errors = [], []
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(client.run(n_events, random.Random(seed + i), latencies, errors)
+                               for i, client in enumerate(clients)))
+    finally:
+        elapsed = time.perf_counter() - start
+        await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
+    return latencies, errors, elapsed
+
+
+def summarize(workers, latencies, errors, elapsed, args):
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) >= 2 else [float('nan')] * 99
+    return {
+        'workers': workers,
+        'state_manager': args.state_manager,
+        'clients': args.clients,
+        'events_per_client': args.events,
+        'events': len(latencies),
+        'errors': len(errors),
+        'p50_ms': cuts[49] * 1000,
+        'p99_ms': cuts[98] * 1000,
+        'mean_ms': statistics.fmean(latencies) * 1000 if latencies else float('nan'),
+        'max_ms': max(latencies) * 1000 if latencies else float('nan'),
+        'events_per_second': len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+def run_load_test(args):
+    results = []
+    for workers in args.workers:
+        print(f"Starting backend with {workers} worker(s) ({args.state_manager})...")
+        process = start_backend(workers, args.port, args.state_manager, args.redis_url, args.log)
+        try:
+            wait_until_ready(process, args.port, args.startup_timeout)
+            latencies, errors, elapsed = asyncio.run(drive_clients(
+                f"http://localhost:{args.port}", args.clients, args.events, args.seed, args.event_timeout))
+        finally:
+            stop_backend(process)
+        result = summarize(workers, latencies, errors, elapsed, args)
+        results.append(result)
+        print(f"  {result['events']} events, {result['errors']} errors: "
+              f"p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, "
+              f"{result['events_per_second']:.0f} events/s")
+    return results
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Load test dashboard event latency over websockets.")
+    parser.add_argument('--clients', type=int, default=50, help="Simulated browser sessions (default: 50)")
+    parser.add_argument('--events', type=int, default=30, help="Events sent by each client (default: 30)")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4],
+                        help="Backend worker counts to compare (default: 1 4)")
+    parser.add_argument('--state-manager', choices=['redis', 'fakeredis'], default='redis',
+                        help="Shared Redis server, or the single-process fakeredis stand-in")
+    parser.add_argument('--redis-url', default='redis://localhost:6379/0',
+                        help="Redis server for --state-manager redis (default: redis://localhost:6379/0)")
+    parser.add_argument('--port', type=int, default=8765, help="Backend port (default: 8765)")
+    parser.add_argument('--startup-timeout', type=float, default=120, help="Seconds to wait for the backend")
+    parser.add_argument('--event-timeout', type=float, default=10, help="Seconds before an event counts as failed")
+    parser.add_argument('--seed', type=int, default=1234, help="Seed for the clients' event sequences")
+    parser.add_argument('--log', default=os.path.join(tempfile.gettempdir(), 'sliceprice_load_backend.log'),
+                        help="Where backend output goes")
+    parser.add_argument('--output', default=None, metavar='PATH', help="Write results as JSON to PATH")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.state_manager == 'fakeredis' and any(workers != 1 for workers in args.workers):
+        print("fakeredis lives inside one process; use --workers 1 or a real --redis-url", file=sys.stderr)
+        return 2
+
+    results = run_load_test(args)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'results': results}, f, indent=2)
+        print(f"Results written to: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,24 @@
 import os
 import re
-from transformers import pipeline, AutoTokenizer
+import sys
+import glob
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from transformers import pipeline
 import pandas as pd
 import matplotlib.pyplot as plt
 from tqdm import tqdm
 import numpy as np
+from discrepancies import rank_discrepancies, score_discrepancies, summarize_discrepancies
+from incremental_ranking import RankingState
+from pipeline_profiler import add_profiling_arguments, count, profiled, profiling_session, stage
+from sentiment_store import load_menu_items, write_sentiment_store
 
+DEFAULT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+FILENAME_SUFFIXES = ['_reviews', '_reviews_with_ratings', '_yelp', '_google', '_data']
+
+@profiled()
 def parse_reviews_text(text_content, company_name):
     """Parse reviews using multiple possible formats."""
     # Split the text by newline to process line by line
@@ -18,8 +31,10 @@ def parse_reviews_text(text_content, company_name):
     # Try to detect format based on first few lines
     print(f"Analyzing format for {company_name}...")
     
+    # "Rating: 5 stars" lines also contain "5 stars", so check for the labeled format first
+    labeled_pattern = any(re.match(r'^Rating:\s+\d+\s+stars?', line.strip(), re.IGNORECASE) for line in lines[:20])
     # Check for Yelp-like format (reviewer name followed by star rating and date, then review text)
-    yelp_pattern = any(re.search(r'\d+ stars?', line, re.IGNORECASE) for line in lines[:20])
+    yelp_pattern = not labeled_pattern and any(re.search(r'\d+ stars?', line, re.IGNORECASE) for line in lines[:20])
     
     if yelp_pattern:
         print(f"Using Yelp-style parsing for {company_name}")
@@ -177,64 +192,90 @@ def parse_reviews_text(text_content, company_name):
     
     return company_info, reviews
 
-def analyze_sentiment(reviews, model_name="distilbert-base-uncased-finetuned-sst-2-english"):
-    """Analyze sentiment for each review using Hugging Face model."""
+def load_sentiment_pipeline(model_name=DEFAULT_MODEL, device=None, framework=None, cache_dir=None):
+    """Load the Hugging Face sentiment pipeline once so it can be reused across companies."""
     print(f"Loading sentiment analysis model: {model_name}")
-    
-    # Initialize sentiment analysis pipeline
-    sentiment_analyzer = pipeline(
-        "sentiment-analysis", 
-        model=model_name, 
-        tokenizer=model_name
+    model_kwargs = {"cache_dir": cache_dir} if cache_dir else {}
+    return pipeline(
+        "sentiment-analysis",
+        model=model_name,
+        tokenizer=model_name,
+        framework=framework,
+        device=device,
+        model_kwargs=model_kwargs,
     )
-    
-    # For longer reviews, we might need to handle token limits
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    max_length = tokenizer.model_max_length
-    
-    print(f"Analyzing sentiment for {len(reviews)} reviews...")
-    for review in tqdm(reviews):
-        # Check if 'text' key exists in the review dictionary
+
+def _apply_sentiment(review, result):
+    """Copy a pipeline result onto a review dictionary."""
+    review['sentiment_label'] = result['label']
+    review['sentiment_score'] = result['score']
+    
+    # Add a simplified sentiment category
+    if result['label'] == 'POSITIVE':
+        review['sentiment'] = 'positive'
+    elif result['label'] == 'NEGATIVE':
+        review['sentiment'] = 'negative'
+    else:
+        review['sentiment'] = 'neutral'
+
+def _mark_neutral(review):
+    review['sentiment_label'] = 'NEUTRAL'
+    review['sentiment_score'] = 0.5
+    review['sentiment'] = 'neutral'
+
+@profiled()
+def analyze_sentiment(reviews, model_name=DEFAULT_MODEL, sentiment_analyzer=None, batch_size=16):
+    """Analyze sentiment for each review using Hugging Face model.
+
+    Reviews are sent to the model in batches of ``batch_size``; texts longer than the
+    model's maximum input size are truncated by the tokenizer. Pass an already loaded
+    ``sentiment_analyzer`` to avoid reloading the model for every company.
+    """
+    if sentiment_analyzer is None:
+        sentiment_analyzer = load_sentiment_pipeline(model_name)
+    
+    # For longer reviews, we need to handle token limits
+    max_length = sentiment_analyzer.tokenizer.model_max_length
+    
+    # Check if 'text' key exists in the review dictionary
+    pending = []
+    for review in reviews:
         if 'text' not in review or not review['text']:
             print(f"Warning: Review missing text content: {review}")
-            review['sentiment_label'] = 'NEUTRAL'
-            review['sentiment_score'] = 0.5
-            review['sentiment'] = 'neutral'
-            continue
-            
-        text = review['text']
-        
-        # Check if text is too long for the model's max input size
-        if len(tokenizer.encode(text)) > max_length:
-            # Simple truncation approach - split into chunks and analyze first chunk
-            encoded = tokenizer.encode(text, max_length=max_length-10, truncation=True)
-            text = tokenizer.decode(encoded)
-        
+            _mark_neutral(review)
+        else:
+            pending.append(review)
+    
+    print(f"Analyzing sentiment for {len(reviews)} reviews...")
+    for start in tqdm(range(0, len(pending), batch_size)):
+        batch = pending[start:start + batch_size]
+        texts = [review['text'] for review in batch]
         try:
-            # Get sentiment prediction
-            result = sentiment_analyzer(text)[0]
-            review['sentiment_label'] = result['label']
-            review['sentiment_score'] = result['score']
-            
-            # Add a simplified sentiment category
-            if result['label'] == 'POSITIVE':
-                review['sentiment'] = 'positive'
-            elif result['label'] == 'NEGATIVE':
-                review['sentiment'] = 'negative'
-            else:
-                review['sentiment'] = 'neutral'
+            results = sentiment_analyzer(texts, batch_size=batch_size, truncation=True, max_length=max_length)
         except Exception as e:
-            print(f"Error analyzing text: {e}")
-            review['sentiment_label'] = 'NEUTRAL'
-            review['sentiment_score'] = 0.5
-            review['sentiment'] = 'neutral'
+            # Fall back to one review at a time so a single bad text does not sink the batch
+            print(f"Error analyzing batch, retrying reviews individually: {e}")
+            results = []
+            for text in texts:
+                try:
+                    results.append(sentiment_analyzer(text, truncation=True, max_length=max_length)[0])
+                except Exception as e:
+                    print(f"Error analyzing text: {e}")
+                    results.append(None)
+        
+        count('inference_batches')
+        count('reviews_scored', len(batch))
+        for review, result in zip(batch, results):
+            if result is None:
+                _mark_neutral(review)
+            else:
+                _apply_sentiment(review, result)
     
     return reviews
 
-def create_company_comparison_visualizations(companies_data, output_dir="multi_company_analysis_pizza"):
-    """Create comparative visualizations across all companies."""
-    os.makedirs(output_dir, exist_ok=True)
-    
+@profiled()
+def build_comparison_df(companies_data):
+    """Aggregate per-company sentiment counts into the ranked comparison table."""
     # Prepare data for comparison
     company_names = []
     positive_counts = []
@@ -247,13 +288,12 @@ def create_company_comparison_visualizations(companies_data, output_dir="multi_c
     for company_name, reviews in companies_data.items():
         company_names.append(company_name)
         
-        df = pd.DataFrame(reviews)
-        
         # Count sentiment types
-        pos_count = len(df[df['sentiment'] == 'positive'])
-        neg_count = len(df[df['sentiment'] == 'negative'])
-        neu_count = len(df[df['sentiment'] == 'neutral'])
-        total = len(df)
+        sentiment_counts = Counter(review.get('sentiment') for review in reviews)
+        pos_count = sentiment_counts['positive']
+        neg_count = sentiment_counts['negative']
+        neu_count = sentiment_counts['neutral']
+        total = len(reviews)
         
         positive_counts.append(pos_count)
         negative_counts.append(neg_count)
@@ -265,7 +305,8 @@ def create_company_comparison_visualizations(companies_data, output_dir="multi_c
         positive_percentages.append(pos_pct)
         
         # Calculate average sentiment score
-        avg_score = df['sentiment_score'].mean() if 'sentiment_score' in df.columns else 0
+        scores = [review['sentiment_score'] for review in reviews if 'sentiment_score' in review]
+        avg_score = sum(scores) / len(scores) if scores else 0
         sentiment_scores.append(avg_score)
     
     # Create DataFrame for easy visualization
@@ -282,6 +323,20 @@ def create_company_comparison_visualizations(companies_data, output_dir="multi_c
     # Sort by positive percentage (descending)
     comparison_df = comparison_df.sort_values('Positive_Percentage', ascending=False)
     comparison_df['Rank'] = range(1, len(comparison_df) + 1)
+    return comparison_df
+
+@profiled()
+def create_company_comparison_visualizations(companies_data, output_dir="multi_company_analysis_pizza"):
+    """Create comparative visualizations across all companies."""
+    comparison_df = build_comparison_df(companies_data)
+    plot_company_comparison(comparison_df, output_dir)
+    return comparison_df
+
+@profiled()
+def plot_company_comparison(comparison_df, output_dir="multi_company_analysis_pizza"):
+    """Save the comparison table and charts for an already aggregated comparison DataFrame."""
+    os.makedirs(output_dir, exist_ok=True)
+    company_names = comparison_df['Company'].tolist()
     
     # Save comparison data
     comparison_df.to_csv(os.path.join(output_dir, 'company_sentiment_comparison.csv'), index=False)
@@ -385,8 +440,30 @@ def create_company_comparison_visualizations(companies_data, output_dir="multi_c
     
     return comparison_df
 
-def generate_ranking_report(comparison_df, output_dir="multi_company_analysis"):
-    """Generate a ranking report of the companies based on sentiment analysis."""
+def summarize_rankings(ranked_df):
+    """Compute the summary observations for a comparison table sorted by rank."""
+    # Add some insights about the data
+    highest_pct = ranked_df.iloc[0]['Positive_Percentage']
+    lowest_pct = ranked_df.iloc[-1]['Positive_Percentage']
+    avg_pos_pct = ranked_df['Positive_Percentage'].mean()
+    more_neg = ranked_df[ranked_df['Negative'] > ranked_df['Positive']]
+    return {
+        'top_company': ranked_df.iloc[0]['Company'],
+        'highest_pct': highest_pct,
+        'bottom_company': ranked_df.iloc[-1]['Company'],
+        'lowest_pct': lowest_pct,
+        'average_pct': avg_pos_pct,
+        'above_average': int((ranked_df['Positive_Percentage'] > avg_pos_pct).sum()),
+        'more_negative': list(zip(more_neg['Company'], more_neg['Negative'], more_neg['Positive'])),
+    }
+
+@profiled()
+def generate_ranking_report(comparison_df, output_dir="multi_company_analysis", observations=None):
+    """Generate a ranking report of the companies based on sentiment analysis.
+
+    ``observations`` may carry precomputed summary figures (see ``summarize_rankings``),
+    e.g. from the incremental ranking, so they are not recomputed from the table.
+    """
     report_path = os.path.join(output_dir, 'company_sentiment_ranking_report.txt')
     
     with open(report_path, 'w', encoding='utf-8') as f:
@@ -411,90 +488,168 @@ def generate_ranking_report(comparison_df, output_dir="multi_company_analysis"):
         f.write("\n\nSUMMARY OBSERVATIONS:\n")
         f.write("=" * 60 + "\n")
         
-        # Add some insights about the data
-        top_company = ranked_df.iloc[0]['Company']
-        bottom_company = ranked_df.iloc[-1]['Company']
-        highest_pct = ranked_df.iloc[0]['Positive_Percentage']
-        lowest_pct = ranked_df.iloc[-1]['Positive_Percentage']
+        if observations is None:
+            observations = summarize_rankings(ranked_df)
         
-        f.write(f"• Top ranked company: {top_company} with {highest_pct:.1f}% positive reviews\n")
-        f.write(f"• Lowest ranked company: {bottom_company} with {lowest_pct:.1f}% positive reviews\n")
+        f.write(f"• Top ranked company: {observations['top_company']} with {observations['highest_pct']:.1f}% positive reviews\n")
+        f.write(f"• Lowest ranked company: {observations['bottom_company']} with {observations['lowest_pct']:.1f}% positive reviews\n")
         
         # Difference between highest and lowest
-        diff = highest_pct - lowest_pct
+        diff = observations['highest_pct'] - observations['lowest_pct']
         f.write(f"• Difference between highest and lowest: {diff:.1f} percentage points\n")
         
-        # Calculate average positive percentage
-        avg_pos_pct = ranked_df['Positive_Percentage'].mean()
-        f.write(f"• Average positive sentiment across all companies: {avg_pos_pct:.1f}%\n")
+        f.write(f"• Average positive sentiment across all companies: {observations['average_pct']:.1f}%\n")
         
         # Companies above average
-        above_avg = ranked_df[ranked_df['Positive_Percentage'] > avg_pos_pct]
-        f.write(f"• {len(above_avg)} companies performed above average in positive sentiment\n")
+        f.write(f"• {observations['above_average']} companies performed above average in positive sentiment\n")
         
         # Companies with more negative than positive reviews
-        more_neg = ranked_df[ranked_df['Negative'] > ranked_df['Positive']]
+        more_neg = observations['more_negative']
         if len(more_neg) > 0:
             f.write(f"• {len(more_neg)} companies have more negative than positive reviews\n")
-            for _, row in more_neg.iterrows():
-                f.write(f"  - {row['Company']}: {row['Negative']} negative vs {row['Positive']} positive\n")
+            for company, negative, positive in more_neg:
+                f.write(f"  - {company}: {negative} negative vs {positive} positive\n")
         
     print(f"Ranking report generated: {report_path}")
     return report_path
 
-def main():
-    # Get directory containing company review files
-    reviews_dir = input("Enter directory containing company review files (or press Enter for current directory): ").strip()
-    if not reviews_dir:
-        reviews_dir = "."
+def company_name_from_filename(file_name):
+    """Extract company name from filename (remove extension and common suffixes)."""
+    company_name = os.path.basename(file_name).replace('.txt', '')
+    for suffix in FILENAME_SUFFIXES:
+        company_name = company_name.replace(suffix, '')
+    return company_name
+
+def read_review_file(file_path):
+    """Read a review file, falling back to latin-1 when it is not valid UTF-8."""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except UnicodeDecodeError:
+        # Try with a different encoding if UTF-8 fails
+        try:
+            with open(file_path, 'r', encoding='latin-1') as f:
+                return f.read()
+        except Exception as e:
+            print(f"Could not read file {file_path}: {e}")
+            return None
+
+def resolve_review_files(inputs):
+    """Expand directories and glob patterns into a sorted, de-duplicated list of review files."""
+    review_files = []
+    for entry in inputs:
+        if os.path.isdir(entry):
+            # Look for review files (allow more flexible naming)
+            matches = [os.path.join(entry, f) for f in os.listdir(entry)
+                       if f.endswith('.txt') and not f.startswith('.')]
+        elif glob.has_magic(entry):
+            matches = [f for f in glob.glob(entry) if os.path.isfile(f)]
+        elif os.path.isfile(entry):
+            matches = [entry]
+        else:
+            print(f"Warning: No such file or directory: {entry}")
+            matches = []
+        review_files.extend(sorted(matches))
+    return list(dict.fromkeys(review_files))
+
+def load_company_reviews(file_path):
+    """Read and parse one company's review file. Returns (company_name, reviews)."""
+    company_name = company_name_from_filename(file_path)
+    print(f"\nProcessing reviews for {company_name}...")
+    review_text = read_review_file(file_path)
+    if review_text is None:
+        return company_name, []
+    
+    # Parse reviews with more flexible parsing
+    company_info, reviews = parse_reviews_text(review_text, company_name)
+    return company_name, reviews
+
+def write_table(df, output_dir, stem, output_format):
+    """Write a DataFrame as CSV or JSON records and return the path."""
+    path = os.path.join(output_dir, f"{stem}.{output_format}")
+    if output_format == 'json':
+        df.to_json(path, orient='records', indent=2)
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+def parse_device(value):
+    """Accept GPU indices as integers and anything else ('cpu', 'cuda:0', 'mps') as-is."""
+    return int(value) if value.lstrip('-').isdigit() else value
+
+def add_common_arguments(parser):
+    """Add the model, output and profiling flags shared by the review analysis scripts."""
+    parser.add_argument('--model', default=DEFAULT_MODEL,
+                        help=f"Hugging Face sentiment model name or local path (default: {DEFAULT_MODEL})")
+    parser.add_argument('--backend', choices=['pt', 'tf'], default=None,
+                        help="Model framework; defaults to whichever transformers picks")
+    parser.add_argument('--device', type=parse_device, default=None,
+                        help="Inference device, e.g. 'cpu', 'cuda:0', 'mps' or a GPU index")
+    parser.add_argument('--batch-size', type=int, default=16,
+                        help="Number of reviews sent to the model per forward pass (default: 16)")
+    parser.add_argument('--cache-dir', default=None,
+                        help="Directory for downloaded model weights (default: Hugging Face cache)")
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv', dest='output_format',
+                        help="Format of the tabular outputs (default: csv)")
+    add_profiling_arguments(parser)
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="Compare customer review sentiment across companies.")
+    parser.add_argument('inputs', nargs='*', default=['.'],
+                        help="Review files, directories or glob patterns (default: current directory)")
+    parser.add_argument('--output-dir', default="multi_company_sentiment_analysis",
+                        help="Directory for the comparison table, charts and report")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Processes used to read and parse review files (default: 1)")
+    parser.add_argument('--expected-files', type=int, default=None,
+                        help="Fail instead of continuing when a different number of files is found")
+    parser.add_argument('--state', default=None, metavar='PATH',
+                        help="Incremental mode: keep running per-company counts in PATH and only "
+                             "re-read and re-analyze review files that changed since the last run")
+    parser.add_argument('--store-dir', default=None, metavar='DIR',
+                        help="Also write the per-company, menu item and aspect summary store the "
+                             "dashboard reads (e.g. HackAI/data/sentiment); needs a full run")
+    parser.add_argument('--menu-items', default=None, metavar='PATH',
+                        help="Menu items to look for in reviews, one 'Label: name | other name' per line "
+                             "(default: a built-in pizzeria menu)")
+    add_common_arguments(parser)
+    return parser
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    with profiling_session(args) as profiler:
+        profiler.metadata.update(batch_size=args.batch_size, workers=args.workers, model=args.model)
+        return run_comparison(args)
+
+def run_comparison(args):
+    review_files = resolve_review_files(args.inputs)
+    if not review_files:
+        print(f"No text files found in {', '.join(args.inputs)}.")
+        return 1
     
-    if not os.path.exists(reviews_dir):
-        print(f"Error: Directory not found at {reviews_dir}")
-        return
+    print(f"Found {len(review_files)} potential review files.")
     
-    # Look for review files (allow more flexible naming)
-    review_files = [f for f in os.listdir(reviews_dir) if f.endswith('.txt') and not f.startswith('.')]
+    if args.expected_files is not None and len(review_files) != args.expected_files:
+        print(f"Found {len(review_files)} files (expected {args.expected_files}). Aborting.")
+        return 1
     
-    if not review_files:
-        print(f"No text files found in {reviews_dir}.")
-        return
+    if args.state:
+        return run_incremental_comparison(args, review_files)
     
-    print(f"Found {len(review_files)} potential review files.")
+    # Read and parse each company's reviews
+    parsed = parse_review_files(review_files, args.workers)
+    count('files', len(review_files))
+    count('reviews_parsed', sum(len(reviews) for _, reviews in parsed))
     
-    # Confirm with user
-    if len(review_files) != 11:
-        proceed = input(f"Found {len(review_files)} files (expected 11). Continue anyway? (y/n): ").lower()
-        if proceed != 'y':
-            print("Operation cancelled by user.")
-            return
+    with stage('load_model'):
+        sentiment_analyzer = load_sentiment_pipeline(
+            args.model, device=args.device, framework=args.backend, cache_dir=args.cache_dir)
     
     # Process each company's reviews
     all_companies_data = {}
     
-    for file_name in review_files:
-        file_path = os.path.join(reviews_dir, file_name)
-        
-        # Extract company name from filename (remove extension and common suffixes)
-        company_name = file_name.replace('.txt', '')
-        for suffix in ['_reviews', '_reviews_with_ratings', '_yelp', '_google', '_data']:
-            company_name = company_name.replace(suffix, '')
-        
-        print(f"\nProcessing reviews for {company_name}...")
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                review_text = f.read()
-        except UnicodeDecodeError:
-            # Try with a different encoding if UTF-8 fails
-            try:
-                with open(file_path, 'r', encoding='latin-1') as f:
-                    review_text = f.read()
-            except Exception as e:
-                print(f"Could not read file {file_path}: {e}")
-                continue
-        
-        # Parse reviews with more flexible parsing
-        company_info, reviews = parse_reviews_text(review_text, company_name)
-        
+    for company_name, reviews in parsed:
         if not reviews:
             print(f"No reviews were parsed for {company_name}. Skipping.")
             continue
@@ -502,35 +657,139 @@ def main():
         # Display sample of first review
         print(f"Sample of first review for {company_name}:")
         print(f"Rating: {reviews[0].get('rating', 'N/A')}")
-        print(f"Text sample: {reviews[0]['text'][:100]}...")
+        print(f"Text sample: {reviews[0].get('text', '')[:100]}...")
         
         # Analyze sentiment
-        model_name = "distilbert-base-uncased-finetuned-sst-2-english"
-        analyzed_reviews = analyze_sentiment(reviews, model_name)
+        analyzed_reviews = analyze_sentiment(
+            reviews, args.model, sentiment_analyzer=sentiment_analyzer, batch_size=args.batch_size)
         
-        # Store analyzed reviews
-        all_companies_data[company_name] = analyzed_reviews
+        # Store analyzed reviews (merge files that map to the same company)
+        all_companies_data.setdefault(company_name, []).extend(analyzed_reviews)
     
     if not all_companies_data:
         print("No data was processed successfully. Exiting.")
-        return
+        return 1
+    count('companies', len(all_companies_data))
     
+    output_dir = args.output_dir
     print(f"\nCreating comparative visualizations for {len(all_companies_data)} companies...")
-    output_dir = "multi_company_sentiment_analysis"
     comparison_df = create_company_comparison_visualizations(all_companies_data, output_dir)
     
     # Generate ranking report
     report_path = generate_ranking_report(comparison_df, output_dir)
     
+    with stage('write_outputs'):
+        all_reviews_df = pd.DataFrame([review for reviews in all_companies_data.values() for review in reviews])
+        write_table(all_reviews_df, output_dir, 'review_sentiment', args.output_format)
+        if args.output_format != 'csv':
+            write_table(comparison_df, output_dir, 'company_sentiment_comparison', args.output_format)
+    
+    write_discrepancy_tables(all_reviews_df, output_dir, args.output_format)
+    
+    if args.store_dir:
+        with stage('sentiment_store', reviews=len(all_reviews_df)):
+            menu_items = load_menu_items(args.menu_items) if args.menu_items else None
+            write_sentiment_store(all_reviews_df, comparison_df, args.store_dir, menu_items)
+        print(f"Sentiment summary store written to: {args.store_dir}")
+    
     print(f"\nAnalysis complete!")
     print(f"Visualizations and report saved to: {output_dir}")
     print(f"Company ranking report: {report_path}")
     
+    print_top_companies(comparison_df)
+    return 0
+
+def run_incremental_comparison(args, review_files):
+    """Update a saved ranking from the review files that changed since the last run."""
+    state = RankingState.load(args.state)
+    review_files = [os.path.abspath(file_path) for file_path in review_files]
+    
+    # Files that disappeared from the inputs take their reviews with them
+    dropped_files = sorted(set(state.files) - set(review_files))
+    for file_path in dropped_files:
+        state.drop_file(file_path)
+    
+    changed_files = [file_path for file_path in review_files if state.file_changed(file_path)]
+    print(f"{len(changed_files)} of {len(review_files)} review files changed since the last run, "
+          f"{len(dropped_files)} removed.")
+    parsed = parse_review_files(changed_files, args.workers)
+    count('files', len(changed_files))
+    
+    sentiment_analyzer = None
+    delta_reviews = []
+    for file_path, (company_name, reviews) in zip(changed_files, parsed):
+        added, removed = state.diff(file_path, reviews)
+        print(f"{company_name}: {len(added)} new and {len(removed)} removed reviews")
+        if added:
+            if sentiment_analyzer is None:
+                with stage('load_model'):
+                    sentiment_analyzer = load_sentiment_pipeline(
+                        args.model, device=args.device, framework=args.backend, cache_dir=args.cache_dir)
+            analyze_sentiment(added, args.model, sentiment_analyzer=sentiment_analyzer, batch_size=args.batch_size)
+        state.apply(file_path, company_name, added, removed)
+        delta_reviews.extend(added)
+        count('reviews_added', len(added))
+        count('reviews_removed', len(removed))
+    
+    if not len(state.ranking):
+        print("No data was processed successfully. Exiting.")
+        state.save(args.state)
+        return 1
+    
+    output_dir = args.output_dir
+    report_path = os.path.join(output_dir, 'company_sentiment_ranking_report.txt')
+    comparison_df = state.ranking.to_comparison_df()
+    if changed_files or dropped_files or not os.path.exists(report_path):
+        with stage('aggregate'):
+            observations = state.ranking.observations()
+        plot_company_comparison(comparison_df, output_dir)
+        generate_ranking_report(comparison_df, output_dir, observations)
+        if delta_reviews:
+            delta_df = pd.DataFrame(delta_reviews)
+            write_table(delta_df, output_dir, 'review_sentiment_delta', args.output_format)
+            write_discrepancy_tables(delta_df, output_dir, args.output_format, suffix='_delta')
+        if args.output_format != 'csv':
+            write_table(comparison_df, output_dir, 'company_sentiment_comparison', args.output_format)
+    else:
+        print("Rankings are up to date.")
+    
+    if args.store_dir:
+        # The state keeps counts, not review texts, so menu item and aspect mentions
+        # cannot be updated from it
+        print("Skipping --store-dir: the summary store needs a full run without --state.")
+    
+    with stage('save_state'):
+        state.save(args.state)
+    count('companies', len(state.ranking))
+    
+    print(f"Company ranking report: {report_path}")
+    print_top_companies(comparison_df)
+    return 0
+
+def write_discrepancy_tables(reviews_df, output_dir, output_format, suffix=''):
+    """Score rating/sentiment discrepancies and write the ranked and per-company tables."""
+    with stage('discrepancies', reviews=len(reviews_df)):
+        scored = score_discrepancies(reviews_df)
+        ranked = rank_discrepancies(scored)
+        write_table(ranked, output_dir, f'review_discrepancies{suffix}', output_format)
+        write_table(summarize_discrepancies(scored), output_dir, f'company_discrepancy_summary{suffix}', output_format)
+    print(f"Found {len(ranked)} reviews whose star rating disagrees with their sentiment.")
+    return ranked
+
+def parse_review_files(review_files, workers=1):
+    """Read and parse review files, optionally across a process pool."""
+    with stage('read_parse', files=len(review_files)):
+        if workers > 1 and len(review_files) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(load_company_reviews, review_files))
+        return [load_company_reviews(file_path) for file_path in review_files]
+
+def print_top_companies(comparison_df, n=3):
     # Print top 3 companies
-    top3 = comparison_df.sort_values('Positive_Percentage', ascending=False).head(3)
-    print("\nTOP 3 COMPANIES BY POSITIVE SENTIMENT:")
-    for i, (_, row) in enumerate(top3.iterrows()):
+    top = comparison_df.sort_values('Positive_Percentage', ascending=False).head(n)
+    print(f"\nTOP {n} COMPANIES BY POSITIVE SENTIMENT:")
+    for i, (_, row) in enumerate(top.iterrows()):
         print(f"{i+1}. {row['Company']}: {row['Positive_Percentage']:.1f}% positive")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
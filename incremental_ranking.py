@@ -0,0 +1,276 @@
+"""Incremental company sentiment ranking.
+
+Keeps running per-company counts (positive/negative/neutral, sentiment score sums and
+star rating histograms) and applies added or removed reviews as deltas, so a run where
+one restaurant gained a few reviews only touches that restaurant. The ranking is kept as
+a sorted key list and the summary observations from ``generate_ranking_report`` are
+maintained alongside it, so both are updated in O(changed reviews + log companies).
+
+State round-trips through a JSON file, together with per-review fingerprints (to work
+out which reviews of a re-read file are new or gone) and per-file signatures (so
+unchanged files are not even read).
+"""
+
+import os
+import json
+import hashlib
+from bisect import bisect_left, insort
+from collections import Counter
+
+import pandas as pd
+
+SENTIMENTS = ('positive', 'negative', 'neutral')
+STATE_VERSION = 1
+
+
+def review_fingerprint(review):
+    """Stable identity for a review: its rating and text."""
+    key = f"{review.get('rating', 0)}\x1f{review.get('text', '')}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def file_signature(path):
+    """Cheap change detector for a review file: (mtime_ns, size)."""
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class CompanyStats:
+    """Running sentiment totals for one company."""
+
+    __slots__ = ('positive', 'negative', 'neutral', 'total', 'score_sum', 'score_count', 'ratings')
+
+    def __init__(self):
+        self.positive = 0
+        self.negative = 0
+        self.neutral = 0
+        self.total = 0
+        self.score_sum = 0.0
+        self.score_count = 0
+        # Index 0 counts reviews without an explicit star rating
+        self.ratings = [0] * 6
+
+    def apply(self, review, sign):
+        """Add (sign=1) or remove (sign=-1) one analyzed review."""
+        sentiment = review.get('sentiment')
+        if sentiment in SENTIMENTS:
+            setattr(self, sentiment, getattr(self, sentiment) + sign)
+        self.total += sign
+        if 'sentiment_score' in review:
+            self.score_sum += sign * review['sentiment_score']
+            self.score_count += sign
+        rating = review.get('rating', 0)
+        if 0 <= rating <= 5:
+            self.ratings[rating] += sign
+
+    @property
+    def positive_percentage(self):
+        return (self.positive / self.total) * 100 if self.total > 0 else 0
+
+    @property
+    def avg_sentiment_score(self):
+        return self.score_sum / self.score_count if self.score_count > 0 else 0
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        for name in cls.__slots__:
+            setattr(stats, name, data[name])
+        return stats
+
+
+class IncrementalRanking:
+    """Per-company sentiment counts with a ranking that updates from review deltas."""
+
+    def __init__(self):
+        self.companies = {}
+        # Sorted (-positive_percentage, company) keys; index + 1 is the rank
+        self._order = []
+        self._keys = {}
+        self._pct_sum = 0.0
+        self._more_negative = set()
+
+    def __len__(self):
+        return len(self.companies)
+
+    def _unrank(self, company):
+        key = self._keys.pop(company)
+        del self._order[bisect_left(self._order, key)]
+        self._pct_sum += key[0]
+        self._more_negative.discard(company)
+
+    def _rank(self, company):
+        stats = self.companies[company]
+        key = (-stats.positive_percentage, company)
+        insort(self._order, key)
+        self._keys[company] = key
+        self._pct_sum -= key[0]
+        if stats.negative > stats.positive:
+            self._more_negative.add(company)
+
+    def apply(self, company, added=(), removed=()):
+        """Apply analyzed reviews added to and removed from ``company``."""
+        if company in self._keys:
+            self._unrank(company)
+        stats = self.companies.setdefault(company, CompanyStats())
+        for review in removed:
+            stats.apply(review, -1)
+        for review in added:
+            stats.apply(review, 1)
+        if stats.total <= 0:
+            del self.companies[company]
+        else:
+            self._rank(company)
+
+    def drop(self, company):
+        """Remove a company and all of its reviews."""
+        if company in self._keys:
+            self._unrank(company)
+        self.companies.pop(company, None)
+
+    def rank_of(self, company):
+        return bisect_left(self._order, self._keys[company]) + 1
+
+    def rating_histogram(self, company):
+        """Star rating counts for ``company``, keyed 0 (unrated) to 5."""
+        return dict(enumerate(self.companies[company].ratings))
+
+    def observations(self):
+        """Summary observations in the shape returned by ``summarize_rankings``."""
+        if not self._order:
+            return None
+        top = self._order[0]
+        bottom = self._order[-1]
+        average = self._pct_sum / len(self._order)
+        # Keys are (-pct, name), so everything sorting before (-average,) is strictly above average
+        above_average = bisect_left(self._order, (-average,))
+        more_negative = sorted(self._more_negative, key=self._keys.__getitem__)
+        return {
+            'top_company': top[1],
+            'highest_pct': -top[0],
+            'bottom_company': bottom[1],
+            'lowest_pct': -bottom[0],
+            'average_pct': average,
+            'above_average': above_average,
+            'more_negative': [(company, self.companies[company].negative, self.companies[company].positive)
+                              for company in more_negative],
+        }
+
+    def to_comparison_df(self):
+        """Build the ranked comparison table written by ``build_comparison_df``."""
+        rows = []
+        for rank, (_, company) in enumerate(self._order, start=1):
+            stats = self.companies[company]
+            rows.append({
+                'Company': company,
+                'Positive': stats.positive,
+                'Negative': stats.negative,
+                'Neutral': stats.neutral,
+                'Total': stats.total,
+                'Positive_Percentage': stats.positive_percentage,
+                'Avg_Sentiment_Score': stats.avg_sentiment_score,
+                'Rank': rank,
+            })
+        columns = ['Company', 'Positive', 'Negative', 'Neutral', 'Total',
+                   'Positive_Percentage', 'Avg_Sentiment_Score', 'Rank']
+        return pd.DataFrame(rows, columns=columns)
+
+    def to_dict(self):
+        return {company: stats.to_dict() for company, stats in self.companies.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        ranking = cls()
+        for company, stats in data.items():
+            ranking.companies[company] = CompanyStats.from_dict(stats)
+            ranking._rank(company)
+        return ranking
+
+
+class RankingState:
+    """Ranking plus the bookkeeping needed to turn re-read review files into deltas."""
+
+    def __init__(self, ranking=None, files=None):
+        self.ranking = ranking if ranking is not None else IncrementalRanking()
+        # file path -> {'signature': [mtime_ns, size], 'company': name,
+        #               'reviews': {fingerprint: [count, sentiment, sentiment_score, rating]}}
+        self.files = files or {}
+
+    def file_changed(self, path):
+        entry = self.files.get(path)
+        return entry is None or entry['signature'] != file_signature(path)
+
+    def diff(self, path, reviews):
+        """Split a file's freshly parsed reviews into (added, removed) relative to the state.
+
+        ``added`` are review dicts that still need sentiment analysis; ``removed`` are
+        reconstructed analyzed reviews that can be passed straight to ``apply``.
+        """
+        known = self.files[path]['reviews'] if path in self.files else {}
+        current = Counter(review_fingerprint(review) for review in reviews)
+        added = []
+        remaining = dict(current)
+        for review in reviews:
+            fingerprint = review_fingerprint(review)
+            if remaining[fingerprint] > (known[fingerprint][0] if fingerprint in known else 0):
+                added.append(review)
+            remaining[fingerprint] -= 1
+        removed = []
+        for fingerprint, (count, sentiment, score, rating) in known.items():
+            for _ in range(count - current.get(fingerprint, 0)):
+                removed.append({'sentiment': sentiment, 'sentiment_score': score, 'rating': rating,
+                                'fingerprint': fingerprint})
+        return added, removed
+
+    def apply(self, path, company, added=(), removed=()):
+        """Apply analyzed deltas for one file to the ranking and the fingerprint index."""
+        entry = self.files.setdefault(path, {'signature': None, 'company': company, 'reviews': {}})
+        self.ranking.apply(company, added, removed)
+        known = entry['reviews']
+        for review in removed:
+            counts = known[review['fingerprint']]
+            counts[0] -= 1
+            if counts[0] <= 0:
+                del known[review['fingerprint']]
+        for review in added:
+            fingerprint = review_fingerprint(review)
+            if fingerprint in known:
+                known[fingerprint][0] += 1
+            else:
+                known[fingerprint] = [1, review.get('sentiment'), review.get('sentiment_score', 0.5),
+                                      review.get('rating', 0)]
+        entry['signature'] = file_signature(path)
+
+    def drop_file(self, path):
+        """Forget a file that is no longer part of the inputs, removing its reviews."""
+        entry = self.files.pop(path)
+        removed = []
+        for fingerprint, (count, sentiment, score, rating) in entry['reviews'].items():
+            removed.extend([{'sentiment': sentiment, 'sentiment_score': score, 'rating': rating}] * count)
+        self.ranking.apply(entry['company'], removed=removed)
+
+    def save(self, path):
+        payload = {
+            'version': STATE_VERSION,
+            'companies': self.ranking.to_dict(),
+            'files': self.files,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved state, or return an empty one when ``path`` does not exist yet."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        if payload.get('version') != STATE_VERSION:
+            print(f"Ignoring ranking state {path} written by an incompatible version")
+            return cls()
+        return cls(IncrementalRanking.from_dict(payload['companies']), payload['files'])
@@ -0,0 +1,6 @@
+"""Ingredient image recognition: model serving and dataset tooling.
+
+Everything here works on the 65 ingredient classes of ``class_mapping.pkl`` and the
+images under ``ingredients_data/`` (or the ``ingredients_dataset/train/<class>`` tree the
+crawling notebook builds).
+"""
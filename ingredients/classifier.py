@@ -0,0 +1,443 @@
+"""Batched ingredient image classification around ``assets/model1.h5``.
+
+The Keras model and ``class_mapping.pkl`` are loaded once per process
+(``get_classifier``). Images, given as file paths or uploaded bytes, are decoded and
+resized to the model's input size in a thread pool, since Pillow releases the GIL while
+decoding. They are then classified in batches, and the top-k classes are named through
+``idx_to_class``.
+
+Callers that classify one image at a time (the upload page, a request handler) go
+through a ``MicroBatcher``: requests arriving within ``max_latency`` of each other share
+one forward pass of at most ``max_batch`` images, so throughput approaches that of large
+batches while no request waits longer than the deadline for company.
+
+``--level group`` rolls the model's labels up to the merged groups of
+``ingredient_taxonomy.json`` (see ``ingredients.taxonomy``).
+
+``python -m ingredients.export`` converts the model to TensorFlow Lite. Once exported,
+``get_classifier`` loads ``assets/model1.tflite`` through the lightweight runtime in
+``ingredients.lite`` instead of importing TensorFlow.
+
+The model must take ``(batch, height, width, channels)`` images and output one score per
+mapped class. The ``model1.h5`` currently in ``assets/`` takes ``(batch, 14, 4)``
+sequences and returns a single value, so loading it raises ``IncompatibleModelError``
+until the trained image classifier is dropped in its place.
+
+Needs Pillow, plus TensorFlow (``pip install tensorflow``) for the Keras model or a
+TFLite runtime (``pip install ai-edge-litert``) for the exported one.
+
+    python -m ingredients.classifier ingredients_data --top-k 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import io
+import pickle
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Union
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+MODEL_PATH = REPO_ROOT / "assets" / "model1.h5"
+MAPPING_PATH = REPO_ROOT / "class_mapping.pkl"
+IMAGE_DIR = REPO_ROOT / "ingredients_data"
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp"}
+
+# Used when the model accepts any spatial size
+DEFAULT_IMAGE_SIZE = (224, 224)
+TOP_K = 5
+MAX_BATCH = 32
+MAX_LATENCY = 0.010  # seconds a request may wait for others to share its batch
+DECODE_WORKERS = 4
+# What a model's scores are: softmax probabilities, or logits the classifier normalizes
+OUTPUTS = ("probabilities", "logits")
+
+ImageSource = Union[str, Path, bytes, np.ndarray]
+
+
+class IncompatibleModelError(ValueError):
+    """The model's input or output shape does not fit image classification over the mapping."""
+
+
+def load_class_mapping(path: str | Path = MAPPING_PATH) -> tuple[dict[int, str], dict[str, int]]:
+    """``(idx_to_class, class_to_idx)`` from a pickled mapping."""
+    with open(path, "rb") as f:
+        mapping = pickle.load(f)
+    idx_to_class = {int(idx): name for idx, name in mapping["idx_to_class"].items()}
+    class_to_idx = mapping.get("class_to_idx") or {name: idx for idx, name in idx_to_class.items()}
+    return idx_to_class, class_to_idx
+
+
+def default_model_path() -> Path:
+    """The exported TFLite model when it is at least as new as ``model1.h5``, else the Keras one."""
+    lite_path = MODEL_PATH.with_suffix(".tflite")
+    if lite_path.exists() and (not MODEL_PATH.exists() or lite_path.stat().st_mtime >= MODEL_PATH.stat().st_mtime):
+        return lite_path
+    return MODEL_PATH
+
+
+def load_model(path: str | Path = MODEL_PATH):
+    """A ``.tflite`` file through the lightweight runtime, anything else through Keras."""
+    if Path(path).suffix == ".tflite":
+        from .lite import LiteModel
+
+        return LiteModel(path)
+    return load_keras_model(path)
+
+
+def load_keras_model(path: str | Path = MODEL_PATH):
+    try:
+        from tensorflow import keras
+    except ImportError as err:
+        raise RuntimeError("Loading the ingredient model needs TensorFlow: pip install tensorflow") from err
+    return keras.models.load_model(path, compile=False)
+
+
+def image_paths(root: str | Path = IMAGE_DIR) -> list[Path]:
+    """Image files under ``root`` (recursively), in a stable order."""
+    root = Path(root)
+    if root.is_file():
+        return [root]
+    return sorted(path for path in root.rglob("*") if path.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def decode_image(source: ImageSource, size: tuple[int, int], channels: int = 3) -> np.ndarray:
+    """A ``(height, width, channels)`` uint8 array of ``source`` resized to ``size``.
+
+    ``source`` is a file path, the encoded bytes of an image, or an already decoded array.
+    """
+    from PIL import Image
+
+    height, width = size
+    if isinstance(source, np.ndarray):
+        image = Image.fromarray(source)
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        image = Image.open(io.BytesIO(source))
+    else:
+        image = Image.open(source)
+    with image:
+        # draft() lets the JPEG decoder downscale while decoding, much cheaper than a full decode
+        image.draft("RGB", (width, height))
+        image = image.convert("L" if channels == 1 else "RGB")
+        if image.size != (width, height):
+            image = image.resize((width, height), Image.Resampling.BILINEAR)
+        pixels = np.asarray(image, dtype=np.uint8)
+    return pixels[..., None] if channels == 1 else pixels
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def output_kind(model) -> str | None:
+    """``"probabilities"`` if ``model`` ends in a softmax, ``"logits"`` if it doesn't, None if unknown.
+
+    Keras models are read from their last layer; ``LiteModel`` reads its graph.
+    """
+    kind = getattr(model, "output_kind", None)
+    if kind is not None:
+        return kind
+    layers = getattr(model, "layers", None)
+    if not layers:
+        return None
+    last = layers[-1]
+    activation = getattr(last, "activation", None)
+    if type(last).__name__ == "Softmax" or getattr(activation, "__name__", None) == "softmax":
+        return "probabilities"
+    return "logits"
+
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    shifted = np.exp(scores - scores.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+class IngredientClassifier:
+    """A loaded model plus its class mapping; classifies batches of images.
+
+    ``model`` is a Keras model, or anything with the same ``input_shape``, ``output_shape``
+    and ``predict_on_batch`` taking a float32 ``(n, height, width, channels)`` batch to
+    ``(n, classes)`` scores. It defaults to the model at ``model_path``, ``.h5`` or
+    ``.tflite``.
+
+    ``outputs`` says whether those scores are probabilities or logits (one of
+    ``OUTPUTS``). By default it is read from the model's last layer; models that don't
+    show it are taken to end in a softmax, like the trained classifier.
+    """
+
+    def __init__(self, model=None, model_path: str | Path = MODEL_PATH,
+                 mapping_path: str | Path = MAPPING_PATH, decode_workers: int = DECODE_WORKERS,
+                 scale: float = 1 / 255, outputs: str | None = None):
+        self.idx_to_class, self.class_to_idx = load_class_mapping(mapping_path)
+        self.model = model if model is not None else load_model(model_path)
+        self.model_path = Path(model_path)
+        self.image_size, self.channels = self._check_model(model_path)
+        self.scale = scale
+        self.outputs = outputs or output_kind(self.model) or "probabilities"
+        if self.outputs not in OUTPUTS:
+            raise ValueError(f"outputs must be one of {OUTPUTS}, not {self.outputs!r}")
+        self._decoder = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="ingredient-decode")
+        # Keras models are not guaranteed to be safe to call from several threads at once
+        self._predict_lock = threading.Lock()
+
+    def _check_model(self, model_path) -> tuple[tuple[int, int], int]:
+        input_shape = tuple(self.model.input_shape)
+        output_shape = tuple(self.model.output_shape)
+        if len(input_shape) != 4 or input_shape[3] not in (1, 3):
+            raise IncompatibleModelError(
+                f"{model_path} takes inputs of shape {input_shape}; an image classifier takes "
+                f"(batch, height, width, 1 or 3)"
+            )
+        if output_shape[-1] != len(self.idx_to_class):
+            raise IncompatibleModelError(
+                f"{model_path} outputs {output_shape[-1]} scores per input, "
+                f"but the class mapping has {len(self.idx_to_class)} classes"
+            )
+        height, width = input_shape[1:3]
+        size = (height, width) if height and width else DEFAULT_IMAGE_SIZE
+        return size, input_shape[3]
+
+    @property
+    def num_classes(self) -> int:
+        return len(self.idx_to_class)
+
+    def decode(self, source: ImageSource) -> np.ndarray:
+        return decode_image(source, self.image_size, self.channels)
+
+    def decode_async(self, source: ImageSource) -> Future:
+        return self._decoder.submit(self.decode, source)
+
+    def decoded_batches(self, items: Iterable, batch_size: int = MAX_BATCH,
+                        load: Callable[[Any], Any] | None = None,
+                        skip: tuple[type[Exception], ...] = ()) -> Iterator[list[tuple[Any, Any]]]:
+        """``(item, load(item))`` pairs in batches, the next batch loading while the caller works.
+
+        ``load`` defaults to ``decode`` and runs in the decode pool. ``items`` is read lazily,
+        one batch ahead. An item whose load raises one of ``skip`` is paired with None;
+        other errors propagate.
+        """
+        load = load or self.decode
+
+        def submit(batch):
+            return [(item, self._decoder.submit(load, item)) for item in batch]
+
+        def result(future: Future):
+            try:
+                return future.result()
+            except skip:
+                return None
+
+        batches = _batches(items, batch_size)
+        pending = submit(next(batches, []))
+        while pending:
+            loaded = [(item, result(future)) for item, future in pending]
+            pending = submit(next(batches, []))
+            yield loaded
+
+    def decode_many(self, sources: Iterable[ImageSource]) -> np.ndarray:
+        """Decode ``sources`` in the thread pool into one ``(n, height, width, channels)`` uint8 array."""
+        images = list(self._decoder.map(self.decode, sources))
+        if not images:
+            return np.empty((0, *self.image_size, self.channels), dtype=np.uint8)
+        return np.stack(images)
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        """Class probabilities for a uint8 image batch, ``(n, classes)``."""
+        batch = images.astype(np.float32) * np.float32(self.scale)
+        with self._predict_lock:
+            # predict_on_batch runs the compiled graph; calling the model runs it eagerly,
+            # which costs an order of magnitude more per batch on CPU
+            scores = self.model.predict_on_batch(batch)
+        scores = np.asarray(scores, dtype=np.float32)
+        # Decided per model, not per batch: quantized softmax outputs don't sum to exactly 1
+        return _softmax(scores) if self.outputs == "logits" else scores
+
+    def top_k(self, probabilities: np.ndarray, k: int = TOP_K) -> list[list[dict]]:
+        """The ``k`` most likely classes per row, most likely first."""
+        k = min(k, probabilities.shape[1])
+        if not len(probabilities) or k < 1:
+            return [[] for _ in range(len(probabilities))]
+        best = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(probabilities, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        return [
+            [{"label": self.idx_to_class[int(idx)], "probability": float(score)}
+             for idx, score in zip(row, scores)]
+            for row, scores in zip(best, best_scores)
+        ]
+
+    def classify(self, sources: Iterable[ImageSource], k: int = TOP_K,
+                 batch_size: int = MAX_BATCH) -> list[list[dict]]:
+        """Top-k classes for every image in ``sources``, in batches of ``batch_size``.
+
+        Decoding of the next batch overlaps with inference on the current one.
+        """
+        results = []
+        for batch in self.decoded_batches(sources, batch_size):
+            images = np.stack([image for _, image in batch])
+            results.extend(self.top_k(self.predict(images), k))
+        return results
+
+    def close(self) -> None:
+        self._decoder.shutdown(wait=False, cancel_futures=True)
+
+
+class MicroBatcher:
+    """Groups single-image requests into batches bounded by size and waiting time.
+
+    ``submit`` returns a future for the image's top-k classes. A background thread takes
+    the first waiting image, keeps collecting until ``max_batch`` images are waiting or
+    ``max_latency`` seconds have passed since it took the first, then runs them through
+    the model together.
+    """
+
+    _STOP = object()
+
+    def __init__(self, classifier: IngredientClassifier, max_batch: int = MAX_BATCH,
+                 max_latency: float = MAX_LATENCY, k: int = TOP_K):
+        self.classifier = classifier
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.k = k
+        self.batch_sizes: list[int] = []
+        self._queue: queue.Queue = queue.Queue()
+        # Guards _stopped, so nothing is queued behind _STOP where no batch would answer it
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="ingredient-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, source: ImageSource) -> Future:
+        """Queue one image; it is decoded in the classifier's pool before joining a batch."""
+        result: Future = Future()
+        decoding = self.classifier.decode_async(source)
+
+        def enqueue(decoded: Future):
+            if decoded.cancelled():
+                result.set_exception(RuntimeError("the classifier was closed before the image was decoded"))
+                return
+            error = decoded.exception()
+            if error is not None:
+                result.set_exception(error)
+                return
+            with self._lock:
+                if not self._stopped:
+                    self._queue.put((decoded.result(), result))
+                    return
+            result.set_exception(RuntimeError("the micro-batcher is closed"))
+
+        decoding.add_done_callback(enqueue)
+        return result
+
+    def _collect(self) -> list | None:
+        first = self._queue.get()
+        if first is self._STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                self._queue.put(item)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while (batch := self._collect()) is not None:
+            images = np.stack([image for image, _ in batch])
+            futures = [future for _, future in batch]
+            self.batch_sizes.append(len(batch))
+            try:
+                results = self.classifier.top_k(self.classifier.predict(images), self.k)
+            except Exception as err:
+                for future in futures:
+                    future.set_exception(err)
+                continue
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+    def close(self) -> None:
+        """Finish the batches already queued, then stop the batching thread.
+
+        Images still decoding when it is called fail with RuntimeError instead of waiting
+        for a batch that never runs.
+        """
+        with self._lock:
+            self._stopped = True
+            self._queue.put(self._STOP)
+        self._thread.join()
+
+
+@functools.lru_cache(maxsize=None)
+def get_classifier(model_path: str | Path | None = None, mapping_path: str | Path = MAPPING_PATH) -> IngredientClassifier:
+    """The process-wide classifier for ``model_path`` (default: ``default_model_path()``); loaded on first use."""
+    return IngredientClassifier(model_path=model_path or default_model_path(), mapping_path=mapping_path)
+
+
+@functools.lru_cache(maxsize=None)
+def get_batcher(max_batch: int = MAX_BATCH, max_latency: float = MAX_LATENCY) -> MicroBatcher:
+    """The process-wide micro-batcher over ``get_classifier()``."""
+    return MicroBatcher(get_classifier(), max_batch=max_batch, max_latency=max_latency)
+
+
+def format_prediction(prediction: list[dict]) -> str:
+    return ", ".join(f"{p['label']} {p['probability']:.1%}" for p in prediction)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify ingredient images.")
+    parser.add_argument("images", nargs="*", default=[str(IMAGE_DIR)],
+                        help="Image files or directories (default: ingredients_data)")
+    parser.add_argument("--model", default=None,
+                        help="Model file, .h5 or .tflite (default: assets/model1.tflite if exported, else model1.h5)")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH)
+    parser.add_argument("--level", choices=("label", "group", "category"), default="label",
+                        help="Name the model's labels, or roll them up to taxonomy groups or categories")
+    args = parser.parse_args(argv)
+
+    paths = [path for root in args.images for path in image_paths(root)]
+    try:
+        classifier = get_classifier(args.model)
+    except IncompatibleModelError as err:
+        print(f"Cannot classify images: {err}", file=sys.stderr)
+        return 1
+    if args.level == "label":
+        predictions = classifier.classify(paths, args.top_k, args.batch_size)
+    else:
+        from .taxonomy import load_taxonomy
+
+        taxonomy = load_taxonomy(classifier.idx_to_class)
+        predictions = []
+        for start in range(0, len(paths), args.batch_size):
+            images = classifier.decode_many(paths[start:start + args.batch_size])
+            predictions.extend(taxonomy.top_k(classifier.predict(images), args.top_k, args.level))
+    for path, prediction in zip(paths, predictions):
+        print(f"{path.name}: {format_prediction(prediction)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
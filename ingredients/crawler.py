@@ -0,0 +1,352 @@
+"""Concurrent, resumable ingredient image crawler.
+
+Replaces the notebook loop that ran one ``GoogleImageCrawler`` per ingredient in turn.
+Candidate image URLs for each class come from a URL source:
+
+* ``serpapi_source``: Google Images through SerpAPI, the search API ``web_scraping.py``
+  already uses. Needs ``SERPAPI_API_KEY`` in the environment.
+* ``url_list_source``: a JSON index ``{"<class>": ["<url>", ...]}`` read from a file or
+  URL. Pointed at a local HTTP server serving fixture images, it lets the crawler be
+  tested without the network.
+
+Downloads for all classes share one bounded thread pool. A class is only given as many
+downloads in flight as it still needs, so the crawl stops fetching a class once it has
+``--per-class`` images. Each response is size-capped while streaming, then decoded with
+Pillow. Corrupt files, non-images, decompression bombs and images smaller than
+``--min-size`` are rejected before anything is written. Accepted images are stored as
+``<output>/<Class>/<sha256 prefix>.<ext>``, so an image served under two URLs is
+stored once.
+
+Every URL tried is appended to ``<output>/crawl_manifest.csv`` (url, class, sha256,
+width, height, bytes, path, status) as soon as it finishes. A re-run skips URLs the
+manifest records as stored, duplicate or rejected, and classes whose folder already
+holds enough images, so an interrupted crawl resumes where it stopped. URLs that failed
+with a network or HTTP error are tried again.
+
+    python -m ingredients.crawler --per-class 100 --workers 16
+    python -m ingredients.crawler --urls http://localhost:8000/index.json --output /tmp/crawl
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Iterable
+from urllib.parse import urlparse
+
+import httpx
+
+from .classifier import MAPPING_PATH, REPO_ROOT, image_paths, load_class_mapping
+
+OUTPUT_DIR = REPO_ROOT / "ingredients_dataset" / "train"
+MANIFEST = "crawl_manifest.csv"
+MANIFEST_COLUMNS = ["url", "class", "sha256", "width", "height", "bytes", "path", "status"]
+# Outcomes a re-run accepts as settled; "error: ..." rows (timeouts, HTTP errors) are retried
+FINAL_STATUSES = {"ok", "duplicate", "rejected"}
+
+PER_CLASS = 100
+MIN_SIZE = 128  # pixels, shortest side; the notebook crawled with min_size=(128, 128)
+MAX_BYTES = 20 * 1024 * 1024
+WORKERS = 16
+# Candidate URLs requested per image still needed; many results fail validation
+OVERFETCH = 2
+TIMEOUT = 15.0
+USER_AGENT = "Mozilla/5.0 (compatible; SlicePrice ingredient crawler)"
+FORMAT_SUFFIXES = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp", "BMP": ".bmp"}
+
+SERPAPI_URL = "https://serpapi.com/search.json"
+SERPAPI_PAGE_SIZE = 100
+
+UrlSource = Callable[[str, int], list[str]]
+
+
+class Rejected(Exception):
+    """A downloaded file that is not a usable image."""
+
+
+def search_query(class_name: str) -> str:
+    # Same keyword the notebook crawled with
+    return f"{class_name.replace('_', ' ')} food ingredient"
+
+
+def serpapi_source(client: httpx.Client, api_key: str | None = None) -> UrlSource:
+    api_key = api_key or os.environ.get("SERPAPI_API_KEY")
+    if not api_key:
+        raise RuntimeError("Searching Google Images needs a SerpAPI key: set SERPAPI_API_KEY")
+
+    def urls(class_name: str, limit: int) -> list[str]:
+        found = []
+        page = 0
+        while len(found) < limit:
+            response = client.get(SERPAPI_URL, params={
+                "engine": "google_images", "q": search_query(class_name), "ijn": page, "api_key": api_key,
+            })
+            response.raise_for_status()
+            results = response.json().get("images_results", [])
+            found.extend(result["original"] for result in results if result.get("original"))
+            if len(results) < SERPAPI_PAGE_SIZE:
+                break
+            page += 1
+        return found[:limit]
+
+    return urls
+
+
+def url_list_source(location: str, client: httpx.Client) -> UrlSource:
+    """URLs from a JSON ``{class: [url, ...]}`` index at a path or HTTP URL.
+
+    Relative URLs in an index fetched over HTTP resolve against the index URL.
+    """
+    if urlparse(location).scheme in ("http", "https"):
+        response = client.get(location)
+        response.raise_for_status()
+        index = response.json()
+        base = httpx.URL(location)
+        index = {name: [str(base.join(url)) for url in urls] for name, urls in index.items()}
+    else:
+        with open(location, "r", encoding="utf-8") as f:
+            index = json.load(f)
+
+    def urls(class_name: str, limit: int) -> list[str]:
+        return index.get(class_name, [])[:limit]
+
+    return urls
+
+
+def validate_image(data: bytes, min_size: int = MIN_SIZE) -> tuple[int, int, str]:
+    """``(width, height, suffix)`` of an encoded image, or ``Rejected`` if it is unusable."""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image_format = image.format
+            width, height = image.size
+            # verify() checks structure; load() catches truncated pixel data verify misses
+            image.verify()
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+    except Image.DecompressionBombError as err:
+        raise Rejected(f"too many pixels: {err}") from err
+    except (UnidentifiedImageError, OSError, ValueError, SyntaxError) as err:
+        raise Rejected(f"corrupt: {err}") from err
+    except Exception as err:
+        # Pillow's decoders raise assorted other errors on malformed files
+        raise Rejected(f"corrupt: {type(err).__name__}: {err}") from err
+    if image_format not in FORMAT_SUFFIXES:
+        raise Rejected(f"unsupported format {image_format}")
+    if min(width, height) < min_size:
+        raise Rejected(f"too small: {width}x{height}")
+    return width, height, FORMAT_SUFFIXES[image_format]
+
+
+def download(client: httpx.Client, url: str, max_bytes: int = MAX_BYTES) -> bytes:
+    with client.stream("GET", url) as response:
+        response.raise_for_status()
+        declared = int(response.headers.get("content-length") or 0)
+        if declared > max_bytes:
+            raise Rejected(f"too large: {declared} bytes")
+        chunks, size = [], 0
+        for chunk in response.iter_bytes():
+            size += len(chunk)
+            if size > max_bytes:
+                raise Rejected(f"too large: over {max_bytes} bytes")
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+
+class Manifest:
+    """The append-only crawl manifest; safe to record into from several threads."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.rows: list[dict] = []
+        if path.exists():
+            with open(path, newline="", encoding="utf-8") as f:
+                self.rows = list(csv.DictReader(f))
+        self._lock = threading.Lock()
+        new_file = not path.exists()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "a", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=MANIFEST_COLUMNS)
+        if new_file:
+            self._writer.writeheader()
+            self._file.flush()
+
+    def seen_urls(self) -> set[str]:
+        """URLs with a final outcome, which a re-run need not fetch again."""
+        return {row["url"] for row in self.rows if row["status"].partition(":")[0] in FINAL_STATUSES}
+
+    def hashes(self) -> set[tuple[str, str]]:
+        return {(row["class"], row["sha256"]) for row in self.rows if row["status"] == "ok"}
+
+    def record(self, **row) -> None:
+        row = {column: row.get(column, "") for column in MANIFEST_COLUMNS}
+        with self._lock:
+            self.rows.append(row)
+            self._writer.writerow(row)
+            # Flushed per row so an interrupted crawl loses at most the downloads in flight
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _store(data: bytes, class_dir: Path, digest: str, suffix: str) -> Path:
+    class_dir.mkdir(parents=True, exist_ok=True)
+    path = class_dir / f"{digest[:16]}{suffix}"
+    tmp_path = path.with_name(path.name + ".part")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+def existing_counts(output_dir: Path, classes: Iterable[str]) -> dict[str, int]:
+    """Images already on disk per class folder, from this crawler or an earlier one."""
+    return {name: len(image_paths(output_dir / name)) if (output_dir / name).is_dir() else 0 for name in classes}
+
+
+class Crawler:
+    """Downloads up to ``per_class`` valid images per class with ``workers`` threads."""
+
+    def __init__(self, source: UrlSource, client: httpx.Client, output_dir: Path = OUTPUT_DIR,
+                 per_class: int = PER_CLASS, workers: int = WORKERS, min_size: int = MIN_SIZE,
+                 max_bytes: int = MAX_BYTES, log: Callable[[str], None] = print,
+                 manifest_path: Path | None = None):
+        self.source = source
+        self.client = client
+        self.output_dir = Path(output_dir)
+        self.per_class = per_class
+        self.workers = workers
+        self.min_size = min_size
+        self.max_bytes = max_bytes
+        self.log = log
+        self.manifest = Manifest(Path(manifest_path) if manifest_path else self.output_dir / MANIFEST)
+        self._hash_lock = threading.Lock()
+        self._stored = self.manifest.hashes()
+
+    def _fetch(self, class_name: str, url: str) -> dict:
+        """Download, validate and store one URL; returns its manifest row."""
+        try:
+            data = download(self.client, url, self.max_bytes)
+            width, height, suffix = validate_image(data, self.min_size)
+        except Rejected as err:
+            return {"url": url, "class": class_name, "status": f"rejected: {err}"}
+        except (httpx.HTTPError, httpx.InvalidURL) as err:
+            return {"url": url, "class": class_name, "status": f"error: {type(err).__name__}"}
+        digest = hashlib.sha256(data).hexdigest()
+        row = {"url": url, "class": class_name, "sha256": digest, "width": width, "height": height,
+               "bytes": len(data)}
+        with self._hash_lock:
+            duplicate = (class_name, digest) in self._stored
+            self._stored.add((class_name, digest))
+        if duplicate:
+            return {**row, "status": "duplicate"}
+        path = _store(data, self.output_dir / class_name, digest, suffix)
+        return {**row, "path": path.relative_to(self.output_dir).as_posix(), "status": "ok"}
+
+    def crawl(self, classes: Iterable[str]) -> Counter:
+        """Crawl ``classes``; returns the images added per class."""
+        classes = list(classes)
+        have = existing_counts(self.output_dir, classes)
+        needed = {name: self.per_class - have[name] for name in classes if have[name] < self.per_class}
+        for name in classes:
+            if name not in needed:
+                self.log(f"{name}: already has {have[name]} images, skipping")
+        if not needed:
+            return Counter()
+
+        seen = self.manifest.seen_urls()
+        added: Counter = Counter()
+        in_flight: Counter = Counter()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="crawler") as pool:
+            # Searches run in the same pool, so at most ``workers`` requests are ever open
+            searches = {name: pool.submit(self.source, name, needed[name] * OVERFETCH + have[name])
+                        for name in needed}
+            candidates = defaultdict(list)
+            for name, search in searches.items():
+                try:
+                    candidates[name] = [url for url in dict.fromkeys(search.result()) if url not in seen]
+                except (httpx.HTTPError, ValueError) as err:
+                    self.log(f"{name}: search failed ({err})")
+                candidates[name].reverse()  # pop() from the end takes them in search order
+
+            pending = {}
+
+            def fill():
+                # Round-robin over classes so every class makes progress from the start
+                progressed = True
+                while progressed and len(pending) < self.workers * 2:
+                    progressed = False
+                    for name in needed:
+                        if added[name] + in_flight[name] < needed[name] and candidates[name]:
+                            url = candidates[name].pop()
+                            pending[pool.submit(self._fetch, name, url)] = name
+                            in_flight[name] += 1
+                            progressed = True
+
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    in_flight[name] -= 1
+                    row = future.result()
+                    self.manifest.record(**row)
+                    if row["status"] == "ok":
+                        added[name] += 1
+                        if added[name] == needed[name]:
+                            self.log(f"{name}: {have[name] + added[name]} images")
+                fill()
+
+        for name in needed:
+            if added[name] < needed[name]:
+                self.log(f"{name}: ran out of candidates at {have[name] + added[name]}/{self.per_class} images")
+        return added
+
+    def close(self) -> None:
+        self.manifest.close()
+
+
+def make_client(workers: int = WORKERS) -> httpx.Client:
+    return httpx.Client(
+        timeout=TIMEOUT, follow_redirects=True, headers={"User-Agent": USER_AGENT},
+        limits=httpx.Limits(max_connections=workers, max_keepalive_connections=workers),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download ingredient images for every mapped class.")
+    parser.add_argument("classes", nargs="*", help="Class folder names (default: every class in class_mapping.pkl)")
+    parser.add_argument("--urls", default=None, metavar="INDEX",
+                        help="JSON {class: [url, ...]} index file or URL instead of searching Google Images")
+    parser.add_argument("--output", default=str(OUTPUT_DIR), help="Class folders go here (default: ingredients_dataset/train)")
+    parser.add_argument("--per-class", type=int, default=PER_CLASS, help=f"Images wanted per class (default: {PER_CLASS})")
+    parser.add_argument("--workers", type=int, default=WORKERS, help=f"Concurrent downloads (default: {WORKERS})")
+    parser.add_argument("--min-size", type=int, default=MIN_SIZE, help="Shortest side in pixels to accept")
+    parser.add_argument("--manifest", default=None, help=f"Crawl manifest (default: <output>/{MANIFEST})")
+    args = parser.parse_args(argv)
+
+    classes = args.classes or sorted(load_class_mapping(MAPPING_PATH)[1])
+    with make_client(args.workers) as client:
+        source = url_list_source(args.urls, client) if args.urls else serpapi_source(client)
+        crawler = Crawler(source, client, Path(args.output), args.per_class, args.workers, args.min_size,
+                          manifest_path=args.manifest)
+        try:
+            added = crawler.crawl(classes)
+        finally:
+            crawler.close()
+    print(f"Added {sum(added.values())} images to {len(added)} classes; manifest: {crawler.manifest.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+"""Perceptual-hash deduplication of crawled ingredient images.
+
+Image searches for related ingredients ("Parmesan", "Parmesan Cheese", "Aged
+Parmesan") return many of the same photos, re-encoded, resized or lightly cropped.
+Every image gets a 64-bit DCT perceptual hash (pHash). Two images count as
+near-duplicates when their hashes differ in at most ``threshold`` bits.
+
+Hashing runs in a process pool. Pillow's JPEG draft mode decodes straight to a small
+size, so hashing costs about as much as reading the file. Hashes are cached by path,
+size and mtime in ``phash_cache.csv``, so re-running after a crawl only hashes new
+files.
+
+Near-duplicate pairs are found with multi-index hashing rather than all-pairs
+comparison. The 64 bits are split into ``threshold + 1`` disjoint segments. Any two
+hashes within ``threshold`` bits of each other agree exactly on at least one segment
+(pigeonhole), so only images sharing a segment value are compared. With the default
+threshold of 4 the segments are 12-13 bits, a few dozen images per bucket at hundreds
+of thousands of images; every extra bit of threshold narrows the segments and grows
+the buckets.
+Pairs are joined into clusters with union-find, and each cluster keeps its
+highest-resolution image.
+
+Outputs, in ``--output-dir``:
+
+    dedup_report.json   settings, totals, and every cluster with the image kept, the
+                        images dropped and their distances, and the classes involved
+    manifest.csv        path, class, phash, width, height, bytes of the kept images
+
+    python -m ingredients.dedup ingredients_dataset/train --within-class
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from .classifier import REPO_ROOT, image_paths
+
+OUTPUT_DIR = REPO_ROOT / "ingredients_dataset"
+HASH_CACHE = "phash_cache.csv"
+REPORT = "dedup_report.json"
+MANIFEST = "manifest.csv"
+MANIFEST_COLUMNS = ["path", "class", "phash", "width", "height", "bytes"]
+
+HASH_BITS = 64
+THRESHOLD = 4
+HASH_SIZE = 8  # the hash is the sign pattern of the lowest 8x8 DCT frequencies
+DCT_SIZE = 32  # of a 32x32 grayscale thumbnail
+HASH_WORKERS = os.cpu_count() or 4
+HASH_CHUNK = 64
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II basis; ``D @ x @ D.T`` is the 2-D DCT of ``x``."""
+    k = np.arange(n)[:, None]
+    basis = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    basis[0] /= np.sqrt(2)
+    return basis
+
+
+_DCT = _dct_matrix(DCT_SIZE)[:HASH_SIZE]
+_BIT_WEIGHTS = np.uint64(1) << np.arange(HASH_BITS, dtype=np.uint64)[::-1]
+
+
+def phash(path) -> tuple[int, int, int]:
+    """``(hash, width, height)`` of the image at ``path``."""
+    from PIL import Image
+
+    with Image.open(path) as image:
+        width, height = image.size
+        image.draft("L", (DCT_SIZE * 2, DCT_SIZE * 2))
+        thumb = image.convert("L").resize((DCT_SIZE, DCT_SIZE), Image.Resampling.LANCZOS)
+    pixels = np.asarray(thumb, dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T).ravel()
+    # Compare against the median of the AC terms; the DC term only encodes brightness
+    bits = low > np.median(low[1:])
+    return int(np.bitwise_or.reduce(_BIT_WEIGHTS[bits], initial=np.uint64(0))), width, height
+
+
+def _hash_entry(path: str) -> tuple[str, int | None, int, int]:
+    try:
+        value, width, height = phash(path)
+    except (OSError, ValueError):
+        return path, None, 0, 0
+    return path, value, width, height
+
+
+def _class_name(path: Path, root: Path) -> str:
+    relative = path.relative_to(root)
+    return relative.parts[0] if len(relative.parts) > 1 else ""
+
+
+def scan(sources) -> list[dict]:
+    """Image files under ``sources`` with their class folder, size and mtime."""
+    entries = []
+    for source in sources:
+        root = Path(source).resolve()
+        for path in image_paths(root):
+            stat = path.stat()
+            entries.append({"path": str(path), "class": _class_name(path, root),
+                            "bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+    return entries
+
+
+def _read_hash_cache(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    with open(path, newline="", encoding="utf-8") as f:
+        return {(row["path"], int(row["bytes"]), int(row["mtime_ns"])):
+                (int(row["phash"], 16), int(row["width"]), int(row["height"]))
+                for row in csv.DictReader(f)}
+
+
+def _write_hash_cache(path: Path, entries: list[dict]) -> None:
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["path", "bytes", "mtime_ns", "phash", "width", "height"])
+        for entry in entries:
+            writer.writerow([entry["path"], entry["bytes"], entry["mtime_ns"],
+                             f"{entry['phash']:016x}", entry["width"], entry["height"]])
+    os.replace(tmp_path, path)
+
+
+def hash_images(entries: list[dict], cache_path: Path | None = None,
+                workers: int = HASH_WORKERS) -> tuple[list[dict], list[str]]:
+    """Add ``phash``, ``width`` and ``height`` to ``entries``; return them and the unreadable paths."""
+    cached = _read_hash_cache(cache_path) if cache_path else {}
+    todo = []
+    for entry in entries:
+        hit = cached.get((entry["path"], entry["bytes"], entry["mtime_ns"]))
+        if hit is None:
+            todo.append(entry)
+        else:
+            entry["phash"], entry["width"], entry["height"] = hit
+
+    by_path = {entry["path"]: entry for entry in todo}
+    failed = []
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, value, width, height in pool.map(_hash_entry, list(by_path), chunksize=HASH_CHUNK):
+                if value is None:
+                    failed.append(path)
+                else:
+                    by_path[path].update(phash=value, width=width, height=height)
+
+    hashed = [entry for entry in entries if "phash" in entry]
+    if cache_path:
+        _write_hash_cache(cache_path, hashed)
+    return hashed, failed
+
+
+def hamming(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.bitwise_count(np.bitwise_xor(a, b)).astype(np.int64)
+
+
+def _segments(threshold: int) -> list[tuple[int, int]]:
+    """``(shift, width)`` of ``threshold + 1`` disjoint bit segments covering the hash."""
+    count = min(threshold + 1, HASH_BITS)
+    edges = np.linspace(0, HASH_BITS, count + 1).astype(int)
+    return [(int(start), int(end - start)) for start, end in zip(edges[:-1], edges[1:])]
+
+
+def near_duplicate_pairs(hashes: np.ndarray, threshold: int = THRESHOLD) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Index pairs ``(i, j)``, ``i < j``, of hashes at most ``threshold`` bits apart, and their distances."""
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    found_i, found_j = [], []
+    for shift, width in _segments(threshold):
+        keys = (hashes >> np.uint64(shift)) & np.uint64((1 << width) - 1)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        sizes = np.diff(np.r_[starts, len(order)])
+        for start, size in zip(starts[sizes > 1], sizes[sizes > 1]):
+            members = order[start:start + size]
+            left, right = np.triu_indices(size, k=1)
+            i, j = members[left], members[right]
+            close = hamming(hashes[i], hashes[j]) <= threshold
+            found_i.append(np.minimum(i, j)[close])
+            found_j.append(np.maximum(i, j)[close])
+    if not found_i:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    # A pair sharing several segments is found once per segment
+    pairs = np.unique(np.stack([np.concatenate(found_i), np.concatenate(found_j)], axis=1), axis=0)
+    i, j = pairs[:, 0], pairs[:, 1]
+    return i, j, hamming(hashes[i], hashes[j])
+
+
+def clusters(n: int, i: np.ndarray, j: np.ndarray) -> list[list[int]]:
+    """Connected components of size > 1 of the graph with edges ``(i, j)``."""
+    parent = np.arange(n)
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in zip(i.tolist(), j.tolist()):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+    roots = np.array([find(x) for x in range(n)]) if n else np.empty(0, dtype=np.int64)
+    groups: dict[int, list[int]] = {}
+    for index, root in enumerate(roots.tolist()):
+        groups.setdefault(root, []).append(index)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def _keep_order(entry: dict) -> tuple:
+    # Highest resolution first, then the larger (less compressed) file
+    return (-entry["width"] * entry["height"], -entry["bytes"], entry["path"])
+
+
+def deduplicate(entries: list[dict], threshold: int = THRESHOLD, within_class: bool = False) -> tuple[list[dict], list[dict]]:
+    """The entries to keep and the duplicate clusters found among hashed ``entries``.
+
+    With ``within_class`` only images in the same class folder count as duplicates.
+    """
+    hashes = np.array([entry["phash"] for entry in entries], dtype=np.uint64)
+    i, j, distance = near_duplicate_pairs(hashes, threshold)
+    if within_class:
+        classes = np.array([entry["class"] for entry in entries])
+        same = classes[i] == classes[j] if len(i) else np.empty(0, dtype=bool)
+        i, j, distance = i[same], j[same], distance[same]
+
+    dropped = set()
+    found = []
+    for members in clusters(len(entries), i, j):
+        members.sort(key=lambda index: _keep_order(entries[index]))
+        keep, duplicates = members[0], members[1:]
+        dropped.update(duplicates)
+        found.append({
+            "keep": entries[keep]["path"],
+            "duplicates": [
+                {"path": entries[index]["path"], "class": entries[index]["class"],
+                 "distance": int(hamming(hashes[keep], hashes[index]))}
+                for index in duplicates
+            ],
+            "classes": sorted({entries[index]["class"] for index in members}),
+        })
+    found.sort(key=lambda cluster: -len(cluster["duplicates"]))
+    kept = [entry for index, entry in enumerate(entries) if index not in dropped]
+    return kept, found
+
+
+def _relative(path: str) -> str:
+    try:
+        return Path(path).relative_to(REPO_ROOT).as_posix()
+    except ValueError:
+        return path
+
+
+def write_outputs(output_dir: Path, kept: list[dict], found: list[dict], summary: dict) -> None:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST
+    with open(manifest_path.with_suffix(".tmp"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(MANIFEST_COLUMNS)
+        for entry in kept:
+            writer.writerow([_relative(entry["path"]), entry["class"], f"{entry['phash']:016x}",
+                             entry["width"], entry["height"], entry["bytes"]])
+    os.replace(manifest_path.with_suffix(".tmp"), manifest_path)
+
+    for cluster in found:
+        cluster["keep"] = _relative(cluster["keep"])
+        for duplicate in cluster["duplicates"]:
+            duplicate["path"] = _relative(duplicate["path"])
+    with open(output_dir / REPORT, "w", encoding="utf-8") as f:
+        json.dump({**summary, "clusters": found}, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find and drop near-duplicate ingredient images.")
+    parser.add_argument("sources", nargs="*", default=[str(OUTPUT_DIR / "train")],
+                        help="Image folders, with <folder>/<class>/ subfolders (default: ingredients_dataset/train)")
+    parser.add_argument("--threshold", type=int, default=THRESHOLD,
+                        help=f"Max differing hash bits for a near-duplicate (default: {THRESHOLD})")
+    parser.add_argument("--within-class", action="store_true", help="Only deduplicate inside each class folder")
+    parser.add_argument("--workers", type=int, default=HASH_WORKERS, help="Hashing processes")
+    parser.add_argument("--output-dir", default=str(OUTPUT_DIR), help="Where the report and manifest go")
+    args = parser.parse_args(argv)
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    entries, failed = hash_images(scan(args.sources), output_dir / HASH_CACHE, args.workers)
+    kept, found = deduplicate(entries, args.threshold, args.within_class)
+    summary = {
+        "threshold": args.threshold,
+        "within_class": args.within_class,
+        "images": len(entries),
+        "kept": len(kept),
+        "dropped": len(entries) - len(kept),
+        "duplicate_clusters": len(found),
+        "cross_class_clusters": sum(len(cluster["classes"]) > 1 for cluster in found),
+        "unreadable": [_relative(path) for path in failed],
+    }
+    write_outputs(output_dir, kept, found, summary)
+    print(f"{summary['images']} images: kept {summary['kept']}, dropped {summary['dropped']} "
+          f"in {summary['duplicate_clusters']} clusters ({summary['cross_class_clusters']} spanning classes), "
+          f"{len(failed)} unreadable -> {output_dir / MANIFEST}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
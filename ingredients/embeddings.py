@@ -0,0 +1,477 @@
+"""Image embeddings from the ingredient model and a nearest-neighbour index over them.
+
+Each image is embedded as the activations feeding the model's final classification
+layer (the penultimate layer). The embeddings are L2-normalized, so the dot product of
+two of them is their cosine similarity. Photos of the same ingredient sit close
+together even when their pixels differ. A photo whose neighbours are mostly another
+class is probably mislabeled, and near-identical shots score close to 1.
+
+Embeddings are computed in batches, with the next batch decoding while the current
+one runs through the model. They are stored as rows of one float16 matrix, which
+halves the size of float32 and is read back through a memory map:
+
+    ingredients_cache/embeddings/
+        vectors.npy       float16 (capacity, dim); the first ``count`` rows are used
+        centroids.npy     float32 (lists, dim), IVF centroids once trained
+        assignments.npy   int32 (count,), the list of every row
+        manifest.json     dim, count, model, and per row path, size, mtime and label
+
+Adding images is incremental. New files are appended, files whose size or mtime
+changed are re-embedded in place, and the rest are skipped. ``vectors.npy`` grows by
+doubling, so appending stays cheap. ``--rebuild`` starts over, which also drops the
+rows of deleted files. Files that fail to decode are reported and left out, so the
+next build tries them again.
+
+Small indexes are searched exactly: a float32 matrix product over the whole matrix, in
+chunks. From ``IVF_MIN_ROWS`` rows on, the index is IVF (inverted file). A spherical
+k-means over a sample splits the rows into about ``sqrt(count)`` lists, and a query is
+only compared with the rows of its ``nprobe`` closest lists. At a few hundred thousand
+images that is a few thousand rows per query, about 2 ms each. For this the vectors
+are held in memory in list order, as float32 up to ``SEARCH_MEMORY``. New rows join
+their closest list. The lists are re-clustered once the index has doubled since it was
+last trained, so they keep up with the data.
+
+    python -m ingredients.embeddings build ingredients_data ingredients_dataset/train
+    python -m ingredients.embeddings query photo.jpg --k 10
+    python -m ingredients.embeddings audit --output ingredients_dataset/embedding_audit.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from .classifier import (
+    IMAGE_DIR,
+    MAX_BATCH,
+    MODEL_PATH,
+    IncompatibleModelError,
+    ImageSource,
+    IngredientClassifier,
+    image_paths,
+    load_class_mapping,
+    load_keras_model,
+)
+from .image_cache import CACHE_ROOT, UNLABELED, _relative, _signature, label_for
+
+INDEX_DIR = CACHE_ROOT / "embeddings"
+TOP_K = 10
+NPROBE = 8
+IVF_MIN_ROWS = 20_000
+# Rows sampled to fit the IVF centroids, and k-means iterations over them
+TRAIN_SAMPLE = 50_000
+TRAIN_ITERATIONS = 10
+# Rows converted to float32 per step of an exact search or an assignment pass
+SEARCH_CHUNK = 32_768
+# Largest float32 copy of the vectors kept in memory for IVF search; above it, float16
+SEARCH_MEMORY = 2 * 1024 ** 3
+MIN_CAPACITY = 1024
+DUPLICATE_SIMILARITY = 0.97
+
+
+def embedding_model(model):
+    """A Keras model returning the input of ``model``'s final layer."""
+    from tensorflow import keras
+
+    return keras.Model(model.inputs, model.layers[-1].input)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class Embedder:
+    """Penultimate-layer embeddings of images, using a classifier's model and preprocessing."""
+
+    def __init__(self, classifier: IngredientClassifier):
+        self.classifier = classifier
+        self.model = embedding_model(classifier.model)
+        self.dim = int(self.model.output_shape[-1])
+        self._lock = threading.Lock()
+
+    def embed(self, images: np.ndarray) -> np.ndarray:
+        """float16 unit vectors for a uint8 image batch, ``(n, dim)``."""
+        batch = images.astype(np.float32) * np.float32(self.classifier.scale)
+        with self._lock:
+            features = self.model.predict_on_batch(batch)
+        features = np.asarray(features, dtype=np.float32).reshape(len(batch), -1)
+        return normalize(features).astype(np.float16)
+
+    def embed_many(self, sources: list[ImageSource],
+                   batch_size: int = MAX_BATCH) -> Iterator[tuple[int, np.ndarray, np.ndarray]]:
+        """``(offset, vectors, decoded)`` per batch of ``sources``, decoding the next batch meanwhile.
+
+        ``decoded`` is False for images that failed to decode. Their rows of ``vectors``
+        are zero and must not be stored or searched with.
+        """
+        start = 0
+        for batch in self.classifier.decoded_batches(sources, batch_size, skip=(OSError, ValueError)):
+            decoded = np.array([image is not None for _, image in batch])
+            vectors = np.zeros((len(batch), self.dim), dtype=np.float16)
+            if decoded.any():
+                vectors[decoded] = self.embed(np.stack([image for _, image in batch if image is not None]))
+            yield start, vectors, decoded
+            start += len(batch)
+
+
+def _top_k(scores: np.ndarray, rows: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """The ``k`` best ``scores`` per query row with their ``rows``, best first."""
+    if scores.shape[1] > k:
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, best, axis=1)
+        rows = np.take_along_axis(rows, best, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+
+class EmbeddingIndex:
+    """A growable float16 embedding matrix with exact or IVF k-nearest-neighbour search."""
+
+    def __init__(self, index_dir: str | Path = INDEX_DIR):
+        self.index_dir = Path(index_dir)
+        manifest_path = self.index_dir / "manifest.json"
+        if manifest_path.exists():
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"dim": None, "count": 0, "trained_rows": 0, "model": None, "entries": []}
+        self.vectors = None
+        self.centroids = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        if self.count:
+            self.vectors = np.load(self.index_dir / "vectors.npy", mmap_mode="r+")
+            if self.manifest["trained_rows"]:
+                self.centroids = np.load(self.index_dir / "centroids.npy")
+                self.assignments = np.load(self.index_dir / "assignments.npy")
+        self._lists = None
+        self.rows = {entry["path"]: row for row, entry in enumerate(self.entries)}
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def count(self) -> int:
+        return self.manifest["count"]
+
+    @property
+    def dim(self) -> int | None:
+        return self.manifest["dim"]
+
+    @property
+    def entries(self) -> list[dict]:
+        return self.manifest["entries"]
+
+    @property
+    def labels(self) -> np.ndarray:
+        return np.array([entry["label"] for entry in self.entries], dtype=np.int16)
+
+    def matrix(self) -> np.ndarray:
+        """The used rows of the embedding matrix, a float16 memory-mapped view."""
+        if self.vectors is None:
+            return np.empty((0, self.dim or 0), dtype=np.float16)
+        return self.vectors[:self.count]
+
+    def _grow(self, rows: int) -> None:
+        capacity = 0 if self.vectors is None else len(self.vectors)
+        if rows <= capacity:
+            return
+        capacity = max(rows, 2 * capacity, MIN_CAPACITY)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_dir / "vectors.tmp.npy"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float16, shape=(capacity, self.dim))
+        for start in range(0, self.count, SEARCH_CHUNK):
+            end = min(start + SEARCH_CHUNK, self.count)
+            grown[start:end] = self.vectors[start:end]
+        grown.flush()
+        del grown
+        self.vectors = None
+        os.replace(tmp_path, self.index_dir / "vectors.npy")
+        self.vectors = np.load(self.index_dir / "vectors.npy", mmap_mode="r+")
+
+    def add(self, vectors: np.ndarray, entries: list[dict]) -> np.ndarray:
+        """Store ``vectors`` for ``entries``, replacing the rows of paths already indexed.
+
+        Each entry has a ``path`` and ``label``, and any other fields worth keeping. Call
+        ``save`` to make the additions durable. Returns the rows written.
+        """
+        vectors = np.asarray(vectors, dtype=np.float16)
+        if self.dim is None:
+            self.manifest["dim"] = int(vectors.shape[1])
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"index holds {self.dim}-dimensional embeddings, got {vectors.shape[1]}")
+        rows = np.empty(len(entries), dtype=np.int64)
+        for i, entry in enumerate(entries):
+            row = self.rows.get(entry["path"])
+            if row is None:
+                row = self.rows[entry["path"]] = len(self.entries)
+                self.entries.append(entry)
+            else:
+                self.entries[row] = entry
+            rows[i] = row
+        self._grow(len(self.entries))
+        self.vectors[rows] = vectors
+        self.manifest["count"] = len(self.entries)
+
+        if self.centroids is not None:
+            assignments = np.full(self.count, -1, dtype=np.int32)
+            assignments[:len(self.assignments)] = self.assignments
+            assignments[rows] = self._nearest_list(vectors)
+            self.assignments = assignments
+            self._lists = None
+        if self.count >= IVF_MIN_ROWS and self.count >= 2 * self.manifest["trained_rows"]:
+            self.train()
+        return rows
+
+    def _nearest_list(self, vectors: np.ndarray) -> np.ndarray:
+        nearest = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), SEARCH_CHUNK):
+            chunk = np.asarray(vectors[start:start + SEARCH_CHUNK], dtype=np.float32)
+            nearest[start:start + len(chunk)] = (chunk @ self.centroids.T).argmax(axis=1)
+        return nearest
+
+    def train(self, lists: int | None = None, seed: int = 0) -> None:
+        """Cluster the rows into ``lists`` IVF lists (default: about ``sqrt(count)``)."""
+        lists = lists or max(1, int(np.sqrt(self.count)))
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(self.count, size=min(self.count, max(TRAIN_SAMPLE, 4 * lists)), replace=False))
+        sample = np.asarray(self.matrix()[sample_rows], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), size=lists, replace=False)]
+        for _ in range(TRAIN_ITERATIONS):
+            nearest = (sample @ centroids.T).argmax(axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, sample)
+            empty = np.bincount(nearest, minlength=lists) == 0
+            # Lists that lost all their rows restart from random sample rows
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+            centroids = normalize(sums)
+        self.centroids = centroids
+        self.assignments = self._nearest_list(self.matrix())
+        self.manifest["trained_rows"] = self.count
+        self._lists = None
+
+    def _inverted_lists(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Rows grouped by list, where each list starts in that order, and their vectors.
+
+        The vectors are copied in list order, so a probed list is one contiguous slice,
+        and converted to float32 when that fits in ``SEARCH_MEMORY``. Converting float16
+        on every query costs several times the dot products themselves.
+        """
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind="stable")
+            starts = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+            dtype = np.float32 if self.count * self.dim * 4 <= SEARCH_MEMORY else np.float16
+            packed = np.empty((self.count, self.dim), dtype=dtype)
+            matrix = self.matrix()
+            for start in range(0, self.count, SEARCH_CHUNK):
+                chunk = order[start:start + SEARCH_CHUNK]
+                packed[start:start + len(chunk)] = matrix[chunk]
+            self._lists = order, starts, packed
+        return self._lists
+
+    def search(self, queries: np.ndarray, k: int = TOP_K, nprobe: int = NPROBE) -> tuple[np.ndarray, np.ndarray]:
+        """``(similarities, rows)`` of the ``k`` nearest rows to each query, ``(n, k)`` each.
+
+        Queries are embeddings, normalized here. Missing neighbours (``k`` larger than
+        the rows searched) have row -1 and similarity -inf.
+        """
+        queries = normalize(np.atleast_2d(queries))
+        k = min(k, self.count)
+        if k < 1:
+            return np.empty((len(queries), 0), dtype=np.float32), np.empty((len(queries), 0), dtype=np.int64)
+        if self.centroids is None or nprobe >= len(self.centroids):
+            return self._exact(queries, k)
+        return self._probe(queries, k, nprobe)
+
+    def _exact(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        matrix = self.matrix()
+        for start in range(0, self.count, SEARCH_CHUNK):
+            chunk = np.asarray(matrix[start:start + SEARCH_CHUNK], dtype=np.float32)
+            scores = queries @ chunk.T
+            rows = np.broadcast_to(np.arange(start, start + len(chunk)), scores.shape)
+            best_scores, best_rows = _top_k(np.hstack([best_scores, scores]), np.hstack([best_rows, rows]), k)
+        return best_scores, best_rows
+
+    def _probe(self, queries: np.ndarray, k: int, nprobe: int) -> tuple[np.ndarray, np.ndarray]:
+        order, starts, packed = self._inverted_lists()
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        rows = np.full((len(queries), k), -1, dtype=np.int64)
+        for i, (query, probe) in enumerate(zip(queries, probes)):
+            candidates = np.concatenate([order[starts[p]:starts[p + 1]] for p in probe])
+            if not len(candidates):
+                continue
+            similarities = np.concatenate([np.asarray(packed[starts[p]:starts[p + 1]], dtype=np.float32) @ query
+                                           for p in probe])
+            found_scores, found_rows = _top_k(similarities[None], candidates[None], k)
+            scores[i, :found_scores.shape[1]] = found_scores[0]
+            rows[i, :found_rows.shape[1]] = found_rows[0]
+        return scores, rows
+
+    def save(self) -> None:
+        """Write the index; the manifest goes last, so readers never see rows not yet written."""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        if self.vectors is not None:
+            self.vectors.flush()
+        if self.centroids is not None:
+            for name, array in (("centroids", self.centroids), ("assignments", self.assignments)):
+                with open(self.index_dir / f"{name}.tmp.npy", "wb") as f:
+                    np.save(f, array)
+                os.replace(self.index_dir / f"{name}.tmp.npy", self.index_dir / f"{name}.npy")
+        with open(self.index_dir / "manifest.tmp.json", "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(self.index_dir / "manifest.tmp.json", self.index_dir / "manifest.json")
+
+
+def _model_id(path: Path) -> str:
+    return f"{path.name}:{path.stat().st_mtime_ns}" if path.exists() else path.name
+
+
+def build_index(embedder: Embedder, sources: Iterable[str | Path] = (IMAGE_DIR,), index_dir: str | Path = INDEX_DIR,
+                batch_size: int = MAX_BATCH, rebuild: bool = False) -> tuple[EmbeddingIndex, dict]:
+    """Embed new or changed images under ``sources`` into the index; return it and what changed."""
+    index = EmbeddingIndex(index_dir)
+    model = _model_id(embedder.classifier.model_path)
+    if rebuild or (index.manifest["model"] not in (None, model)) or (index.dim not in (None, embedder.dim)):
+        # Embeddings from another model are not comparable; start over
+        for name in ("manifest.json", "centroids.npy", "assignments.npy"):
+            (Path(index_dir) / name).unlink(missing_ok=True)
+        index = EmbeddingIndex(index_dir)
+    index.manifest["model"] = model
+
+    todo, unchanged = [], 0
+    for source in sources:
+        source = Path(source).resolve()
+        root = source if source.is_dir() else source.parent
+        for path in image_paths(source):
+            key, signature = _relative(path), _signature(path)
+            row = index.rows.get(key)
+            if row is not None and index.entries[row]["signature"] == signature:
+                unchanged += 1
+                continue
+            todo.append((path, {"path": key, "signature": signature,
+                                "label": label_for(path, root, embedder.classifier.class_to_idx)}))
+
+    # Files that fail to decode stay out of the index and its manifest, so the next build retries them
+    failed = []
+    for start, vectors, decoded in embedder.embed_many([path for path, _ in todo], batch_size):
+        entries = [entry for _, entry in todo[start:start + len(vectors)]]
+        failed.extend(entry["path"] for entry, ok in zip(entries, decoded) if not ok)
+        if decoded.any():
+            index.add(vectors[decoded], [entry for entry, ok in zip(entries, decoded) if ok])
+    index.save()
+    stats = {"images": len(index), "embedded": len(todo) - len(failed), "unchanged": unchanged,
+             "failed": failed, "lists": 0 if index.centroids is None else len(index.centroids)}
+    return index, stats
+
+
+def audit(index: EmbeddingIndex, k: int = TOP_K, duplicate_similarity: float = DUPLICATE_SIMILARITY,
+          idx_to_class: dict[int, str] | None = None, batch_size: int = 256) -> dict:
+    """Labeled images whose neighbours mostly carry another label, and near-duplicate pairs."""
+    labels = index.labels
+    name = (lambda idx: idx_to_class.get(int(idx), str(idx))) if idx_to_class else int
+    mislabeled, duplicates = [], []
+    matrix = index.matrix()
+    for start in range(0, len(index), batch_size):
+        queries = np.asarray(matrix[start:start + batch_size], dtype=np.float32)
+        # One extra neighbour, since every image finds itself first
+        scores, rows = index.search(queries, k + 1)
+        for offset, (row_scores, row_rows) in enumerate(zip(scores, rows)):
+            row = start + offset
+            others = (row_rows != row) & (row_rows >= 0)
+            neighbours, similarities = row_rows[others][:k], row_scores[others][:k]
+            for other, similarity in zip(neighbours, similarities):
+                if similarity >= duplicate_similarity and row < other:
+                    duplicates.append({"paths": [index.entries[row]["path"], index.entries[other]["path"]],
+                                       "similarity": round(float(similarity), 4)})
+            neighbour_labels = labels[neighbours]
+            neighbour_labels = neighbour_labels[neighbour_labels != UNLABELED]
+            if labels[row] == UNLABELED or len(neighbour_labels) < 2:
+                continue
+            majority, votes = Counter(neighbour_labels.tolist()).most_common(1)[0]
+            if majority != labels[row] and votes > len(neighbour_labels) / 2:
+                mislabeled.append({"path": index.entries[row]["path"], "label": name(labels[row]),
+                                   "neighbours_say": name(majority), "votes": f"{votes}/{len(neighbour_labels)}"})
+    return {"images": len(index), "k": k, "mislabeled": mislabeled, "duplicates": duplicates}
+
+
+def _load_embedder(model_path: str | Path) -> Embedder:
+    return Embedder(IngredientClassifier(model=load_keras_model(model_path), model_path=model_path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Embed ingredient images and search them by similarity.")
+    parser.add_argument("--index-dir", default=str(INDEX_DIR), help="Index folder (default: ingredients_cache/embeddings)")
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Keras model (default: assets/model1.h5)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Embed new and changed images into the index")
+    build.add_argument("sources", nargs="*", default=[str(IMAGE_DIR)],
+                       help="Image folders; <folder>/<class>/ subfolders are labeled (default: ingredients_data)")
+    build.add_argument("--batch-size", type=int, default=MAX_BATCH)
+    build.add_argument("--rebuild", action="store_true", help="Discard the index and embed everything again")
+
+    query = commands.add_parser("query", help="Most similar indexed images to the given ones")
+    query.add_argument("images", nargs="+")
+    query.add_argument("--k", type=int, default=TOP_K)
+    query.add_argument("--nprobe", type=int, default=NPROBE)
+
+    check = commands.add_parser("audit", help="Likely mislabeled images and near-duplicate pairs")
+    check.add_argument("--k", type=int, default=TOP_K)
+    check.add_argument("--duplicate-similarity", type=float, default=DUPLICATE_SIMILARITY)
+    check.add_argument("--output", default=None, metavar="PATH", help="Write the findings as JSON to PATH")
+    args = parser.parse_args(argv)
+
+    if args.command == "audit":
+        index = EmbeddingIndex(args.index_dir)
+        found = audit(index, args.k, args.duplicate_similarity, load_class_mapping()[0])
+        for item in found["mislabeled"]:
+            print(f"{item['path']}: labeled {item['label']}, neighbours say {item['neighbours_say']} ({item['votes']})")
+        print(f"{len(found['mislabeled'])} possibly mislabeled, {len(found['duplicates'])} near-duplicate pairs "
+              f"among {found['images']} images")
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(found, f, indent=2)
+        return 0
+
+    try:
+        embedder = _load_embedder(args.model)
+    except IncompatibleModelError as err:
+        print(f"Cannot embed images: {err}", file=sys.stderr)
+        return 1
+
+    if args.command == "build":
+        index, stats = build_index(embedder, args.sources, args.index_dir, args.batch_size, args.rebuild)
+        print(f"{stats['images']} images in {index.index_dir}: {stats['embedded']} embedded, "
+              f"{stats['unchanged']} unchanged, {len(stats['failed'])} failed, {stats['lists']} IVF lists")
+        for path in stats["failed"]:
+            print(f"  could not decode {path}", file=sys.stderr)
+        return 0
+
+    index = EmbeddingIndex(args.index_dir)
+    paths = [path for root in args.images for path in image_paths(root)]
+    for path, (_, vectors, decoded) in zip(paths, embedder.embed_many(paths, batch_size=1)):
+        if not decoded[0]:
+            print(f"{path}: could not decode", file=sys.stderr)
+            continue
+        scores, rows = index.search(vectors, args.k, args.nprobe)
+        print(f"{path}:")
+        for score, row in zip(scores[0], rows[0]):
+            if row >= 0:
+                print(f"  {score:.3f}  {index.entries[row]['path']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
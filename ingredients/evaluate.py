@@ -0,0 +1,311 @@
+"""Accuracy and speed of ingredient models on a labeled image folder.
+
+The folder holds one subfolder per class, named as in ``class_mapping.pkl``
+(``ingredients_dataset/test/Parmesan_Cheese/...``). Case and spaces versus underscores
+don't matter. Images are listed lazily, folder by folder. They are decoded in the
+classifier's thread pool with the next batch decoding during inference, so memory
+stays flat however large the folder. Per batch, only a running 65x65 confusion matrix
+(one ``bincount`` over ``true * classes + predicted``) and a few timings are kept.
+
+Reported per model:
+
+- accuracy, top-5 accuracy and macro F1, and accuracy over the taxonomy groups
+  (``ingredients.taxonomy``), where a ``Cheddar_Cheese`` photo called ``Cheddar`` is right
+- precision, recall, F1 and support per class
+- the most frequent confusions, with example files
+- confusable groups: classes mistaken for one another at least ``--min-confusion`` of
+  the time, joined transitively (``Parmesan`` / ``Parmesan_Cheese`` / ``Aged_Parmesan``).
+  Each group shows its accuracy if its classes were merged, the share of all errors
+  that stay inside it, and whether the taxonomy already merges it.
+- latency: p50/p90/p99 of per-batch inference and of single-image requests
+  (``--latency-samples``), plus end-to-end images per second
+
+Several ``--model`` files (a float and a quantized export, say) are evaluated on the
+same images and printed side by side to compare speed against accuracy.
+
+    python -m ingredients.evaluate ingredients_dataset/test
+    python -m ingredients.evaluate ingredients_dataset/test --model assets/model1.h5 assets/model1.tflite \\
+        --report ingredients_dataset/evaluation.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from .classifier import (
+    IMAGE_SUFFIXES,
+    MAX_BATCH,
+    IncompatibleModelError,
+    IngredientClassifier,
+    default_model_path,
+)
+from .dedup import OUTPUT_DIR, clusters
+from .taxonomy import Taxonomy, load_taxonomy
+
+TEST_DIR = OUTPUT_DIR / "test"
+TOP_K = 5
+MIN_CONFUSION = 0.05
+MIN_CONFUSED_IMAGES = 3
+LATENCY_SAMPLES = 50
+EXAMPLES = 3
+PERCENTILES = (50, 90, 99)
+
+
+def _folder_key(name: str) -> str:
+    return name.replace(" ", "_").casefold()
+
+
+def labeled_images(root: str | Path, class_to_idx: dict[str, int],
+                   aliases: dict[str, str] | None = None) -> tuple[Iterator[tuple[Path, int]], dict]:
+    """Lazily, ``(path, class index)`` for images in ``root/<class>/``; and unmapped folder names.
+
+    ``aliases`` maps other folder names to classes, such as fine labels to the taxonomy
+    groups a group-level model predicts. The second value maps the names of subfolders
+    that are not a class to their image count, and is filled in as the iterator runs.
+    """
+    by_key = {_folder_key(name): class_to_idx[target] for name, target in (aliases or {}).items()
+              if target in class_to_idx}
+    by_key.update({_folder_key(name): idx for name, idx in class_to_idx.items()})
+    unmapped: dict[str, int] = {}
+
+    def walk():
+        for folder in sorted(path for path in Path(root).iterdir() if path.is_dir()):
+            files = sorted(path for path in folder.rglob("*") if path.suffix.lower() in IMAGE_SUFFIXES)
+            label = by_key.get(_folder_key(folder.name))
+            if label is None:
+                if files:
+                    unmapped[folder.name] = len(files)
+                continue
+            for path in files:
+                yield path, label
+
+    return walk(), unmapped
+
+
+class Evaluation:
+    """Streaming confusion matrix, top-k hits, timings and example mistakes for one model."""
+
+    def __init__(self, num_classes: int, examples: int = EXAMPLES):
+        self.num_classes = num_classes
+        self.confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+        self.top_k_hits = 0
+        self.batch_seconds: list[float] = []
+        self.batch_sizes: list[int] = []
+        self.single_seconds: list[float] = []
+        self.wall_seconds = 0.0
+        self.examples = examples
+        self.mistakes: dict[tuple[int, int], list[str]] = {}
+        self.unreadable: list[str] = []
+
+    def add(self, labels: np.ndarray, probabilities: np.ndarray, paths: list[Path], k: int = TOP_K) -> None:
+        predicted = probabilities.argmax(axis=1)
+        self.confusion += np.bincount(labels * self.num_classes + predicted,
+                                      minlength=self.num_classes ** 2).reshape(self.num_classes, self.num_classes)
+        k = min(k, self.num_classes)
+        best = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+        self.top_k_hits += int((best == labels[:, None]).any(axis=1).sum())
+        for i in np.flatnonzero(predicted != labels):
+            shown = self.mistakes.setdefault((int(labels[i]), int(predicted[i])), [])
+            if len(shown) < self.examples:
+                shown.append(str(paths[i]))
+
+    @property
+    def images(self) -> int:
+        return int(self.confusion.sum())
+
+    def per_class(self) -> dict[str, np.ndarray]:
+        true_positive = np.diag(self.confusion).astype(np.float64)
+        support = self.confusion.sum(axis=1)
+        predicted = self.confusion.sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(predicted > 0, true_positive / predicted, 0.0)
+            recall = np.where(support > 0, true_positive / support, 0.0)
+            f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        return {"precision": precision, "recall": recall, "f1": f1, "support": support}
+
+    def confusable_groups(self, min_confusion: float = MIN_CONFUSION,
+                          min_images: int = MIN_CONFUSED_IMAGES) -> list[list[int]]:
+        """Classes mistaken for each other in at least ``min_confusion`` of their images, joined."""
+        mutual = self.confusion + self.confusion.T
+        np.fill_diagonal(mutual, 0)
+        support = self.confusion.sum(axis=1)
+        pair_support = support[:, None] + support[None, :]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = np.where(pair_support > 0, mutual / pair_support, 0.0)
+        i, j = np.nonzero(np.triu((rate >= min_confusion) & (mutual >= min_images)))
+        return clusters(self.num_classes, i, j)
+
+    def latency(self) -> dict:
+        batch_ms = 1000 * np.asarray(self.batch_seconds)
+        single_ms = 1000 * np.asarray(self.single_seconds)
+        per_image_ms = batch_ms / np.maximum(np.asarray(self.batch_sizes), 1)
+        summary = {"images_per_second": self.images / self.wall_seconds if self.wall_seconds else 0.0}
+        for name, values in (("batch_ms", batch_ms), ("per_image_ms", per_image_ms), ("single_image_ms", single_ms)):
+            if len(values):
+                summary[name] = {f"p{q}": float(value) for q, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+        return summary
+
+    def report(self, idx_to_class: dict[int, str], min_confusion: float = MIN_CONFUSION,
+               taxonomy: Taxonomy | None = None) -> dict:
+        """A JSON-ready summary, with class indices named through ``idx_to_class``."""
+        taxonomy = taxonomy or load_taxonomy(idx_to_class)
+        images = self.images
+        metrics = self.per_class()
+        present = metrics["support"] > 0
+        errors = images - int(np.trace(self.confusion))
+        confusable = []
+        for members in self.confusable_groups(min_confusion):
+            block = self.confusion[np.ix_(members, members)]
+            support = int(self.confusion[members].sum())
+            names = [idx_to_class[idx] for idx in members]
+            confusable.append({
+                "classes": names,
+                "images": support,
+                "accuracy": float(np.trace(block) / support) if support else 0.0,
+                "accuracy_merged": float(block.sum() / support) if support else 0.0,
+                "share_of_errors": float((block.sum() - np.trace(block)) / errors) if errors else 0.0,
+                "merged_by_taxonomy": len({taxonomy.group_for(name) for name in names}) == 1,
+            })
+        confusable.sort(key=lambda group: -group["share_of_errors"])
+        off_diagonal = self.confusion.copy()
+        np.fill_diagonal(off_diagonal, 0)
+        worst = np.argsort(off_diagonal, axis=None)[::-1][:20]
+        confusions = [
+            {"true": idx_to_class[int(t)], "predicted": idx_to_class[int(p)], "images": int(off_diagonal[t, p]),
+             "examples": self.mistakes.get((int(t), int(p)), [])}
+            for t, p in zip(*np.unravel_index(worst, off_diagonal.shape)) if off_diagonal[t, p] > 0
+        ]
+        return {
+            "images": images,
+            "accuracy": float(np.trace(self.confusion) / images) if images else 0.0,
+            f"top{TOP_K}_accuracy": self.top_k_hits / images if images else 0.0,
+            "group_accuracy": float(np.trace(taxonomy.group_confusion(self.confusion)) / images) if images else 0.0,
+            "macro_f1": float(metrics["f1"][present].mean()) if present.any() else 0.0,
+            "classes": {
+                idx_to_class[idx]: {"precision": round(float(metrics["precision"][idx]), 4),
+                                    "recall": round(float(metrics["recall"][idx]), 4),
+                                    "f1": round(float(metrics["f1"][idx]), 4),
+                                    "support": int(metrics["support"][idx])}
+                for idx in np.flatnonzero(present)
+            },
+            "confusions": confusions,
+            "confusable_groups": confusable,
+            "latency": self.latency(),
+            "confusion_matrix": self.confusion.tolist(),
+        }
+
+
+def evaluate(classifier: IngredientClassifier, root: str | Path, batch_size: int = MAX_BATCH,
+             latency_samples: int = LATENCY_SAMPLES) -> tuple[Evaluation, dict]:
+    """Stream ``root`` through ``classifier``; return the evaluation and the unmapped folders."""
+    evaluation = Evaluation(classifier.num_classes)
+    aliases = load_taxonomy(classifier.idx_to_class).group_by_label
+    images, unmapped = labeled_images(root, classifier.class_to_idx, aliases)
+    started = time.perf_counter()
+    single = None
+    for loaded in classifier.decoded_batches(images, batch_size, load=lambda item: classifier.decode(item[0]),
+                                             skip=(OSError, ValueError)):
+        decoded = []
+        for (path, label), image in loaded:
+            if image is None:
+                evaluation.unreadable.append(str(path))
+            else:
+                decoded.append((path, label, image))
+        if not decoded:
+            continue
+        batch = np.stack([image for _, _, image in decoded])
+        start = time.perf_counter()
+        probabilities = classifier.predict(batch)
+        evaluation.batch_seconds.append(time.perf_counter() - start)
+        evaluation.batch_sizes.append(len(batch))
+        evaluation.add(np.array([label for _, label, _ in decoded]), probabilities,
+                       [path for path, _, _ in decoded])
+        if single is None:
+            single = batch[:1]
+    evaluation.wall_seconds = time.perf_counter() - started
+    if len(evaluation.batch_seconds) > 1:
+        # The first batch includes graph tracing and warm-up
+        evaluation.batch_seconds.pop(0)
+        evaluation.batch_sizes.pop(0)
+    if single is not None and latency_samples:
+        classifier.predict(single)
+        for _ in range(latency_samples):
+            start = time.perf_counter()
+            classifier.predict(single)
+            evaluation.single_seconds.append(time.perf_counter() - start)
+    return evaluation, unmapped
+
+
+def _print_report(name: str, report: dict, unmapped: dict) -> None:
+    latency = report["latency"]
+    print(f"\n{name}: {report['images']} images, accuracy {report['accuracy']:.2%}, "
+          f"top-{TOP_K} {report[f'top{TOP_K}_accuracy']:.2%}, macro F1 {report['macro_f1']:.3f}, "
+          f"group accuracy {report['group_accuracy']:.2%}")
+    for label, metrics in sorted(report["classes"].items(), key=lambda item: item[1]["f1"])[:10]:
+        print(f"  {label:<24} precision {metrics['precision']:.2f}  recall {metrics['recall']:.2f}  "
+              f"f1 {metrics['f1']:.2f}  ({metrics['support']} images)")
+    for group in report["confusable_groups"]:
+        merged = ", merged by the taxonomy" if group["merged_by_taxonomy"] else ""
+        print(f"  confusable: {' / '.join(group['classes'])}  accuracy {group['accuracy']:.2%} -> "
+              f"{group['accuracy_merged']:.2%} merged, {group['share_of_errors']:.1%} of errors{merged}")
+    if "per_image_ms" in latency:
+        print("  latency per image (batched) " + "  ".join(f"p{q} {latency['per_image_ms'][f'p{q}']:.2f} ms" for q in PERCENTILES))
+    if "single_image_ms" in latency:
+        print("  latency single image        " + "  ".join(f"p{q} {latency['single_image_ms'][f'p{q}']:.2f} ms" for q in PERCENTILES))
+    print(f"  {latency['images_per_second']:.1f} images/s end to end")
+    for folder, count in unmapped.items():
+        print(f"  skipped {count} images in {folder}/: not a class in the mapping", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure ingredient model accuracy and latency on a labeled folder.")
+    parser.add_argument("folder", nargs="?", default=str(TEST_DIR),
+                        help="Folder with one subfolder per class (default: ingredients_dataset/test)")
+    parser.add_argument("--model", nargs="+", default=None,
+                        help="Model files, .h5 or .tflite, to evaluate and compare (default: the served model)")
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH)
+    parser.add_argument("--min-confusion", type=float, default=MIN_CONFUSION,
+                        help=f"Confusion rate that makes two classes confusable (default: {MIN_CONFUSION})")
+    parser.add_argument("--latency-samples", type=int, default=LATENCY_SAMPLES,
+                        help="Single-image predictions timed after the pass (default: %(default)s)")
+    parser.add_argument("--report", default=None, metavar="PATH", help="Write the full results as JSON to PATH")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for model_path in args.model or [str(default_model_path())]:
+        try:
+            classifier = IngredientClassifier(model_path=model_path)
+        except IncompatibleModelError as err:
+            print(f"Cannot evaluate {model_path}: {err}", file=sys.stderr)
+            return 1
+        evaluation, unmapped = evaluate(classifier, args.folder, args.batch_size, args.latency_samples)
+        classifier.close()
+        results[model_path] = evaluation.report(classifier.idx_to_class, args.min_confusion)
+        results[model_path]["unmapped_folders"] = unmapped
+        results[model_path]["unreadable"] = evaluation.unreadable
+        _print_report(Path(model_path).name, results[model_path], unmapped)
+
+    if len(results) > 1:
+        print(f"\n{'model':<28} {'accuracy':>9} {'group acc':>9} {'macro F1':>9} {'p50 ms':>8} {'p99 ms':>8} "
+              f"{'images/s':>9}")
+        for model_path, report in results.items():
+            single = report["latency"].get("single_image_ms", {})
+            print(f"{Path(model_path).name:<28} {report['accuracy']:>9.2%} {report['group_accuracy']:>9.2%} "
+                  f"{report['macro_f1']:>9.3f} "
+                  f"{single.get('p50', 0):>8.2f} {single.get('p99', 0):>8.2f} "
+                  f"{report['latency']['images_per_second']:>9.1f}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"folder": args.folder, "models": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""Export the ingredient model to TensorFlow Lite and check the export.
+
+    python -m ingredients.export                      # float32 -> assets/model1.tflite
+    python -m ingredients.export --quantize dynamic   # int8 weights, float activations
+    python -m ingredients.export --quantize int8      # int8 weights and activations
+
+``int8`` calibrates activation ranges on images from ``--images``. Inputs and outputs
+stay float32 either way, so ``ingredients.lite.LiteModel`` is a drop-in replacement.
+
+The conversion is written next to the output as ``<name>.candidate.tflite`` and checked
+on ``ingredients_data/``. Both models classify the same decoded images, and the share
+of images whose top-1 class agrees is reported along with the files that disagree.
+Cold start (import, load, classify one image) and peak RSS are then measured in a
+fresh process for the Keras model and for the export. The candidate only replaces the
+output once its agreement reaches ``--min-agreement`` (or with ``--skip-checks``), so
+``get_classifier`` never picks up an export that failed its check.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from .classifier import (
+    IMAGE_DIR,
+    MODEL_PATH,
+    REPO_ROOT,
+    IncompatibleModelError,
+    IngredientClassifier,
+    image_paths,
+    load_keras_model,
+)
+
+QUANTIZATIONS = ("none", "dynamic", "int8")
+CALIBRATION_IMAGES = 100
+MIN_AGREEMENT = 0.99
+
+# Runs in a fresh interpreter so imports and allocations are counted from zero. Linux
+# carries ru_maxrss over from the parent through fork and exec, so the peak is read
+# from VmHWM, which belongs to the new process image.
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from ingredients.classifier import IngredientClassifier
+classifier = IngredientClassifier(model_path=sys.argv[1])
+classifier.classify([sys.argv[2]])
+seconds = time.perf_counter() - start
+try:
+    with open("/proc/self/status") as f:
+        rss_mb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:")) / 1024
+except OSError:
+    import psutil
+    rss_mb = psutil.Process().memory_info().rss / 1024 ** 2
+print(json.dumps({"seconds": seconds, "rss_mb": rss_mb}))
+"""
+
+
+def export_tflite(model, output_path: str | Path, quantize: str = "none", calibration=None) -> Path:
+    """Convert a Keras ``model`` to a ``.tflite`` file at ``output_path``.
+
+    ``calibration`` yields float32 ``(1, height, width, channels)`` inputs; it is
+    required for ``quantize="int8"``.
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize in ("dynamic", "int8"):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == "int8":
+        if calibration is None:
+            raise ValueError("int8 quantization needs calibration images")
+        converter.representative_dataset = lambda: ([batch] for batch in calibration)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    output_path = Path(output_path)
+    tmp_path = output_path.with_suffix(".tmp")
+    tmp_path.write_bytes(converter.convert())
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def calibration_batches(classifier: IngredientClassifier, paths, limit: int = CALIBRATION_IMAGES):
+    images = classifier.decode_many(paths[:limit])
+    for image in images:
+        yield image[None].astype(np.float32) * np.float32(classifier.scale)
+
+
+def top1_agreement(reference: IngredientClassifier, candidate: IngredientClassifier, paths,
+                   batch_size: int = 32) -> dict:
+    """Share of ``paths`` on which both classifiers pick the same top-1 class."""
+    mismatches = []
+    max_difference = 0.0
+    for start in range(0, len(paths), batch_size):
+        chunk = paths[start:start + batch_size]
+        images = reference.decode_many(chunk)
+        expected, actual = reference.predict(images), candidate.predict(images)
+        max_difference = max(max_difference, float(np.abs(expected - actual).max()))
+        for path, want, got in zip(chunk, expected.argmax(axis=1), actual.argmax(axis=1)):
+            if want != got:
+                mismatches.append({"path": str(path), "expected": reference.idx_to_class[int(want)],
+                                   "got": candidate.idx_to_class[int(got)]})
+    return {
+        "images": len(paths),
+        "agreement": 1 - len(mismatches) / len(paths) if paths else 1.0,
+        "max_probability_difference": max_difference,
+        "mismatches": mismatches,
+    }
+
+
+def cold_start(model_path: str | Path, image: str | Path) -> dict:
+    """Seconds and peak RSS to import, load ``model_path`` and classify ``image`` in a new process."""
+    env = {**os.environ, "TF_CPP_MIN_LOG_LEVEL": "2"}
+    result = subprocess.run([sys.executable, "-c", PROBE, str(model_path), str(image)], cwd=REPO_ROOT,
+                            env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the ingredient model to TensorFlow Lite.")
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Keras model (default: assets/model1.h5)")
+    parser.add_argument("--output", default=None, help="Output file (default: the model path with .tflite)")
+    parser.add_argument("--quantize", choices=QUANTIZATIONS, default="none")
+    parser.add_argument("--images", default=str(IMAGE_DIR), help="Images for calibration and the parity check")
+    parser.add_argument("--min-agreement", type=float, default=MIN_AGREEMENT,
+                        help=f"Fail if fewer top-1 predictions match (default: {MIN_AGREEMENT})")
+    parser.add_argument("--skip-checks", action="store_true", help="Only convert")
+    parser.add_argument("--report", default=None, metavar="PATH", help="Write the check results as JSON to PATH")
+    args = parser.parse_args(argv)
+
+    model_path = Path(args.model)
+    output_path = Path(args.output) if args.output else model_path.with_suffix(".tflite")
+    paths = image_paths(args.images)
+    try:
+        reference = IngredientClassifier(model=load_keras_model(model_path), model_path=model_path)
+    except IncompatibleModelError as err:
+        print(f"Cannot export: {err}", file=sys.stderr)
+        return 1
+
+    # Keeps the .tflite suffix, which is how IngredientClassifier picks the runtime
+    candidate_path = output_path.with_name(f"{output_path.stem}.candidate{output_path.suffix}")
+    calibration = calibration_batches(reference, paths) if args.quantize == "int8" else None
+    try:
+        export_tflite(reference.model, candidate_path, args.quantize, calibration)
+        print(f"Exported {model_path.name} ({model_path.stat().st_size / 1e6:.1f} MB) -> "
+              f"{candidate_path} ({candidate_path.stat().st_size / 1e6:.1f} MB, quantize={args.quantize})")
+        if args.skip_checks or not paths:
+            os.replace(candidate_path, output_path)
+            print(f"Installed {output_path} without checks")
+            return 0
+
+        candidate = IngredientClassifier(model_path=candidate_path)
+        parity = top1_agreement(reference, candidate, paths)
+        print(f"Top-1 agreement on {parity['images']} images: {parity['agreement']:.2%} "
+              f"(max probability difference {parity['max_probability_difference']:.4f})")
+        for mismatch in parity["mismatches"][:10]:
+            print(f"  {Path(mismatch['path']).name}: {mismatch['expected']} -> {mismatch['got']}")
+
+        startup = {"keras": cold_start(model_path, paths[0]), "tflite": cold_start(candidate_path, paths[0])}
+        for name, measured in startup.items():
+            print(f"Cold start {name:<6} {measured['seconds']:6.2f}s  peak RSS {measured['rss_mb']:7.1f} MB")
+
+        passed = parity["agreement"] >= args.min_agreement
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as f:
+                json.dump({"model": str(model_path), "export": str(output_path), "quantize": args.quantize,
+                           "installed": passed, "parity": parity, "cold_start": startup}, f, indent=2)
+        if not passed:
+            print(f"Agreement below {args.min_agreement:.2%}; {output_path} left unchanged", file=sys.stderr)
+            return 1
+        os.replace(candidate_path, output_path)
+        print(f"Installed {output_path}")
+        return 0
+    finally:
+        candidate_path.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""Preprocessed, memory-mapped cache of the ingredient images.
+
+Decoding and resizing the full-size photos dominates any pass over the dataset, so it
+is done once: every image is decoded, converted to RGB and resized to the model input
+size, and stored as one row of a ``(n, height, width, 3)`` uint8 array in
+``images.npy``. Labels go in ``labels.npy`` as ``class_to_idx`` indices. Images from
+unlabeled folders (``ingredients_data/`` itself) or from folders that are not a mapped
+class get ``UNLABELED``. The matching source files and their sizes and modification
+times are listed in ``manifest.json``.
+
+    ingredients_cache/224x224/
+        images.npy      uint8 (n, 224, 224, 3), opened with mmap_mode="r"
+        labels.npy      int16 (n,)
+        manifest.json   image size, sources, and per row path, size and mtime
+
+Rebuilding is incremental. Rows whose source file is unchanged are copied over from
+the previous arrays, and only new or modified files are decoded, in a thread pool.
+Readers get zero-copy batches straight from the page cache; ``ImageDataset.batches``
+converts one batch at a time to float32.
+
+    python -m ingredients.image_cache ingredients_data ingredients_dataset/train
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from .classifier import (
+    DEFAULT_IMAGE_SIZE,
+    IMAGE_DIR,
+    MAPPING_PATH,
+    REPO_ROOT,
+    decode_image,
+    image_paths,
+    load_class_mapping,
+)
+
+CACHE_ROOT = REPO_ROOT / "ingredients_cache"
+UNLABELED = -1
+DECODE_WORKERS = os.cpu_count() or 4
+# Rows copied from the previous cache per step, bounding memory while compacting
+COPY_CHUNK = 1024
+# New images decoded ahead of their memmap writes; bounds RAM on a first build
+DECODE_CHUNK = 256
+
+
+def cache_dir_for(size: tuple[int, int], root: Path = CACHE_ROOT) -> Path:
+    return root / f"{size[0]}x{size[1]}"
+
+
+def _relative(path: Path) -> str:
+    path = path.resolve()
+    try:
+        return path.relative_to(REPO_ROOT).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def _signature(path: Path) -> list[int]:
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def label_for(path: Path, root: Path, class_to_idx: dict[str, int]) -> int:
+    """The class index of an image in a ``<root>/<class>/`` folder, else ``UNLABELED``."""
+    relative = path.relative_to(root)
+    if len(relative.parts) < 2:
+        return UNLABELED
+    return class_to_idx.get(relative.parts[0], UNLABELED)
+
+
+class ImageDataset:
+    """A cached dataset: memory-mapped images, labels and the source path of every row."""
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        with open(self.cache_dir / "manifest.json", "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.images = np.load(self.cache_dir / "images.npy", mmap_mode="r")
+        self.labels = np.load(self.cache_dir / "labels.npy")
+        self.paths = [entry["path"] for entry in self.manifest["files"]]
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def image_size(self) -> tuple[int, int]:
+        return tuple(self.manifest["image_size"])
+
+    def labeled(self) -> np.ndarray:
+        """Row indices of images with a class label."""
+        return np.flatnonzero(self.labels != UNLABELED)
+
+    def batches(self, batch_size: int = 64, rows: np.ndarray | None = None,
+                scale: float | None = None) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """``(images, labels)`` batches over ``rows`` (default: all), in row order.
+
+        Images stay uint8 views of the memory map unless ``scale`` is given, in which case
+        each batch is converted to float32 and multiplied by it.
+        """
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows)
+        for start in range(0, len(rows), batch_size):
+            index = rows[start:start + batch_size]
+            # Contiguous row ranges slice the memory map without copying
+            if len(index) and index[-1] - index[0] == len(index) - 1:
+                images = self.images[index[0]:index[-1] + 1]
+            else:
+                images = self.images[index]
+            if scale is not None:
+                images = images.astype(np.float32) * np.float32(scale)
+            yield images, self.labels[index]
+
+
+def _scan(sources, class_to_idx) -> list[dict]:
+    files, seen = [], set()
+    for source in sources:
+        source = Path(source).resolve()
+        for path in image_paths(source):
+            key = _relative(path)
+            if key in seen:
+                continue
+            seen.add(key)
+            root = source if source.is_dir() else source.parent
+            files.append({"path": key, "file": path, "signature": _signature(path),
+                          "label": label_for(path, root, class_to_idx)})
+    return files
+
+
+def _previous(cache_dir: Path, size: tuple[int, int]) -> tuple[dict, np.ndarray | None]:
+    """Rows of the existing cache by path, plus its memory-mapped images, if compatible."""
+    try:
+        dataset = ImageDataset(cache_dir)
+    except (OSError, ValueError, KeyError):
+        return {}, None
+    if dataset.image_size != tuple(size):
+        return {}, None
+    rows = {entry["path"]: (row, entry["signature"]) for row, entry in enumerate(dataset.manifest["files"])}
+    return rows, dataset.images
+
+
+def build_cache(sources=(IMAGE_DIR,), cache_dir: Path | None = None,
+                size: tuple[int, int] = DEFAULT_IMAGE_SIZE, mapping_path: Path = MAPPING_PATH,
+                workers: int = DECODE_WORKERS) -> tuple[ImageDataset, dict]:
+    """Bring the cache for ``sources`` up to date; return it and what changed.
+
+    Files that fail to decode are left out and listed under ``"failed"``.
+    """
+    cache_dir = Path(cache_dir) if cache_dir is not None else cache_dir_for(size)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    _, class_to_idx = load_class_mapping(mapping_path)
+    files = _scan(sources, class_to_idx)
+    previous_rows, previous_images = _previous(cache_dir, size)
+
+    reused, new = [], []
+    for entry in files:
+        row, signature = previous_rows.get(entry["path"], (None, None))
+        (reused if signature == entry["signature"] else new).append((entry, row))
+
+    def decode(entry):
+        try:
+            return decode_image(entry["file"], size)
+        except (OSError, ValueError):
+            return None
+
+    # Unchanged rows first, in their previous order, then the new ones as they decode
+    reused.sort(key=lambda item: item[1])
+    tmp_images = cache_dir / "images.tmp.npy"
+    images = np.lib.format.open_memmap(tmp_images, mode="w+", dtype=np.uint8,
+                                       shape=(len(reused) + len(new), *size, 3))
+    old_rows = np.array([row for _, row in reused], dtype=np.int64)
+    for start in range(0, len(old_rows), COPY_CHUNK):
+        chunk = old_rows[start:start + COPY_CHUNK]
+        images[start:start + len(chunk)] = previous_images[chunk]
+    del previous_images
+
+    added, failed = [], []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(new), DECODE_CHUNK):
+            chunk = [entry for entry, _ in new[start:start + DECODE_CHUNK]]
+            for entry, image in zip(chunk, pool.map(decode, chunk)):
+                if image is None:
+                    failed.append(entry["path"])
+                else:
+                    images[len(reused) + len(added)] = image
+                    added.append(entry)
+    kept = [entry for entry, _ in reused] + added
+    images.flush()
+    if failed:
+        # Failed files left unused rows at the end; copy the filled ones into a file of the right size
+        exact_path = cache_dir / "images.exact.tmp.npy"
+        exact = np.lib.format.open_memmap(exact_path, mode="w+", dtype=np.uint8, shape=(len(kept), *size, 3))
+        for start in range(0, len(kept), COPY_CHUNK):
+            end = min(start + COPY_CHUNK, len(kept))
+            exact[start:end] = images[start:end]
+        exact.flush()
+        del exact, images
+        os.replace(exact_path, tmp_images)
+    else:
+        del images
+
+    labels = np.array([entry["label"] for entry in kept], dtype=np.int16)
+    manifest = {
+        "image_size": list(size),
+        "mapping": _relative(Path(mapping_path)),
+        "sources": [_relative(Path(source)) for source in sources],
+        "files": [{"path": entry["path"], "signature": entry["signature"]} for entry in kept],
+    }
+    # The new arrays replace the old ones only once complete; the manifest goes last
+    os.replace(tmp_images, cache_dir / "images.npy")
+    with open(cache_dir / "labels.tmp.npy", "wb") as f:
+        np.save(f, labels)
+    os.replace(cache_dir / "labels.tmp.npy", cache_dir / "labels.npy")
+    with open(cache_dir / "manifest.tmp.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(cache_dir / "manifest.tmp.json", cache_dir / "manifest.json")
+
+    stats = {
+        "images": len(kept),
+        "reused": len(reused),
+        "decoded": len(added),
+        "removed": len(previous_rows.keys() - {entry["path"] for entry in files}),
+        "failed": failed,
+        "labeled": int((labels != UNLABELED).sum()),
+    }
+    return ImageDataset(cache_dir), stats
+
+
+def open_cache(size: tuple[int, int] = DEFAULT_IMAGE_SIZE, cache_dir: Path | None = None) -> ImageDataset:
+    return ImageDataset(cache_dir if cache_dir is not None else cache_dir_for(size))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or update the preprocessed ingredient image cache.")
+    parser.add_argument("sources", nargs="*", default=[str(IMAGE_DIR)],
+                        help="Image folders; <folder>/<class>/ subfolders are labeled (default: ingredients_data)")
+    parser.add_argument("--size", type=int, nargs=2, default=list(DEFAULT_IMAGE_SIZE), metavar=("HEIGHT", "WIDTH"))
+    parser.add_argument("--cache-dir", default=None, help="Output folder (default: ingredients_cache/<H>x<W>)")
+    parser.add_argument("--workers", type=int, default=DECODE_WORKERS, help="Decoding threads")
+    args = parser.parse_args(argv)
+
+    dataset, stats = build_cache(args.sources, args.cache_dir, tuple(args.size), workers=args.workers)
+    print(f"{stats['images']} images ({stats['labeled']} labeled) in {dataset.cache_dir}: "
+          f"{stats['decoded']} decoded, {stats['reused']} reused, {stats['removed']} removed")
+    for path in stats["failed"]:
+        print(f"  could not decode {path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""Ingredient inventory counts from shelf photos, and consumption against item sales.
+
+A stream of shelf photos is classified in batches with the ingredient classifier, and
+every photo counts as one unit of its most likely ingredient. Ingredients are the
+groups of ``ingredient_taxonomy.json`` (``--level group``), so ``Cheddar`` and
+``Cheddar_Cheese`` photos count toward one ``Cheddar`` row, and the probabilities of
+a group's labels add up before the confidence check. Photos below
+``--min-confidence`` count as nothing, as do photos that fail to decode. Counts are
+summed per ingredient per time bucket (``--freq``, hourly by default) into a compact
+long table with one row per non-zero bucket and ingredient:
+
+    data/inventory/ingredient_counts.csv      timestamp, ingredient, count
+
+The pipeline streams. Photos are read lazily from a folder, or from a
+``timestamp,path`` list on stdin. They are decoded and classified one batch at a
+time, with the next batch decoding while the current one runs through the model.
+Only the running counts per bucket are kept, so memory does not grow with the number
+of photos in a day. A photo's timestamp is its EXIF capture time, else its file mtime,
+unless the list gives one. Re-running over a time range replaces that range's buckets.
+
+Consumption is estimated from the counts: each drop in an ingredient's count between
+consecutive buckets it was photographed in is usage, and increases are restocks. A
+bucket without photos of an ingredient says nothing about its stock, so it is skipped
+rather than read as an empty shelf. Usage is summed per item-sales period (monthly
+when monthly ``itemsales_*`` exports exist, else yearly) and joined with the units
+sold that period:
+
+    data/inventory/ingredient_consumption.csv period, ingredient, used, items_sold,
+                                              used_per_100_sold[, expected_use]
+
+``--recipes`` takes a CSV of ``Item, Ingredient, Quantity`` (units of ingredient per
+menu item sold). Its ingredients are rolled up to the same level as the counts. With
+it, ``expected_use`` is what the period's sales should have used, for comparison with
+the observed drop.
+
+    python -m ingredients.inventory shelf_photos/2025-05-01 --freq 30min
+    find photos -name '*.jpg' -printf '%TY-%Tm-%Td %TH:%TM,%p\\n' | python -m ingredients.inventory -
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from HackAI import item_sales
+from HackAI.datasets import DATA_DIR
+
+from .classifier import (
+    IMAGE_DIR,
+    MAX_BATCH,
+    IncompatibleModelError,
+    IngredientClassifier,
+    get_classifier,
+    image_paths,
+)
+from .taxonomy import LEVELS, Taxonomy, load_taxonomy
+
+INVENTORY_DIR = DATA_DIR / "inventory"
+COUNTS_PATH = INVENTORY_DIR / "ingredient_counts.csv"
+CONSUMPTION_PATH = INVENTORY_DIR / "ingredient_consumption.csv"
+FREQ = "h"
+MIN_CONFIDENCE = 0.5
+EXIF_DATETIME = 306
+EXIF_DATETIME_ORIGINAL = 36867
+EXIF_IFD = 0x8769
+
+# A listed timestamp stays a string until its photo is loaded, so a malformed one
+# only costs that photo
+Photo = tuple[datetime | str | None, str | Path]
+
+
+def photo_time(path: str | Path) -> datetime:
+    """When a photo was taken: EXIF capture time if present, else the file's mtime."""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            exif = image.getexif()
+            stamp = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+        if stamp:
+            return datetime.strptime(str(stamp).strip("\x00 "), "%Y:%m:%d %H:%M:%S")
+    except (OSError, ValueError):
+        pass
+    return datetime.fromtimestamp(os.path.getmtime(path))
+
+
+def folder_photos(folder: str | Path) -> Iterator[Photo]:
+    for path in image_paths(folder):
+        yield None, path
+
+
+def listed_photos(lines: Iterable[str]) -> Iterator[Photo]:
+    """Photos from ``timestamp,path`` lines (or bare paths), read as they arrive."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        stamp, comma, path = line.partition(",")
+        if not comma:
+            stamp, path = "", stamp
+        yield (stamp or None), path
+
+
+class InventoryCounter:
+    """Running photo counts per time bucket and class index."""
+
+    def __init__(self, num_classes: int, freq: str = FREQ, min_confidence: float = MIN_CONFIDENCE):
+        self.num_classes = num_classes
+        self.freq = freq
+        self.min_confidence = min_confidence
+        self.buckets: dict[pd.Timestamp, np.ndarray] = defaultdict(lambda: np.zeros(num_classes, dtype=np.int64))
+        self.photos = 0
+        self.uncertain = 0
+        self.unreadable = 0
+
+    def add(self, timestamps: list[datetime], probabilities: np.ndarray) -> None:
+        best = probabilities.argmax(axis=1)
+        confident = probabilities[np.arange(len(best)), best] >= self.min_confidence
+        self.photos += len(best)
+        self.uncertain += int((~confident).sum())
+        buckets = pd.DatetimeIndex(timestamps).floor(self.freq)
+        codes, unique = pd.factorize(buckets)
+        # One bincount over (bucket, class) pairs per batch instead of a Python loop per photo
+        flat = np.bincount(codes[confident] * self.num_classes + best[confident],
+                           minlength=len(unique) * self.num_classes).reshape(len(unique), self.num_classes)
+        for bucket, counts in zip(unique, flat):
+            self.buckets[bucket] += counts
+
+    def table(self, idx_to_class: dict[int, str]) -> pd.DataFrame:
+        rows = [
+            (bucket, idx_to_class[int(idx)], int(counts[idx]))
+            for bucket, counts in sorted(self.buckets.items())
+            for idx in np.flatnonzero(counts)
+        ]
+        return pd.DataFrame(rows, columns=["timestamp", "ingredient", "count"])
+
+
+def count_photos(classifier: IngredientClassifier, photos: Iterable[Photo], freq: str = FREQ,
+                 min_confidence: float = MIN_CONFIDENCE, batch_size: int = MAX_BATCH,
+                 taxonomy: Taxonomy | None = None, level: str = "group") -> InventoryCounter:
+    """Classify ``photos`` batch by batch into an ``InventoryCounter`` over ``taxonomy.names(level)``."""
+    taxonomy = taxonomy or load_taxonomy(classifier.idx_to_class)
+    counter = InventoryCounter(len(taxonomy.names(level)), freq, min_confidence)
+
+    from PIL import Image
+
+    def load(photo: Photo):
+        stamp, source = photo
+        if isinstance(stamp, str):
+            stamp = pd.Timestamp(stamp).to_pydatetime()
+        return (stamp or photo_time(source)), classifier.decode(source)
+
+    # One corrupt photo or bad timestamp must not end a day's count; it counts as unreadable
+    unreadable = (OSError, ValueError, Image.DecompressionBombError)
+    for batch in classifier.decoded_batches(photos, batch_size, load=load, skip=unreadable):
+        loaded = [photo for _, photo in batch if photo is not None]
+        counter.photos += len(batch) - len(loaded)
+        counter.unreadable += len(batch) - len(loaded)
+        if not loaded:
+            continue
+        timestamps = [stamp for stamp, _ in loaded]
+        probabilities = classifier.predict(np.stack([image for _, image in loaded]))
+        counter.add(timestamps, taxonomy.rollup(probabilities, level))
+    return counter
+
+
+def merge_counts(new: pd.DataFrame, path: Path = COUNTS_PATH) -> pd.DataFrame:
+    """``new`` plus the saved counts outside its time range; the saved counts if ``new`` is empty."""
+    if not path.exists():
+        return new
+    saved = pd.read_csv(path, parse_dates=["timestamp"])
+    if new.empty:
+        return saved
+    start, end = new["timestamp"].min(), new["timestamp"].max()
+    outside = saved[(saved["timestamp"] < start) | (saved["timestamp"] > end)]
+    return pd.concat([outside, new], ignore_index=True).sort_values(["timestamp", "ingredient"], kind="stable")
+
+
+def _write(table: pd.DataFrame, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    table.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _sales_granularity(history: pd.DataFrame) -> str:
+    return "monthly" if (history["granularity"] == "monthly").any() else "yearly"
+
+
+def consumption(counts: pd.DataFrame, history: pd.DataFrame, recipes: pd.DataFrame | None = None) -> pd.DataFrame:
+    """Observed ingredient use per sales period, joined with the units sold."""
+    columns = ["period", "ingredient", "used", "items_sold", "used_per_100_sold"]
+    if counts.empty:
+        return pd.DataFrame(columns=columns + (["expected_use"] if recipes is not None else []))
+    # NaN where an ingredient wasn't photographed; carrying its last count forward
+    # compares each bucket with the previous one it was seen in
+    levels = counts.pivot_table(index="timestamp", columns="ingredient", values="count",
+                                aggfunc="sum").sort_index()
+    used = (-levels.ffill().diff()).clip(lower=0).iloc[1:]
+
+    granularity = _sales_granularity(history) if not history.empty else "monthly"
+    label = "%Y-%m" if granularity == "monthly" else "%Y"
+    used = used.groupby(used.index.strftime(label)).sum().astype(np.int64)
+    used.index.name = "period"
+    table = used.stack().rename("used").reset_index()
+
+    sales = history[history["granularity"] == granularity]
+    sold = sales.groupby("period")["y"].sum().rename("items_sold")
+    table = table.merge(sold, left_on="period", right_index=True, how="left")
+    table["used_per_100_sold"] = (100 * table["used"] / table["items_sold"]).round(3)
+
+    if recipes is not None:
+        per_item = sales.groupby(["period", "Item"], as_index=False)["y"].sum()
+        expected = per_item.merge(recipes, on="Item")
+        expected["expected_use"] = expected["y"] * expected["Quantity"]
+        expected = expected.groupby(["period", "Ingredient"], as_index=False)["expected_use"].sum()
+        table = table.merge(expected, left_on=["period", "ingredient"], right_on=["period", "Ingredient"],
+                            how="left").drop(columns="Ingredient")
+    return table[table["used"] > 0].reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count ingredients in shelf photos and estimate consumption.")
+    parser.add_argument("photos", nargs="?", default=str(IMAGE_DIR),
+                        help="Photo folder, or - to read 'timestamp,path' lines from stdin (default: ingredients_data)")
+    parser.add_argument("--freq", default=FREQ, help="Time bucket, a pandas offset alias (default: h)")
+    parser.add_argument("--min-confidence", type=float, default=MIN_CONFIDENCE)
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH)
+    parser.add_argument("--recipes", default=None, help="CSV of Item, Ingredient, Quantity per menu item")
+    parser.add_argument("--level", choices=LEVELS, default="group",
+                        help="Count model labels, taxonomy groups or categories (default: group)")
+    args = parser.parse_args(argv)
+
+    try:
+        classifier = get_classifier()
+    except IncompatibleModelError as err:
+        print(f"Cannot classify photos: {err}", file=sys.stderr)
+        return 1
+    taxonomy = load_taxonomy(classifier.idx_to_class)
+    photos = listed_photos(sys.stdin) if args.photos == "-" else folder_photos(args.photos)
+    counter = count_photos(classifier, photos, args.freq, args.min_confidence, args.batch_size, taxonomy, args.level)
+
+    counts = merge_counts(counter.table(dict(enumerate(taxonomy.names(args.level)))))
+    _write(counts, COUNTS_PATH)
+    recipes = None
+    if args.recipes:
+        recipes = pd.read_csv(args.recipes)
+        recipes["Ingredient"] = recipes["Ingredient"].map(lambda name: taxonomy.name_for(name, args.level))
+    used = consumption(counts, item_sales.item_sales_history(), recipes)
+    _write(used, CONSUMPTION_PATH)
+    print(f"{counter.photos} photos ({counter.uncertain} below {args.min_confidence:.0%} confidence, "
+          f"{counter.unreadable} unreadable) "
+          f"-> {len(counts)} count rows in {COUNTS_PATH}, {len(used)} consumption rows in {CONSUMPTION_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""TensorFlow Lite runtime for the exported ingredient model.
+
+``LiteModel`` wraps a ``.tflite`` file behind the same ``input_shape`` /
+``output_shape`` / ``predict_on_batch`` surface the classifier uses with Keras models,
+so ``IngredientClassifier`` serves either. The interpreter comes from the standalone
+``ai-edge-litert`` (or older ``tflite-runtime``) package when installed. These are a
+few MB and start in milliseconds, where importing TensorFlow takes seconds and
+hundreds of MB. Full TensorFlow is used as a fallback.
+
+Models quantized with integer inputs or outputs are quantized and dequantized here,
+so callers always pass and get float32.
+
+``output_kind`` follows the graph back from the output through (de)quantize and
+reshape ops. A model ending in a softmax gives probabilities, anything else logits.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+
+def _interpreter_class():
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tensorflow.lite import Interpreter
+            except ImportError as err:
+                raise RuntimeError("Running .tflite models needs a TFLite runtime: pip install ai-edge-litert") from err
+    return Interpreter
+
+
+# Ops that only convert or reshape the final scores
+PASSTHROUGH_OPS = {"DEQUANTIZE", "QUANTIZE", "RESHAPE", "SQUEEZE", "CAST"}
+
+
+def _dims(shape) -> tuple:
+    return tuple(None if dim < 0 else int(dim) for dim in shape)
+
+
+class LiteModel:
+    """A TFLite model with a Keras-like batch prediction interface."""
+
+    def __init__(self, path: str | Path, num_threads: int | None = None):
+        self.path = Path(path)
+        self.interpreter = _interpreter_class()(model_path=str(path), num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        signature = self._input.get("shape_signature", self._input["shape"])
+        self.input_shape = (None, *_dims(signature[1:]))
+        self.output_shape = (None, *_dims(self._output["shape"][1:]))
+        self._batch = int(self._input["shape"][0])
+        self.output_kind = self._output_kind()
+
+    def _output_kind(self) -> str | None:
+        try:
+            ops = self.interpreter._get_ops_details()
+        except AttributeError:
+            # Runtimes without op introspection leave it to IngredientClassifier's default
+            return None
+        # DELEGATE entries stand for ops a delegate took over; the original ops are listed too
+        producers = {index: op for op in ops if op["op_name"] != "DELEGATE" for index in op["outputs"]}
+        op = producers.get(self._output["index"])
+        while op is not None and op["op_name"] in PASSTHROUGH_OPS:
+            op = producers.get(op["inputs"][0])
+        if op is None:
+            return None
+        return "probabilities" if op["op_name"] == "SOFTMAX" else "logits"
+
+    def _resize(self, batch_size: int, image_shape: tuple) -> None:
+        # Tensors are allocated for one batch size; re-allocate only when it changes
+        self.interpreter.resize_tensor_input(self._input["index"], [batch_size, *image_shape])
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch = batch_size
+
+    def predict_on_batch(self, batch: np.ndarray) -> np.ndarray:
+        batch = np.asarray(batch, dtype=np.float32)
+        if len(batch) != self._batch:
+            self._resize(len(batch), batch.shape[1:])
+        scale, zero_point = self._input["quantization"]
+        if self._input["dtype"] != np.float32:
+            info = np.iinfo(self._input["dtype"])
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(self._input["dtype"])
+        self.interpreter.set_tensor(self._input["index"], batch)
+        self.interpreter.invoke()
+        scores = self.interpreter.get_tensor(self._output["index"]).copy()
+        scale, zero_point = self._output["quantization"]
+        if self._output["dtype"] != np.float32:
+            scores = (scores.astype(np.float32) - zero_point) * scale
+        return scores
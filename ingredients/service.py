@@ -0,0 +1,126 @@
+"""Async front end to the ingredient classifier for web handlers.
+
+``ClassifierService.classify`` can be awaited from an event loop without ever blocking
+it. The first call loads the model in a worker thread. Each image then goes through
+the process-wide ``MicroBatcher``, which decodes in its thread pool and runs the model
+on its own thread, so uploads that arrive together share a forward pass.
+
+Results are cached by the SHA-256 of the image bytes. A bounded in-memory LRU answers
+repeats within a process. With a ``store_dir``, results are also kept as
+``<sha256>.json`` files tagged with the model they came from, so other backend
+workers and restarts reuse them too. Concurrent requests for the same bytes wait on
+one classification.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+from .classifier import MicroBatcher, TOP_K, get_batcher
+
+CACHE_SIZE = 4096
+
+
+def digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def model_key(batcher: MicroBatcher) -> str:
+    """Identifies the loaded model, so cached results from another model are not reused."""
+    path = batcher.classifier.model_path
+    if path is not None and path.exists():
+        return f"{path.name}:{path.stat().st_mtime_ns}"
+    return type(batcher.classifier.model).__name__
+
+
+class ClassifierService:
+    """Hash-keyed, cached, non-blocking image classification."""
+
+    def __init__(self, store_dir: str | Path | None = None, max_entries: int = CACHE_SIZE, k: int = TOP_K):
+        self.store_dir = Path(store_dir) if store_dir is not None else None
+        self.max_entries = max_entries
+        self.k = k
+        self.hits = 0
+        self.misses = 0
+        self._results: OrderedDict[str, list[dict]] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._batcher: MicroBatcher | None = None
+        self._model_key = ""
+        self._loading = asyncio.Lock()
+
+    async def batcher(self) -> MicroBatcher:
+        if self._batcher is None:
+            async with self._loading:
+                if self._batcher is None:
+                    # Importing TensorFlow and loading weights takes seconds; keep it off the loop
+                    batcher = await asyncio.to_thread(get_batcher)
+                    self._model_key = await asyncio.to_thread(model_key, batcher)
+                    self._batcher = batcher
+        return self._batcher
+
+    async def cached(self, key: str) -> list[dict] | None:
+        """The cached result for an image hash, from memory or the store."""
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            return result
+        if self.store_dir is None or not self._model_key:
+            return None
+        # File I/O, so like _store it runs in a worker thread
+        result = await asyncio.to_thread(self._load, key)
+        if result is not None:
+            self._remember(key, result)
+        return result
+
+    def _load(self, key: str) -> list[dict] | None:
+        try:
+            with open(self.store_dir / f"{key}.json", "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if stored.get("model") != self._model_key:
+            return None
+        return stored["result"]
+
+    def _remember(self, key: str, result: list[dict]) -> None:
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def _store(self, key: str, result: list[dict]) -> None:
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        path = self.store_dir / f"{key}.json"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model": self._model_key, "result": result}, f)
+        os.replace(tmp_path, path)
+
+    async def classify(self, data: bytes, key: str | None = None) -> tuple[list[dict], bool]:
+        """Top-k classes for an encoded image, and whether they came from the cache."""
+        key = key or digest(data)
+        batcher = await self.batcher()
+        result = await self.cached(key)
+        if result is not None:
+            self.hits += 1
+            return result, True
+        if key in self._in_flight:
+            self.hits += 1
+            return await asyncio.shield(self._in_flight[key]), True
+
+        self.misses += 1
+        future = asyncio.wrap_future(batcher.submit(data))
+        self._in_flight[key] = future
+        try:
+            result = (await future)[:self.k]
+        finally:
+            del self._in_flight[key]
+        self._remember(key, result)
+        if self.store_dir is not None:
+            await asyncio.to_thread(self._store, key, result)
+        return result, False
@@ -0,0 +1,252 @@
+"""Label taxonomy: fine ingredient labels merged into canonical groups and categories.
+
+``class_mapping.pkl`` has several labels for the same product (``Cheddar`` and
+``Cheddar_Cheese``, ``Soda_Can`` and ``Soft_Drink_Can``). No photo can tell them apart,
+and counting them separately splits one shelf item across rows. ``ingredient_taxonomy.json``
+merges them in two levels:
+
+    label     the model's own classes                         Parmesan_Bag
+    group     one per distinct product, named after a member  Parmesan
+    category  a shelf section                                 Cheese
+
+``groups`` lists the labels of each merged group; any label it doesn't mention is a group
+of its own. ``categories`` lists the groups in each category. Inference rolls
+probabilities up the levels: a group's probability is the sum over its labels, and a
+category's is the sum over its groups. One matrix product with a 0/1 membership matrix
+does this for a whole batch. ``0.3 Cheddar + 0.3 Cheddar_Cheese`` then counts as a
+confident ``0.6 Cheddar`` instead of two uncertain guesses.
+
+Downstream aggregation (inventory counts, evaluation) works in group space. A model can
+also be retrained on the groups directly, for a smaller output layer. ``mapping`` writes
+a class mapping over the groups for training and serving it, and ``relabel`` links a
+``<root>/<label>/`` image tree into ``<output>/<group>/`` folders. Because every group
+is named after one of its labels, the taxonomy maps such a model's classes to
+themselves.
+
+    python -m ingredients.taxonomy check
+    python -m ingredients.taxonomy suggest ingredients_dataset/evaluation.json
+    python -m ingredients.taxonomy mapping --output group_mapping.pkl
+    python -m ingredients.taxonomy relabel ingredients_dataset/train ingredients_dataset/train_groups
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pickle
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from .classifier import MAPPING_PATH, REPO_ROOT, image_paths, load_class_mapping
+
+TAXONOMY_PATH = REPO_ROOT / "ingredient_taxonomy.json"
+LEVELS = ("label", "group", "category")
+OTHER = "Other"
+
+
+class Taxonomy:
+    """The group and category of every label of a class mapping, as index arrays."""
+
+    def __init__(self, idx_to_class: dict[int, str], spec: dict):
+        self.labels = [idx_to_class[idx] for idx in range(len(idx_to_class))]
+        group_by_label = {}
+        for group, members in spec.get("groups", {}).items():
+            if group not in members:
+                raise ValueError(f"group {group!r} must be named after one of its labels")
+            for label in members:
+                if label in group_by_label:
+                    raise ValueError(f"label {label!r} is in groups {group_by_label[label]!r} and {group!r}")
+                group_by_label[label] = group
+        category_by_group = {}
+        for category, groups in spec.get("categories", {}).items():
+            for group in groups:
+                if group in category_by_group:
+                    raise ValueError(f"group {group!r} is in categories {category_by_group[group]!r} and {category!r}")
+                category_by_group[group] = category
+        self.unknown = sorted((set(group_by_label) | set(category_by_group)) - set(self.labels))
+        # Includes labels the mapping lacks, so a model trained on groups can still read fine-labeled data
+        self.group_by_label = group_by_label
+
+        self.groups: list[str] = []
+        group_index = {}
+        for label in self.labels:
+            group = group_by_label.get(label, label)
+            if group not in group_index:
+                group_index[group] = len(self.groups)
+                self.groups.append(group)
+        self.group_of = np.array([group_index[group_by_label.get(label, label)] for label in self.labels], dtype=np.int64)
+
+        self.uncategorized = [group for group in self.groups if group not in category_by_group]
+        self.categories = list(dict.fromkeys([category_by_group.get(group, OTHER) for group in self.groups]))
+        category_index = {category: idx for idx, category in enumerate(self.categories)}
+        self.category_of_group = np.array([category_index[category_by_group.get(group, OTHER)] for group in self.groups],
+                                          dtype=np.int64)
+
+        # label x group and group x category 0/1 matrices; probabilities @ membership sums each level
+        self._to_group = np.zeros((len(self.labels), len(self.groups)), dtype=np.float32)
+        self._to_group[np.arange(len(self.labels)), self.group_of] = 1
+        self._to_category = np.zeros((len(self.groups), len(self.categories)), dtype=np.float32)
+        self._to_category[np.arange(len(self.groups)), self.category_of_group] = 1
+
+    def names(self, level: str = "group") -> list[str]:
+        return {"label": self.labels, "group": self.groups, "category": self.categories}[level]
+
+    def group_for(self, label: str) -> str:
+        """The group of a fine label, including labels the model lacks; other names pass through."""
+        try:
+            return self.groups[self.group_of[self.labels.index(label)]]
+        except ValueError:
+            # A group-trained model has no Cheddar_Cheese label, but its group is still Cheddar
+            return self.group_by_label.get(label, label)
+
+    def name_for(self, label: str, level: str = "group") -> str:
+        """``label`` at ``level``: itself, its group or its group's category."""
+        if level == "label":
+            return label
+        group = self.group_for(label)
+        if level == "group" or group not in self.groups:
+            return group
+        return self.categories[self.category_of_group[self.groups.index(group)]]
+
+    def members(self, group: str) -> list[str]:
+        idx = self.groups.index(group)
+        return [label for label, of in zip(self.labels, self.group_of) if of == idx]
+
+    def rollup(self, probabilities: np.ndarray, level: str = "group") -> np.ndarray:
+        """``(n, labels)`` probabilities summed to ``(n, groups)`` or ``(n, categories)``."""
+        if level not in LEVELS:
+            raise ValueError(f"level must be one of {LEVELS}, not {level!r}")
+        if level == "label":
+            return probabilities
+        grouped = np.asarray(probabilities, dtype=np.float32) @ self._to_group
+        return grouped if level == "group" else grouped @ self._to_category
+
+    def top_k(self, probabilities: np.ndarray, k: int = 5, level: str = "group") -> list[list[dict]]:
+        """The ``k`` most likely names per row at ``level``, most likely first."""
+        rolled = self.rollup(probabilities, level)
+        names = self.names(level)
+        order = np.argsort(-rolled, axis=1, kind="stable")[:, :k]
+        return [
+            [{"label": names[int(idx)], "probability": float(row[idx])} for idx in best]
+            for row, best in zip(rolled, order)
+        ]
+
+    def group_confusion(self, confusion: np.ndarray) -> np.ndarray:
+        """A label confusion matrix (true x predicted) summed to groups."""
+        grouped = np.zeros((len(self.groups), len(self.groups)), dtype=confusion.dtype)
+        np.add.at(grouped, (self.group_of[:, None], self.group_of[None, :]), confusion)
+        return grouped
+
+    def group_mapping(self) -> dict:
+        """A class mapping over the groups, in the pickled ``class_mapping.pkl`` format."""
+        return {"idx_to_class": dict(enumerate(self.groups)),
+                "class_to_idx": {group: idx for idx, group in enumerate(self.groups)}}
+
+
+def read_spec(path: str | Path = TAXONOMY_PATH) -> dict:
+    """The taxonomy file, or an empty taxonomy (every label its own group) if there is none."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"groups": {}, "categories": {}}
+
+
+def load_taxonomy(idx_to_class: dict[int, str], path: str | Path = TAXONOMY_PATH) -> Taxonomy:
+    """The taxonomy in ``path`` over a model's labels."""
+    return Taxonomy(idx_to_class, read_spec(path))
+
+
+def suggest_merges(taxonomy: Taxonomy, evaluation: dict) -> list[dict]:
+    """Confusable groups from an ``ingredients.evaluate`` report that the taxonomy keeps apart."""
+    found = []
+    for report in evaluation["models"].values():
+        for confusable in report["confusable_groups"]:
+            groups = sorted({taxonomy.group_for(label) for label in confusable["classes"]})
+            if len(groups) > 1:
+                found.append({"groups": groups, "labels": confusable["classes"],
+                              "share_of_errors": confusable["share_of_errors"],
+                              "accuracy_merged": confusable["accuracy_merged"]})
+    return found
+
+
+def relabel(source: str | Path, output: str | Path, taxonomy: Taxonomy) -> dict[str, int]:
+    """Symlink images in ``source/<label>/`` into ``output/<group>/``; images linked per group."""
+    source, output = Path(source).resolve(), Path(output)
+    linked: dict[str, int] = {}
+    for path in image_paths(source):
+        label = path.relative_to(source).parts[0]
+        if label not in taxonomy.labels:
+            continue
+        group = taxonomy.group_for(label)
+        # Files from merged labels may share a name; keep them apart by prefixing the label
+        target = output / group / (path.name if label == group else f"{label}__{path.name}")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if not target.exists():
+            os.symlink(path, target)
+        linked[group] = linked.get(group, 0) + 1
+    return linked
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check and apply the ingredient label taxonomy.")
+    parser.add_argument("--taxonomy", default=str(TAXONOMY_PATH), help="Taxonomy file (default: ingredient_taxonomy.json)")
+    parser.add_argument("--mapping", default=str(MAPPING_PATH), help="Class mapping (default: class_mapping.pkl)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("check", help="Validate the taxonomy and list its groups")
+    suggest = commands.add_parser("suggest", help="Merges proposed by an evaluation report")
+    suggest.add_argument("report", help="JSON written by python -m ingredients.evaluate --report")
+    mapping = commands.add_parser("mapping", help="Write a class mapping over the groups")
+    mapping.add_argument("--output", default=str(REPO_ROOT / "group_mapping.pkl"))
+    tree = commands.add_parser("relabel", help="Link a <label>/ image tree into <group>/ folders")
+    tree.add_argument("source")
+    tree.add_argument("output")
+    args = parser.parse_args(argv)
+
+    try:
+        taxonomy = load_taxonomy(load_class_mapping(args.mapping)[0], args.taxonomy)
+    except ValueError as err:
+        print(f"Invalid taxonomy: {err}", file=sys.stderr)
+        return 1
+
+    if args.command == "check":
+        for group in taxonomy.groups:
+            members = taxonomy.members(group)
+            if len(members) > 1:
+                print(f"{group}: {', '.join(members)}")
+        print(f"{len(taxonomy.labels)} labels -> {len(taxonomy.groups)} groups -> {len(taxonomy.categories)} categories")
+        for name in taxonomy.unknown:
+            print(f"  {name} is not a label of {args.mapping}", file=sys.stderr)
+        if taxonomy.uncategorized:
+            print(f"  in no category ({OTHER}): {', '.join(taxonomy.uncategorized)}", file=sys.stderr)
+        return 1 if taxonomy.unknown else 0
+
+    if args.command == "suggest":
+        with open(args.report, "r", encoding="utf-8") as f:
+            merges = suggest_merges(taxonomy, json.load(f))
+        for merge in merges:
+            print(f"{' + '.join(merge['groups'])}: {merge['share_of_errors']:.1%} of errors, "
+                  f"{merge['accuracy_merged']:.2%} accurate if merged")
+        if not merges:
+            print("The taxonomy already merges every confusable group in the report")
+        return 0
+
+    if args.command == "mapping":
+        output = Path(args.output)
+        tmp_path = output.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(taxonomy.group_mapping(), f)
+        os.replace(tmp_path, output)
+        print(f"{len(taxonomy.groups)} groups (from {len(taxonomy.labels)} labels) -> {output}")
+        return 0
+
+    linked = relabel(args.source, args.output, taxonomy)
+    print(f"Linked {sum(linked.values())} images into {len(linked)} group folders under {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
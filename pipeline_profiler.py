@@ -0,0 +1,296 @@
+"""Lightweight stage timing, counters and memory tracking for the review pipeline.
+
+Usage:
+    profiler = activate(Profiler())
+    with profiler.stage('inference'):
+        ...
+    profiler.count('reviews', len(reviews))
+    profiler.write_json('profile.json')
+    profiler.write_chrome_trace('trace.json')   # open in chrome://tracing or Perfetto
+
+Functions decorated with ``@profiled()`` record into whichever profiler is active, so the
+pipeline modules can stay instrumented without threading a profiler through every call.
+Command-line scripts get the standard flags from ``add_profiling_arguments`` and wrap their
+run in ``profiling_session``.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import shutil
+import cProfile
+import threading
+import functools
+import subprocess
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext, redirect_stdout
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Return the process' peak resident set size in MB, or None when unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class Profiler:
+    """Collects timed stages, counters and memory high-water marks for one run."""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.events = []
+        self.counters = defaultdict(int)
+        self.metadata = {}
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, **args):
+        """Time the enclosed block and record it as a stage event."""
+        local = self._local
+        depth = getattr(local, 'depth', 0)
+        local.depth = depth + 1
+        if self.trace_memory:
+            # Fold the heap peak seen so far into the enclosing stage before resetting it
+            peaks = local.__dict__.setdefault('peaks', [])
+            if peaks:
+                peaks[-1] = max(peaks[-1], tracemalloc.get_traced_memory()[1])
+            peaks.append(0)
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            local.depth = depth
+            event = {
+                'name': name,
+                'start': start - self._origin,
+                'duration': end - start,
+                'depth': depth,
+                'thread': threading.get_ident(),
+                'rss_peak_mb': peak_rss_mb(),
+            }
+            if self.trace_memory:
+                peak = max(local.peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if local.peaks:
+                    local.peaks[-1] = max(local.peaks[-1], peak)
+                event['traced_peak_mb'] = peak / (1024 * 1024)
+            if args:
+                event['args'] = args
+            with self._lock:
+                self.events.append(event)
+
+    def count(self, name, value=1):
+        """Increment a named counter."""
+        with self._lock:
+            self.counters[name] += value
+
+    def summary(self):
+        """Aggregate the recorded events per stage name."""
+        stages = {}
+        for event in self.events:
+            entry = stages.setdefault(event['name'], {'calls': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            entry['calls'] += 1
+            entry['total_seconds'] += event['duration']
+            entry['max_seconds'] = max(entry['max_seconds'], event['duration'])
+            if 'traced_peak_mb' in event:
+                entry['traced_peak_mb'] = max(entry.get('traced_peak_mb', 0.0), event['traced_peak_mb'])
+        for entry in stages.values():
+            entry['total_seconds'] = round(entry['total_seconds'], 6)
+            entry['max_seconds'] = round(entry['max_seconds'], 6)
+
+        # Only top-level stages add up to the wall time of the run
+        top_level = sum(event['duration'] for event in self.events if event['depth'] == 0)
+        return {
+            'stages': stages,
+            'counters': dict(self.counters),
+            'staged_seconds': round(top_level, 6),
+            'wall_seconds': round(time.perf_counter() - self._origin, 6),
+            'peak_rss_mb': peak_rss_mb(),
+            **self.metadata,
+        }
+
+    def write_json(self, destination):
+        """Write the run summary as JSON to a file, or to stdout when destination is '-'."""
+        payload = self.summary()
+        if destination == '-':
+            json.dump(payload, sys.stdout, indent=2)
+            sys.stdout.write('\n')
+        else:
+            with open(destination, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, indent=2)
+
+    def chrome_trace(self):
+        """Return the events in Chrome Trace Event format."""
+        pid = os.getpid()
+        trace_events = []
+        for event in self.events:
+            args = dict(event.get('args', {}))
+            if event['rss_peak_mb'] is not None:
+                args['rss_peak_mb'] = round(event['rss_peak_mb'], 2)
+            if 'traced_peak_mb' in event:
+                args['traced_peak_mb'] = round(event['traced_peak_mb'], 2)
+            trace_events.append({
+                'name': event['name'],
+                'cat': 'pipeline',
+                'ph': 'X',
+                'ts': event['start'] * 1e6,
+                'dur': event['duration'] * 1e6,
+                'pid': pid,
+                'tid': event['thread'],
+                'args': args,
+            })
+        for name, value in self.counters.items():
+            trace_events.append({'name': name, 'ph': 'C', 'ts': 0, 'pid': pid, 'args': {name: value}})
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+# No profiler is active until a run opts in, so instrumented functions cost one check
+_active = None
+
+
+def activate(profiler):
+    """Make ``profiler`` the target of ``profiled`` functions and ``stage``/``count`` calls.
+
+    Pass None to switch instrumentation off again.
+    """
+    global _active
+    _active = profiler
+    return profiler
+
+
+def active():
+    return _active
+
+
+def stage(name, **args):
+    """Time a block against the active profiler."""
+    if _active is None:
+        return nullcontext()
+    return _active.stage(name, **args)
+
+
+def count(name, value=1):
+    if _active is not None:
+        _active.count(name, value)
+
+
+def profiled(name=None):
+    """Decorator that records each call as a stage on the active profiler."""
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return func(*args, **kwargs)
+            with _active.stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def cprofile_to(path):
+    """Run the enclosed block under cProfile and dump pstats output to ``path``.
+
+    Inspect with ``python -m pstats PATH`` or snakeviz. A no-op when path is None.
+    """
+    if not path:
+        yield
+        return
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        prof.dump_stats(path)
+        print(f"cProfile stats written to: {path}")
+
+
+@contextmanager
+def py_spy_to(path, rate=100):
+    """Record the enclosed block with a py-spy sampler attached to this process.
+
+    Writes a speedscope profile to ``path``. Requires ``py-spy`` on PATH (and usually
+    ptrace permissions); a no-op when path is None.
+    """
+    if not path:
+        yield
+        return
+    executable = shutil.which('py-spy')
+    if executable is None:
+        print("Warning: py-spy not found on PATH; skipping sampling profile")
+        yield
+        return
+    sampler = subprocess.Popen([
+        executable, 'record', '--pid', str(os.getpid()), '--rate', str(rate),
+        '--format', 'speedscope', '--output', path,
+    ])
+    try:
+        yield
+    finally:
+        # py-spy writes its output when interrupted
+        sampler.send_signal(signal.SIGINT)
+        try:
+            sampler.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            sampler.kill()
+        print(f"py-spy profile written to: {path}")
+
+
+def add_profiling_arguments(parser):
+    """Add the --timings/--trace/--cprofile/--py-spy flags to an argparse parser."""
+    group = parser.add_argument_group('profiling')
+    group.add_argument('--timings', default=None, metavar='PATH',
+                       help="Write per-stage timings, counters and peak memory as JSON to PATH ('-' for stdout)")
+    group.add_argument('--trace', default=None, metavar='PATH',
+                       help="Write a Chrome trace (chrome://tracing, Perfetto) of the run to PATH")
+    group.add_argument('--trace-memory', action='store_true',
+                       help="Track per-stage Python heap peaks with tracemalloc (slower)")
+    group.add_argument('--cprofile', default=None, metavar='PATH',
+                       help="Run under cProfile and dump pstats output to PATH")
+    group.add_argument('--py-spy', default=None, metavar='PATH', dest='py_spy',
+                       help="Attach py-spy and write a speedscope profile to PATH")
+
+
+@contextmanager
+def profiling_session(args):
+    """Activate a fresh profiler for the run and write the requested outputs afterwards.
+
+    Yields the profiler; entries added to ``profiler.metadata`` during the run are included
+    in the JSON summary. With ``--timings -`` the run's own output goes to stderr, so stdout
+    carries nothing but the JSON.
+    """
+    timings = getattr(args, 'timings', None)
+    progress = redirect_stdout(sys.stderr) if timings == '-' else nullcontext()
+    profiler = activate(Profiler(trace_memory=getattr(args, 'trace_memory', False)))
+    try:
+        with progress, cprofile_to(getattr(args, 'cprofile', None)), py_spy_to(getattr(args, 'py_spy', None)):
+            yield profiler
+    finally:
+        activate(None)
+        if getattr(args, 'trace', None):
+            profiler.write_chrome_trace(args.trace)
+            print(f"Chrome trace written to: {args.trace}", file=sys.stderr if timings == '-' else sys.stdout)
+        if timings:
+            profiler.write_json(timings)
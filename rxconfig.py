@@ -1,5 +1,16 @@
+import os
+
 import reflex as rx
 
+# Session state lives in the backend worker's memory unless REDIS_URL points at a Redis
+# server (e.g. redis://localhost:6379/0); then every worker behind the load balancer
+# shares it and GUNICORN_WORKERS can be raised above 1. See HackAI/state_manager.py for
+# an in-process stand-in used by tests.
 config = rx.Config(
     app_name="HackAI",
-)
\ No newline at end of file
+    redis_url=os.environ.get("REDIS_URL") or None,
+    # Seconds an idle session is kept in Redis
+    redis_token_expiration=int(os.environ.get("REDIS_TOKEN_EXPIRATION", 3600)),
+    # Milliseconds a worker may hold a session's lock while processing one event
+    redis_lock_expiration=int(os.environ.get("REDIS_LOCK_EXPIRATION", 10000)),
+)
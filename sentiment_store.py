@@ -0,0 +1,125 @@
+"""Precomputed sentiment summary store for the competitor dashboard.
+
+Built from the analyzed reviews of a full ``comparecompanies.py`` run (``--store-dir``),
+the store is three CSV tables the dashboard can page through without touching reviews:
+
+    companies.csv    the ranked per-company comparison table
+    menu_items.csv   Company, Item, Positive, Negative, Neutral, Total
+    aspects.csv      Company, Aspect, Positive, Negative, Neutral, Total
+
+A review counts towards a menu item or aspect when its text mentions one of the item's
+names or the aspect's keywords; the counts split those reviews by sentiment. Matching
+runs one vectorized regex per term over all review texts.
+"""
+
+import os
+import re
+
+import pandas as pd
+
+from pipeline_profiler import profiled
+
+# Menu item -> names it goes by in reviews, as lowercase regex alternatives
+DEFAULT_MENU_ITEMS = {
+    'Meat Lovers': ['meat lovers?', 'meatlovers?'],
+    'Pepperoni': ['pepperoni'],
+    'Margherita': ['margherita', 'margarita pizza'],
+    'Cheese Pizza': ['cheese pizza', 'cheese slice', 'plain cheese'],
+    '4 Cheese': ['4 cheese', 'four cheese', '4cheez'],
+    'Naga Habanero': ['naga habanero', 'naga'],
+    'Habanero Chicken': ['habanero chicken'],
+    'Harissa Chicken': ['harissa'],
+    'Korean BBQ': ['korean bbq', 'korean barbecue'],
+    'BBQ Chicken': ['bbq chicken', 'barbecue chicken'],
+    'Beef Taco': ['beef taco', 'taco pizza'],
+    'Supreme': ['supreme'],
+    'Hawaiian': ['hawaiian', 'pineapple'],
+    'Buffalo Chicken': ['buffalo chicken'],
+    'Wings': ['wings?'],
+    'Garlic Knots': ['garlic knots?'],
+    'Calzone': ['calzones?'],
+    'Stromboli': ['strombolis?'],
+    'Pasta': ['pasta', 'alfredo', 'lasagna', 'spaghetti', 'baked ziti'],
+    'Salad': ['salads?'],
+    'Breadsticks': ['breadsticks?', 'garlic bread'],
+}
+
+# Aspect -> keywords that signal it
+DEFAULT_ASPECTS = {
+    'Service': ['service', 'staff', 'friendly', 'rude', 'waiter', 'waitress', 'server', 'owner'],
+    'Crust': ['crust', 'dough', 'crispy', 'soggy'],
+    'Sauce': ['sauce', 'marinara'],
+    'Toppings': ['toppings?', 'cheese'],
+    'Flavor': ['flavou?rs?', 'taste', 'tasty', 'delicious', 'bland', 'seasoning'],
+    'Price': ['prices?', 'pricey', 'expensive', 'cheap', 'overpriced', 'value', 'worth'],
+    'Wait time': ['wait', 'waited', 'slow', 'quick', 'fast', 'took forever'],
+    'Delivery': ['delivery', 'delivered', 'driver', 'doordash', 'uber eats'],
+    'Portion size': ['portions?', 'size', 'huge', 'tiny', 'generous'],
+    'Cleanliness': ['clean', 'dirty', 'filthy'],
+    'Atmosphere': ['atmosphere', 'ambiance', 'ambience', 'seating', 'cramped', 'small space'],
+}
+
+SENTIMENT_COLUMNS = {'positive': 'Positive', 'negative': 'Negative', 'neutral': 'Neutral'}
+
+
+def load_menu_items(path):
+    """Read menu items from a text file: one item per line, ``Label: name | other name``.
+
+    Names are plain text, matched case-insensitively; they are escaped here so
+    ``half (large)`` or ``C++`` match literally.
+    """
+    menu_items = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            label, _, names = line.partition(':')
+            aliases = [re.escape(name.strip().lower()) for name in (names or label).split('|') if name.strip()]
+            menu_items[label.strip()] = aliases
+    return menu_items
+
+
+def _pattern(names):
+    # Lookarounds rather than \b, so names starting or ending in punctuation still match
+    return r'(?<!\w)(?:' + '|'.join(names) + r')(?!\w)'
+
+
+@profiled()
+def mention_counts(reviews_df, terms, term_column):
+    """Reviews mentioning each term, per company and sentiment, in long format.
+
+    ``terms`` maps a label to lowercase regex alternatives, matched against the lowercased
+    text as whole words. Companies never mentioning a term get no row for it.
+    """
+    texts = reviews_df['text'].fillna('').str.lower()
+    mentions = pd.DataFrame({label: texts.str.contains(_pattern(names), regex=True)
+                             for label, names in terms.items()}, index=reviews_df.index).astype(int)
+    mentions['Company'] = reviews_df['company'].to_numpy()
+    mentions['sentiment'] = reviews_df['sentiment'].to_numpy()
+
+    counts = mentions.groupby(['Company', 'sentiment']).sum()
+    counts.columns.name = term_column
+    table = counts.stack().unstack('sentiment', fill_value=0)
+    table = table.reindex(columns=list(SENTIMENT_COLUMNS), fill_value=0).rename(columns=SENTIMENT_COLUMNS)
+    table['Total'] = table.sum(axis=1)
+    table = table[table['Total'] > 0].reset_index()
+    table.columns.name = None
+    return table.sort_values(['Company', 'Total'], ascending=[True, False], kind='stable')
+
+
+def write_sentiment_store(reviews_df, comparison_df, store_dir, menu_items=None, aspects=None):
+    """Write the companies, menu item and aspect tables to ``store_dir``."""
+    os.makedirs(store_dir, exist_ok=True)
+    tables = {
+        'companies': comparison_df,
+        'menu_items': mention_counts(reviews_df, menu_items or DEFAULT_MENU_ITEMS, 'Item'),
+        'aspects': mention_counts(reviews_df, aspects or DEFAULT_ASPECTS, 'Aspect'),
+    }
+    for name, table in tables.items():
+        path = os.path.join(store_dir, f"{name}.csv")
+        # Write-then-rename so a dashboard watching the directory never reads half a table
+        tmp_path = f"{path}.tmp"
+        table.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    return store_dir
@@ -1,11 +1,21 @@
 import os
 import re
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
+import sys
+import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
-from tqdm import tqdm
+from comparecompanies import (
+    analyze_sentiment,
+    load_sentiment_pipeline,
+    read_review_file,
+    add_common_arguments,
+    write_table,
+)
+from discrepancies import rank_discrepancies, score_discrepancies
+from pipeline_profiler import profiled, profiling_session, stage
 
-def parse_reviews_text(text_content):
+@profiled()
+def parse_reviews_text(text_content, restaurant_name="SauceBros", address="Plano, TX"):
     """Parse reviews with 'Rating: X stars' and 'Review:' format."""
     # Split the text by newline to process line by line
     lines = text_content.strip().split('\n')
@@ -55,53 +65,14 @@ def parse_reviews_text(text_content):
     
     # Create restaurant info from the data
     restaurant_info = {
-        'name': "SauceBros",
-        'address': "Plano, TX",  # Extracted from the reviews
+        'name': restaurant_name,
+        'address': address,
         'source': "Customer Reviews"
     }
     
     return restaurant_info, reviews
 
-def analyze_sentiment(reviews, model_name="distilbert-base-uncased-finetuned-sst-2-english"):
-    """Analyze sentiment for each review using Hugging Face model."""
-    print(f"Loading sentiment analysis model: {model_name}")
-    
-    # Initialize sentiment analysis pipeline
-    sentiment_analyzer = pipeline(
-        "sentiment-analysis", 
-        model=model_name, 
-        tokenizer=model_name
-    )
-    
-    # For longer reviews, we might need to handle token limits
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    max_length = tokenizer.model_max_length
-    
-    print(f"Analyzing sentiment for {len(reviews)} reviews...")
-    for review in tqdm(reviews):
-        text = review['text']
-        
-        # Check if text is too long for the model's max input size
-        if len(tokenizer.encode(text)) > max_length:
-            # Simple truncation approach - split into chunks and analyze first chunk
-            encoded = tokenizer.encode(text, max_length=max_length-10, truncation=True)
-            text = tokenizer.decode(encoded)
-        
-        # Get sentiment prediction
-        result = sentiment_analyzer(text)[0]
-        review['sentiment_label'] = result['label']
-        review['sentiment_score'] = result['score']
-        
-        # Add a simplified sentiment category
-        if result['label'] == 'POSITIVE':
-            review['sentiment'] = 'positive'
-        elif result['label'] == 'NEGATIVE':
-            review['sentiment'] = 'negative'
-        else:
-            review['sentiment'] = 'neutral'
-    
-    return reviews
-
+@profiled()
 def create_visualizations(reviews, restaurant_info, output_dir="review_analysis"):
     """Create visualizations from the sentiment analysis."""
     os.makedirs(output_dir, exist_ok=True)
@@ -190,6 +161,7 @@ def create_visualizations(reviews, restaurant_info, output_dir="review_analysis"
     
     return os.path.join(output_dir, f'{restaurant_info["name"].replace(" ", "_")}_sentiment_analysis.csv')
 
+@profiled()
 def generate_report(reviews, restaurant_info, csv_path, output_dir="review_analysis"):
     """Generate a summary report of the sentiment analysis."""
     df = pd.DataFrame(reviews)
@@ -307,67 +279,64 @@ def generate_report(reviews, restaurant_info, csv_path, output_dir="review_analy
     
     return report_path
 
-def main():
-    # Ask user if they want to input from a file or paste text directly
-    input_method = input("Enter '1' to read from a file or '2' to paste text directly: ").strip()
-    
-    if input_method == '1':
-        # Get file path from user or use the default
-        default_path = "/Users/gayathriutla/Desktop/Projects/hackai/restaurant_reviews/SauceBros_reviews_with_ratings.txt"
-        file_path = input(f"Enter review file path (or press Enter to use default {default_path}): ").strip()
-        
-        if not file_path:
-            file_path = default_path
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="Analyze customer review sentiment for a single restaurant.")
+    parser.add_argument('input', nargs='?', default='-',
+                        help="Review file with 'Rating: X stars' / 'Review:' entries ('-' reads stdin, the default)")
+    parser.add_argument('--name', default="SauceBros", help="Restaurant name used in the report")
+    parser.add_argument('--address', default="Plano, TX", help="Restaurant address used in the report")
+    parser.add_argument('--output-dir', default=None,
+                        help="Output directory (default: sentiment_analysis_<name>)")
+    add_common_arguments(parser)
+    return parser
 
-        if not os.path.exists(file_path):
-            print(f"Error: File not found at {file_path}")
-            return
-        
-        print(f"Reading reviews from: {file_path}")
-        with open(file_path, 'r', encoding='utf-8') as f:
-            review_text = f.read()
-    else:
-        print("Please paste the review text (press Ctrl+D or Ctrl+Z when finished):")
-        review_lines = []
-        try:
-            while True:
-                line = input()
-                review_lines.append(line)
-        except EOFError:
-            review_text = '\n'.join(review_lines)
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    with profiling_session(args) as profiler:
+        profiler.metadata.update(batch_size=args.batch_size, model=args.model)
+        return run_analysis(args)
+
+def run_analysis(args):
+    with stage('read'):
+        if args.input == '-':
+            review_text = sys.stdin.read()
+        else:
+            if not os.path.exists(args.input):
+                print(f"Error: File not found at {args.input}")
+                return 1
+            
+            print(f"Reading reviews from: {args.input}")
+            review_text = read_review_file(args.input)
+            if review_text is None:
+                return 1
     
     # Parse the reviews
-    restaurant_info, reviews = parse_reviews_text(review_text)
+    restaurant_info, reviews = parse_reviews_text(review_text, args.name, args.address)
     
     if not reviews:
         print("No reviews were parsed from the input. Please check the format.")
-        return
+        return 1
         
     print(f"Found {len(reviews)} reviews for {restaurant_info['name']}")
     
     # Analyze a sample of the first review to verify parsing worked correctly
-    if reviews:
-        print("\nSample of first review:")
-        print(f"Rating: {reviews[0]['rating']} stars")
-        print(f"Text: {reviews[0]['text'][:100]}...")
-    
-    # Confirm with user before continuing with large sets
-    if len(reviews) > 50:
-        proceed = input(f"\nFound {len(reviews)} reviews. Processing may take some time. Continue? (y/n): ").lower()
-        if proceed != 'y':
-            print("Operation cancelled by user.")
-            return
-    
-    # You can choose from different sentiment models:
+    print("\nSample of first review:")
+    print(f"Rating: {reviews[0]['rating']} stars")
+    print(f"Text: {reviews[0].get('text', '')[:100]}...")
+    
+    # You can choose from different sentiment models with --model:
     # - "distilbert-base-uncased-finetuned-sst-2-english" (faster, general sentiment)
     # - "nlptown/bert-base-multilingual-uncased-sentiment" (5-class sentiment with star ratings)
     # - "cardiffnlp/twitter-roberta-base-sentiment" (3-class sentiment optimized for social media)
+    with stage('load_model'):
+        sentiment_analyzer = load_sentiment_pipeline(
+            args.model, device=args.device, framework=args.backend, cache_dir=args.cache_dir)
     
-    # For restaurant reviews, we'll use a model that handles nuanced opinions well
-    model_name = "distilbert-base-uncased-finetuned-sst-2-english"
-    analyzed_reviews = analyze_sentiment(reviews, model_name)
+    analyzed_reviews = analyze_sentiment(
+        reviews, args.model, sentiment_analyzer=sentiment_analyzer, batch_size=args.batch_size)
     
-    output_dir = f"sentiment_analysis_{restaurant_info['name'].replace(' ', '_').replace('/', '_')}"
+    output_dir = args.output_dir or f"sentiment_analysis_{restaurant_info['name'].replace(' ', '_').replace('/', '_')}"
     csv_path = create_visualizations(analyzed_reviews, restaurant_info, output_dir)
     
     report_path = generate_report(analyzed_reviews, restaurant_info, csv_path, output_dir)
@@ -375,21 +344,25 @@ def main():
     
     # Print summary of findings
     df = pd.DataFrame(analyzed_reviews)
+    if args.output_format != 'csv':
+        write_table(df, output_dir, f'{restaurant_info["name"].replace(" ", "_")}_sentiment_analysis', args.output_format)
+    
     positive_pct = (len(df[df['sentiment'] == 'positive']) / len(df)) * 100 if len(df) > 0 else 0
     print(f"\nSUMMARY:")
     print(f"Average rating: {df['rating'].mean():.2f}/5.0")
     print(f"Sentiment breakdown: {positive_pct:.1f}% positive")
     
     # Find any discrepancies between rating and sentiment
-    discrepancies = df[(df['rating'] >= 4) & (df['sentiment'] == 'negative') | 
-                    (df['rating'] <= 2) & (df['sentiment'] == 'positive')]
+    discrepancies = rank_discrepancies(score_discrepancies(df))
+    write_table(discrepancies, output_dir, 'review_discrepancies', args.output_format)
     
     if len(discrepancies) > 0:
         print(f"\nFound {len(discrepancies)} reviews with potential discrepancies between star rating and sentiment.")
-        print("These might be worth investigating further:")
-        for i, review in discrepancies.iterrows():
-            print(f"- Rating: {review['rating']} stars, Sentiment: {review['sentiment']}")
-            print(f"  Text snippet: {review['text'][:50]}...")
+        print("These might be worth investigating further (strongest disagreement first):")
+        for rating, sentiment, score, text in discrepancies[['rating', 'sentiment', 'disagreement_score', 'text']].head(10).itertuples(index=False):
+            print(f"- Rating: {rating} stars, Sentiment: {sentiment} (disagreement {score:.2f})")
+            print(f"  Text snippet: {text[:50]}...")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
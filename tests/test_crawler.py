@@ -0,0 +1,115 @@
+"""Crawler runs against fixture images served by a local HTTP server.
+
+    python -m pytest tests/test_crawler.py
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import struct
+import threading
+import zlib
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+Image = pytest.importorskip("PIL.Image")
+
+from ingredients.crawler import MANIFEST, Crawler, make_client, url_list_source  # noqa: E402
+
+
+def png(size: tuple[int, int], color=(200, 120, 40)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def bomb_png(width: int = 20000, height: int = 20000) -> bytes:
+    """A PNG whose header claims ``width x height`` pixels; Pillow refuses it on open."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(b"\x00" * (width + 1))) + chunk(b"IEND", b""))
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Serves good, duplicate, small, corrupt and oversized images; missing.png is a 404."""
+    root = tmp_path / "served"
+    root.mkdir()
+    good = png((160, 160))
+    (root / "good.png").write_bytes(good)
+    (root / "good_copy.png").write_bytes(good)
+    (root / "small.png").write_bytes(png((32, 32)))
+    (root / "corrupt.jpg").write_bytes(b"\xff\xd8\xff\xe0" + b"not really a jpeg" * 20)
+    (root / "bomb.png").write_bytes(bomb_png())
+    urls = ["good.png", "good_copy.png", "small.png", "corrupt.jpg", "missing.png", "bomb.png"]
+    (root / "index.json").write_text(json.dumps({"Cheese": urls}))
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=str(root)))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def crawl(base_url: str, output_dir, per_class: int = 5):
+    with make_client(workers=2) as client:
+        crawler = Crawler(url_list_source(f"{base_url}/index.json", client), client, output_dir,
+                          per_class=per_class, workers=2, log=lambda message: None)
+        try:
+            added = crawler.crawl(["Cheese"])
+        finally:
+            crawler.close()
+    return added, crawler.manifest.path
+
+
+def statuses(manifest_path) -> dict[str, list[str]]:
+    with open(manifest_path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    found: dict[str, list[str]] = {}
+    for row in rows:
+        found.setdefault(row["url"].rsplit("/", 1)[-1], []).append(row["status"])
+    return found
+
+
+def test_crawl_keeps_valid_images_and_records_every_url(server, tmp_path):
+    output_dir = tmp_path / "crawl"
+    added, manifest_path = crawl(server, output_dir)
+
+    assert added["Cheese"] == 1
+    assert [path.suffix for path in (output_dir / "Cheese").iterdir()] == [".png"]
+    assert manifest_path == output_dir / MANIFEST
+    assert not (tmp_path / MANIFEST).exists()
+
+    found = statuses(manifest_path)
+    assert sorted(found["good.png"] + found["good_copy.png"]) == ["duplicate", "ok"]
+    assert found["small.png"][0].startswith("rejected: too small")
+    assert found["corrupt.jpg"][0].startswith("rejected: corrupt")
+    assert found["bomb.png"][0].startswith("rejected: too many pixels")
+    assert found["missing.png"][0].startswith("error: ")
+
+
+def test_resume_retries_only_failed_downloads(server, tmp_path):
+    output_dir = tmp_path / "crawl"
+    crawl(server, output_dir)
+    added, manifest_path = crawl(server, output_dir)
+
+    assert added["Cheese"] == 0
+    found = statuses(manifest_path)
+    assert len(found["missing.png"]) == 2
+    assert all(len(rows) == 1 for name, rows in found.items() if name != "missing.png")
@@ -0,0 +1,62 @@
+"""Rating vs. sentiment discrepancy scoring in discrepancies.py.
+
+    python -m pytest tests/test_discrepancies.py
+"""
+
+from __future__ import annotations
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from discrepancies import (  # noqa: E402
+    SNIPPET_LENGTH,
+    rank_discrepancies,
+    score_discrepancies,
+    summarize_discrepancies,
+)
+
+
+def reviews() -> "pd.DataFrame":
+    return pd.DataFrame([
+        {"company": "A", "rating": 5, "sentiment": "negative", "sentiment_score": 1.0, "text": "x" * 500},
+        {"company": "A", "rating": 5, "sentiment": "negative", "sentiment_score": 0.5, "text": "meh"},
+        {"company": "A", "rating": 5, "sentiment": "positive", "sentiment_score": 0.9, "text": "great"},
+        {"company": "B", "rating": 1, "sentiment": "positive", "sentiment_score": 0.75, "text": "odd"},
+        {"company": "B", "rating": 3, "sentiment": "negative", "sentiment_score": 1.0, "text": "fine"},
+        {"company": "B", "rating": 0, "sentiment": "positive", "sentiment_score": None, "text": None},
+    ])
+
+
+def test_scores_follow_the_documented_formula():
+    scored = score_discrepancies(reviews())
+    assert list(scored["discrepancy"]) == [True, True, False, True, False, False]
+    # |rating_polarity - sentiment_polarity * confidence| / 2
+    assert list(scored["disagreement_score"]) == pytest.approx([1.0, 0.5, 0.1, 0.75, 0.5, 0.0])
+    assert "discrepancy" not in reviews().columns
+
+
+def test_ranking_orders_flagged_reviews_and_trims_text():
+    ranked = rank_discrepancies(score_discrepancies(reviews()))
+    assert list(ranked["Rank"]) == [1, 2, 3]
+    assert list(ranked["disagreement_score"]) == pytest.approx([1.0, 0.75, 0.5])
+    assert len(ranked["text"][0]) == SNIPPET_LENGTH
+
+    top = rank_discrepancies(score_discrepancies(reviews()), top=1)
+    assert list(top["company"]) == ["A"]
+
+
+def test_summary_ignores_unrated_reviews():
+    summary = summarize_discrepancies(score_discrepancies(reviews())).set_index("Company")
+    assert summary.loc["A", "Reviews"] == 3 and summary.loc["A", "Discrepancies"] == 2
+    assert summary.loc["B", "Reviews"] == 2 and summary.loc["B", "Discrepancies"] == 1
+    assert summary.loc["A", "Discrepancy_Rate"] == pytest.approx(200 / 3)
+    assert summary.loc["B", "Mean_Disagreement"] == pytest.approx(0.625)
+    assert list(summary.index) == ["A", "B"]
+
+
+def test_empty_frame():
+    empty = pd.DataFrame(columns=["company", "rating", "sentiment", "sentiment_score", "text"])
+    scored = score_discrepancies(empty)
+    assert len(rank_discrepancies(scored)) == 0
+    assert len(summarize_discrepancies(scored)) == 0
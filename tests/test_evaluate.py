@@ -0,0 +1,82 @@
+"""Streaming confusion matrix and confusable groups in ingredients.evaluate.
+
+    python -m pytest tests/test_evaluate.py
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from ingredients.evaluate import Evaluation
+from ingredients.taxonomy import Taxonomy
+
+CLASSES = {0: "Cheddar", 1: "Cheddar_Cheese", 2: "Mozzarella", 3: "Basil", 4: "Oregano"}
+
+
+def one_hot(predicted: list[int], num_classes: int = len(CLASSES)) -> np.ndarray:
+    probabilities = np.full((len(predicted), num_classes), 0.01, dtype=np.float32)
+    probabilities[np.arange(len(predicted)), predicted] = 1
+    return probabilities
+
+
+def evaluation_of(pairs: list[tuple[int, int]], batch: int = 7) -> Evaluation:
+    """An evaluation fed ``(true, predicted)`` pairs in batches of ``batch``."""
+    evaluation = Evaluation(len(CLASSES))
+    for start in range(0, len(pairs), batch):
+        labels, predicted = map(list, zip(*pairs[start:start + batch]))
+        paths = [f"{CLASSES[t]}/{start + i}.jpg" for i, t in enumerate(labels)]
+        evaluation.add(np.array(labels), one_hot(predicted), paths)
+    return evaluation
+
+
+def test_confusion_matches_counted_pairs():
+    rng = np.random.default_rng(1)
+    pairs = [(int(t), int(p)) for t, p in rng.integers(0, len(CLASSES), size=(200, 2))]
+    evaluation = evaluation_of(pairs)
+    expected = np.zeros((len(CLASSES), len(CLASSES)), dtype=np.int64)
+    for t, p in pairs:
+        expected[t, p] += 1
+    np.testing.assert_array_equal(evaluation.confusion, expected)
+    assert evaluation.images == 200
+    assert evaluation.top_k_hits == 200
+    for (t, p), shown in evaluation.mistakes.items():
+        assert t != p and 0 < len(shown) <= evaluation.examples
+
+
+def test_top_k_counts_the_label_among_the_best_guesses():
+    evaluation = Evaluation(len(CLASSES))
+    probabilities = np.array([[0.5, 0.3, 0.1, 0.06, 0.04],
+                              [0.5, 0.3, 0.1, 0.06, 0.04]], dtype=np.float32)
+    evaluation.add(np.array([1, 4]), probabilities, ["a.jpg", "b.jpg"], k=2)
+    assert evaluation.top_k_hits == 1
+    assert evaluation.confusion[1, 0] == evaluation.confusion[4, 0] == 1
+
+
+def test_confusable_groups_join_chains_of_mistaken_classes():
+    # Cheddar <-> Cheddar_Cheese <-> Mozzarella are mixed up often; Basil once for Oregano
+    pairs = ([(0, 0)] * 20 + [(0, 1)] * 6 + [(1, 1)] * 20 + [(1, 0)] * 4 + [(1, 2)] * 3
+             + [(2, 2)] * 20 + [(2, 1)] * 3 + [(3, 3)] * 30 + [(3, 4)] * 1 + [(4, 4)] * 30)
+    evaluation = evaluation_of(pairs)
+    assert evaluation.confusable_groups() == [[0, 1, 2]]
+    assert evaluation.confusable_groups(min_images=100) == []
+
+    taxonomy = Taxonomy(CLASSES, {"groups": {"Cheddar": ["Cheddar", "Cheddar_Cheese"]}})
+    report = evaluation.report(CLASSES, taxonomy=taxonomy)
+    (group,) = report["confusable_groups"]
+    assert group["classes"] == ["Cheddar", "Cheddar_Cheese", "Mozzarella"]
+    assert group["images"] == 76
+    assert group["accuracy_merged"] == pytest.approx(1.0)
+    assert group["share_of_errors"] == pytest.approx(16 / 17)
+    assert not group["merged_by_taxonomy"]
+    assert report["accuracy"] == pytest.approx(120 / 137)
+    assert report["group_accuracy"] == pytest.approx(130 / 137)
+    worst = report["confusions"][0]
+    assert (worst["true"], worst["predicted"], worst["images"]) == ("Cheddar", "Cheddar_Cheese", 6)
+    assert len(worst["examples"]) == evaluation.examples
+
+
+def test_empty_evaluation_reports_zeros():
+    report = Evaluation(len(CLASSES)).report(CLASSES, taxonomy=Taxonomy(CLASSES, {}))
+    assert (report["images"], report["accuracy"], report["macro_f1"]) == (0, 0.0, 0.0)
+    assert report["confusable_groups"] == [] and report["confusions"] == []
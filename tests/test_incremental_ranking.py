@@ -0,0 +1,116 @@
+"""IncrementalRanking against a ranking recomputed from scratch.
+
+    python -m pytest tests/test_incremental_ranking.py
+"""
+
+from __future__ import annotations
+
+import random
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from incremental_ranking import IncrementalRanking, RankingState  # noqa: E402
+
+
+def review(sentiment: str, rating: int = 0, text: str = "") -> dict:
+    return {"sentiment": sentiment, "sentiment_score": {"positive": 0.9, "negative": 0.1}.get(sentiment, 0.5),
+            "rating": rating, "text": text}
+
+
+def expected_order(reviews_by_company: dict[str, list[dict]]) -> list[tuple[str, float]]:
+    """(company, positive %) best first, ties by name, as build_comparison_df ranks them."""
+    rows = []
+    for company, reviews in reviews_by_company.items():
+        if reviews:
+            positive = sum(r["sentiment"] == "positive" for r in reviews)
+            rows.append((company, positive / len(reviews) * 100))
+    return sorted(rows, key=lambda row: (-row[1], row[0]))
+
+
+def check(ranking: IncrementalRanking, reviews_by_company: dict[str, list[dict]]) -> None:
+    order = expected_order(reviews_by_company)
+    table = ranking.to_comparison_df()
+    assert list(table["Company"]) == [company for company, _ in order]
+    assert list(table["Positive_Percentage"]) == pytest.approx([pct for _, pct in order])
+    assert list(table["Rank"]) == list(range(1, len(order) + 1))
+    for rank, (company, _) in enumerate(order, start=1):
+        assert ranking.rank_of(company) == rank
+
+    observations = ranking.observations()
+    if not order:
+        assert observations is None
+        return
+    average = sum(pct for _, pct in order) / len(order)
+    assert observations["top_company"] == order[0][0]
+    assert observations["bottom_company"] == order[-1][0]
+    assert observations["average_pct"] == pytest.approx(average, abs=1e-9)
+    assert observations["above_average"] == sum(pct > average + 1e-9 for _, pct in order)
+    more_negative = {company for company, reviews in reviews_by_company.items() if reviews
+                     and sum(r["sentiment"] == "negative" for r in reviews)
+                     > sum(r["sentiment"] == "positive" for r in reviews)}
+    assert {company for company, _, _ in observations["more_negative"]} == more_negative
+
+
+def test_random_adds_and_removes_match_a_full_recompute():
+    rng = random.Random(7)
+    ranking = IncrementalRanking()
+    reviews_by_company: dict[str, list[dict]] = {f"Company_{i}": [] for i in range(12)}
+    for _ in range(400):
+        company = rng.choice(list(reviews_by_company))
+        current = reviews_by_company[company]
+        removed = rng.sample(current, rng.randint(0, min(3, len(current))))
+        added = [review(rng.choice(["positive", "negative", "neutral"]), rng.randint(0, 5))
+                 for _ in range(rng.randint(0, 4))]
+        for gone in removed:
+            current.remove(gone)
+        current.extend(added)
+        ranking.apply(company, added, removed)
+        check(ranking, reviews_by_company)
+
+
+def test_removing_every_review_drops_the_company_and_the_average_sum():
+    ranking = IncrementalRanking()
+    reviews = [review("positive"), review("negative"), review("positive")]
+    ranking.apply("A", reviews)
+    ranking.apply("B", [review("neutral")])
+    ranking.apply("A", removed=reviews)
+    assert "A" not in ranking.companies
+    check(ranking, {"B": [review("neutral")]})
+    ranking.drop("B")
+    assert ranking.observations() is None
+    assert ranking._pct_sum == pytest.approx(0, abs=1e-9)
+
+
+def test_tied_percentages_rank_by_name():
+    ranking = IncrementalRanking()
+    for company in ["Zeta", "Alpha", "Mid"]:
+        ranking.apply(company, [review("positive"), review("negative")])
+    assert list(ranking.to_comparison_df()["Company"]) == ["Alpha", "Mid", "Zeta"]
+
+
+def test_state_diffs_duplicate_reviews_and_drops_files(tmp_path):
+    path = tmp_path / "Pizza_Place.txt"
+    path.write_text("reviews")
+    state = RankingState()
+    first = [review("positive", 5, "Great"), review("positive", 5, "Great"), review("negative", 1, "Cold")]
+    added, removed = state.diff(str(path), first)
+    assert (len(added), removed) == (3, [])
+    state.apply(str(path), "Pizza Place", added)
+
+    # One copy of a duplicated review goes away and a new one arrives
+    second = [{"rating": 5, "text": "Great"}, {"rating": 1, "text": "Cold"}, {"rating": 4, "text": "Fine"}]
+    added, removed = state.diff(str(path), second)
+    assert [r["text"] for r in added] == ["Fine"]
+    assert [(r["sentiment"], r["rating"]) for r in removed] == [("positive", 5)]
+    added[0].update(sentiment="neutral", sentiment_score=0.5)
+    state.apply(str(path), "Pizza Place", added, removed)
+    stats = state.ranking.companies["Pizza Place"]
+    assert (stats.positive, stats.negative, stats.neutral, stats.total) == (1, 1, 1, 3)
+
+    state.save(str(tmp_path / "state.json"))
+    loaded = RankingState.load(str(tmp_path / "state.json"))
+    assert loaded.ranking.to_dict() == state.ranking.to_dict()
+    loaded.drop_file(str(path))
+    assert len(loaded.ranking) == 0 and loaded.files == {}
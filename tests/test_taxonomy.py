@@ -0,0 +1,87 @@
+"""Label taxonomy rollups in ingredients.taxonomy.
+
+    python -m pytest tests/test_taxonomy.py
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from ingredients.taxonomy import OTHER, Taxonomy
+
+LABELS = ["Cheddar", "Cheddar_Cheese", "Mozzarella", "Soda_Can", "Soft_Drink_Can", "Basil"]
+SPEC = {
+    "groups": {"Cheddar": ["Cheddar", "Cheddar_Cheese"], "Soda_Can": ["Soda_Can", "Soft_Drink_Can"]},
+    "categories": {"Cheese": ["Cheddar", "Mozzarella"], "Drinks": ["Soda_Can"]},
+}
+
+
+@pytest.fixture
+def taxonomy() -> Taxonomy:
+    return Taxonomy(dict(enumerate(LABELS)), SPEC)
+
+
+def test_levels(taxonomy):
+    assert taxonomy.groups == ["Cheddar", "Mozzarella", "Soda_Can", "Basil"]
+    assert taxonomy.categories == ["Cheese", "Drinks", OTHER]
+    assert taxonomy.uncategorized == ["Basil"]
+    assert taxonomy.members("Cheddar") == ["Cheddar", "Cheddar_Cheese"]
+    assert taxonomy.name_for("Soft_Drink_Can") == "Soda_Can"
+    assert taxonomy.name_for("Soft_Drink_Can", "category") == "Drinks"
+    assert taxonomy.name_for("Basil", "category") == OTHER
+    assert taxonomy.name_for("Cheddar_Cheese", "label") == "Cheddar_Cheese"
+
+
+def test_rollup_sums_each_level(taxonomy):
+    probabilities = np.random.default_rng(0).dirichlet(np.ones(len(LABELS)), size=8).astype(np.float32)
+    grouped = taxonomy.rollup(probabilities)
+    expected = np.stack([probabilities[:, 0] + probabilities[:, 1], probabilities[:, 2],
+                         probabilities[:, 3] + probabilities[:, 4], probabilities[:, 5]], axis=1)
+    np.testing.assert_allclose(grouped, expected, rtol=1e-6)
+    categories = taxonomy.rollup(probabilities, "category")
+    np.testing.assert_allclose(categories, np.stack([expected[:, 0] + expected[:, 1], expected[:, 2], expected[:, 3]],
+                                                    axis=1), rtol=1e-6)
+    np.testing.assert_allclose(categories.sum(axis=1), 1, rtol=1e-5)
+    assert taxonomy.rollup(probabilities, "label") is probabilities
+    with pytest.raises(ValueError):
+        taxonomy.rollup(probabilities, "shelf")
+
+
+def test_split_probability_counts_as_one_confident_group(taxonomy):
+    probabilities = np.array([[0.3, 0.3, 0.4, 0, 0, 0]], dtype=np.float32)
+    best = taxonomy.top_k(probabilities, k=2)[0]
+    assert [guess["label"] for guess in best] == ["Cheddar", "Mozzarella"]
+    assert best[0]["probability"] == pytest.approx(0.6)
+
+
+def test_group_confusion_sums_blocks(taxonomy):
+    confusion = np.arange(len(LABELS) ** 2, dtype=np.int64).reshape(len(LABELS), len(LABELS))
+    grouped = taxonomy.group_confusion(confusion)
+    assert grouped.sum() == confusion.sum()
+    assert grouped[0, 0] == confusion[:2, :2].sum()
+    assert grouped[0, 2] == confusion[:2, 3:5].sum()
+    assert grouped[2, 3] == confusion[3:5, 5].sum()
+    assert grouped[1, 1] == confusion[2, 2]
+    # Confusing two labels of the same group is not a group error
+    mixed = np.zeros_like(confusion)
+    mixed[0, 1] = mixed[4, 3] = 5
+    assert np.trace(taxonomy.group_confusion(mixed)) == 10
+
+
+def test_group_trained_model_maps_fine_labels(taxonomy):
+    grouped = Taxonomy(dict(enumerate(taxonomy.groups)), SPEC)
+    assert grouped.groups == taxonomy.groups
+    assert grouped.group_for("Cheddar_Cheese") == "Cheddar"
+    assert grouped.name_for("Soft_Drink_Can", "category") == "Drinks"
+    assert grouped.group_for("Pineapple") == "Pineapple"
+    assert taxonomy.group_mapping()["idx_to_class"] == dict(enumerate(taxonomy.groups))
+
+
+def test_invalid_specs_are_rejected():
+    with pytest.raises(ValueError, match="named after"):
+        Taxonomy(dict(enumerate(LABELS)), {"groups": {"Cheese": ["Cheddar", "Cheddar_Cheese"]}})
+    with pytest.raises(ValueError, match="is in groups"):
+        Taxonomy(dict(enumerate(LABELS)), {"groups": {"Cheddar": ["Cheddar", "Basil"], "Basil": ["Basil"]}})
+    with pytest.raises(ValueError, match="is in categories"):
+        Taxonomy(dict(enumerate(LABELS)), {"categories": {"Cheese": ["Basil"], "Herbs": ["Basil"]}})
@@ -0,0 +1,85 @@
+"""Downsampling of chart series in HackAI.timeseries.
+
+    python -m pytest tests/test_timeseries.py
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from HackAI import timeseries
+
+
+def records(values, observed: int | None = None) -> list[dict]:
+    """Chart records with ``actual`` for the first ``observed`` values and ``forecast`` after."""
+    observed = len(values) if observed is None else observed
+    return [{"name": str(i), "actual": float(v) if i < observed else None, "forecast": float(v)}
+            for i, v in enumerate(values)]
+
+
+@pytest.mark.parametrize("n", [3, 4, 10, 57, 500])
+@pytest.mark.parametrize("n_out", [3, 4, 9, 50, 200])
+def test_lttb_keeps_both_ends_and_the_budget(n, n_out):
+    y = np.random.default_rng(n * 1000 + n_out).normal(size=n)
+    kept = timeseries.lttb_indices(y, n_out)
+    if n_out >= n:
+        assert kept.tolist() == list(range(n))
+        return
+    assert len(kept) == n_out
+    assert kept[0] == 0 and kept[-1] == n - 1
+    assert np.all(np.diff(kept) > 0)
+
+
+def test_lttb_keeps_a_lone_spike():
+    y = np.zeros(1000)
+    y[437] = 50
+    assert 437 in timeseries.lttb_indices(y, 20)
+
+
+def test_too_small_budgets_and_short_series_are_returned_whole():
+    y = np.arange(10.0)
+    assert timeseries.lttb_indices(y, 2).tolist() == list(range(10))
+    assert timeseries.lttb_indices(y[:1], 5).tolist() == [0]
+    assert timeseries.minmax_indices(y, 10).tolist() == list(range(10))
+
+
+def test_minmax_keeps_every_extreme_in_order():
+    y = np.random.default_rng(3).normal(size=1000)
+    kept = timeseries.minmax_indices(y, 100)
+    assert len(kept) <= 100
+    assert np.all(np.diff(kept) > 0)
+    assert int(np.argmin(y)) in kept and int(np.argmax(y)) in kept
+
+
+def test_empty_series():
+    assert timeseries.lttb_indices(np.array([]), 10).tolist() == []
+    assert timeseries.minmax_indices(np.array([]), 10).tolist() == []
+    assert timeseries.overview([]) == []
+    assert timeseries.window([], [0, 0], 10) == []
+    assert timeseries.overview_range([], 0, 5) == []
+    assert timeseries.series_to_overview([], [0, 10]) == [0, 0]
+    assert timeseries.default_window([], 30) == [0, 0]
+
+
+def test_window_and_overview_ranges_round_trip():
+    series = records(np.sin(np.linspace(0, 20, 2000)), observed=1500)
+    overview = timeseries.overview(series, 100)
+    assert overview[0] is series[0] and overview[-1] is series[-1]
+
+    bounds = timeseries.default_window(series, 300)
+    assert bounds == [1200, 1999]
+    visible = timeseries.window(series, bounds, 50)
+    assert len(visible) == 50
+    assert visible[0] is series[1200] and visible[-1] is series[1999]
+
+    # The brush covering a window translates back to a range that contains it
+    brush = timeseries.series_to_overview(series, bounds, 100)
+    start, end = timeseries.overview_range(series, *brush, n_out=100)
+    assert start <= bounds[0] and end >= bounds[1]
+
+
+def test_points_for_width_is_clamped():
+    assert timeseries.points_for_width(10) == timeseries.MIN_POINTS
+    assert timeseries.points_for_width(1000) == 500
+    assert timeseries.points_for_width(10_000) == timeseries.MAX_POINTS